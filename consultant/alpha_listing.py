@@ -0,0 +1,187 @@
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Iterator, List, Optional, Tuple, Union
+from urllib.parse import quote
+
+import requests
+
+from machine_lib import brain_api_url, session_manager
+from session_pool import SessionManager
+
+DateLike = Union[str, datetime]
+
+# 旧接口的日期只写 "MM-DD"，默认属于该年份
+LEGACY_YEAR = 2025
+# BRAIN 默认使用美东时间
+DEFAULT_TZ = timezone(timedelta(hours=-4))
+
+
+def parse_date(value: DateLike, year: int = LEGACY_YEAR) -> datetime:
+    """
+    解析日期，支持 datetime、"YYYY-MM-DD"、"YYYY-MM-DDTHH:MM:SS[±HH:MM]" 以及旧的 "MM-DD"（年份取 year）。
+    未带时区的日期按美东时间（-04:00）处理。
+    """
+    if isinstance(value, datetime):
+        dt = value
+    elif len(value) == 5:
+        dt = datetime.strptime(f"{year}-{value}", "%Y-%m-%d")
+    else:
+        dt = datetime.fromisoformat(value)
+    return dt if dt.tzinfo else dt.replace(tzinfo=DEFAULT_TZ)
+
+
+def date_windows(start: datetime, end: datetime, window: timedelta) -> List[Tuple[datetime, datetime]]:
+    """
+    将 [start, end) 切分为长度不超过 window 的左闭右开区间。
+    """
+    windows = []
+    while start < end:
+        windows.append((start, min(start + window, end)))
+        start += window
+    return windows
+
+
+def _listing_url(start: datetime, end: datetime, offset: int, page_size: int, sharpe_th: Optional[float],
+                 fitness_th: Optional[float], region: Optional[str], universe: Optional[str], status: str,
+                 negative: bool) -> str:
+    """
+    拼接 /users/self/alphas 查询 URL，过滤条件交给服务端处理。negative=True 时筛选 sharpe、fitness 为负的 alpha。
+    """
+    url = brain_api_url + "/users/self/alphas?limit=%d&offset=%d" % (page_size, offset) \
+        + "&status=" + status \
+        + "&dateCreated%3E=" + quote(start.isoformat(timespec='seconds')) \
+        + "&dateCreated%3C" + quote(end.isoformat(timespec='seconds'))
+    if negative:
+        if fitness_th is not None:
+            url += "&is.fitness%3C-" + str(fitness_th)
+        if sharpe_th is not None:
+            url += "&is.sharpe%3C-" + str(sharpe_th)
+        url += "&order=is.sharpe"
+    else:
+        if fitness_th is not None:
+            url += "&is.fitness%3E" + str(fitness_th)
+        if sharpe_th is not None:
+            url += "&is.sharpe%3E" + str(sharpe_th)
+        url += "&order=-is.sharpe"
+    if region:
+        url += "&settings.region=" + region
+    if universe:
+        url += "&settings.universe=" + universe
+    return url + "&hidden=false&type!=SUPER"
+
+
+def _retry_delay(response: Optional[requests.Response], attempt: int, base_delay: float, max_delay: float) -> float:
+    """
+    重试前的等待时间：响应带 Retry-After（秒数）时按其等待，否则按 base_delay * 2^attempt 指数退避。
+    """
+    if response is not None:
+        try:
+            return min(max_delay, float(response.headers.get("Retry-After") or "x"))
+        except ValueError:
+            pass
+    return min(max_delay, base_delay * 2 ** attempt)
+
+
+def _fetch_page(manager: SessionManager, url: str, max_retries: int, base_delay: float = 1.0,
+                max_delay: float = 60.0) -> Dict:
+    """
+    获取一页结果。429 由限流器暂停后重试，登录失效由 manager 刷新，其他错误退避后重试，共 max_retries 次。
+    """
+    for attempt in range(max_retries):
+        response = None
+        try:
+            response = manager.request("GET", url)
+            response.raise_for_status()
+            return response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"listing page failed ({attempt + 1}/{max_retries}): {e}")
+        if attempt < max_retries - 1:
+            time.sleep(_retry_delay(response, attempt, base_delay, max_delay))
+    raise RuntimeError(f"failed to fetch {url}")
+
+
+def iter_alphas(start_date: DateLike,
+                end_date: DateLike,
+                sharpe_th: Optional[float] = None,
+                fitness_th: Optional[float] = None,
+                region: Optional[str] = None,
+                universe: Optional[str] = None,
+                negative: bool = False,
+                status: str = "UNSUBMITTED%1FIS_FAIL",
+                window: timedelta = timedelta(days=7),
+                max_workers: int = 8,
+                page_size: int = 100,
+                max_offset: int = 10000,
+                max_pages: Optional[int] = None,
+                limit: Optional[int] = None,
+                manager: Optional[SessionManager] = None,
+                max_retries: int = 3) -> Iterator[Dict]:
+    """
+    按创建日期分片并行拉取 alpha 列表，以流的方式逐条产出 alpha 记录。
+
+    日期区间先按 window 切片，各分片的首页并行获取；拿到总数后，分片内其余页也并行获取。
+    某个分片的结果数超过 max_offset（服务端深翻页上限）时，该分片自动对半切分后重新拉取。
+    分片之间并行，产出顺序不保证按 sharpe 排序；每个分片内服务端已按 sharpe 排序，
+    只需要全局前 N 条时用 max_pages = ceil(N / page_size) 只取各分片的前几页，再在调用方合并。
+
+    Args:
+        start_date, end_date: 创建日期区间 [start_date, end_date)，支持 datetime、ISO 字符串或旧的 "MM-DD"。
+        sharpe_th, fitness_th: sharpe、fitness 阈值，None 表示不过滤。
+        region, universe: 区域、股票池过滤，None 表示不过滤。
+        negative: 为 True 时筛选 sharpe < -sharpe_th 且 fitness < -fitness_th 的 alpha。
+        status: 状态过滤（已 URL 编码）。
+        window: 初始分片长度。
+        max_workers: 并行请求数。
+        page_size: 每页条数。
+        max_offset: 单个分片允许的最大翻页深度。
+        max_pages: 每个分片最多获取的页数，None 表示取完。设置后分片不再因超过 max_offset 而切分。
+        limit: 最多产出的条数，None 表示不限。
+        manager: 会话管理器，默认使用共享会话。
+        max_retries: 单页请求失败的重试次数。
+
+    Yields:
+        dict: 接口返回的 alpha 记录。
+    """
+    manager = manager or session_manager
+    filters = dict(sharpe_th=sharpe_th, fitness_th=fitness_th, region=region, universe=universe,
+                   status=status, negative=negative)
+    yielded = 0
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        pending = {}
+
+        def submit(start: datetime, end: datetime, offset: int) -> None:
+            url = _listing_url(start, end, offset, page_size, **filters)
+            pending[executor.submit(_fetch_page, manager, url, max_retries)] = (start, end, offset)
+
+        for start, end in date_windows(parse_date(start_date), parse_date(end_date), window):
+            submit(start, end, 0)
+
+        try:
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    start, end, offset = pending.pop(future)
+                    page = future.result()
+                    if offset == 0:
+                        count = page.get('count', 0)
+                        if max_pages is None and count > max_offset and end - start > timedelta(seconds=1):
+                            # 分片过大，对半切分后重新拉取，丢弃本页以免重复
+                            middle = start + (end - start) / 2
+                            submit(start, middle, 0)
+                            submit(middle, end, 0)
+                            continue
+                        last = min(count, max_offset)
+                        if max_pages is not None:
+                            last = min(last, max_pages * page_size)
+                        for next_offset in range(page_size, last, page_size):
+                            submit(start, end, next_offset)
+                    for alpha in page.get('results', []):
+                        yield alpha
+                        yielded += 1
+                        if limit is not None and yielded >= limit:
+                            return
+        finally:
+            for future in pending:
+                future.cancel()
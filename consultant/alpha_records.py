@@ -0,0 +1,314 @@
+"""
+带字段名的 alpha 记录，替代 [alpha_id, exp, sharpe, turnover, fitness, margin, dateCreated, decay, adj_decay]
+这类按下标读取的列表记录。
+
+- AlphaRecord：单条记录，__slots__ 存储，字段按名称访问；仍支持 rec[1]、rec[-1] 和 to_list()，
+  按旧列表的布局（含 pyramids、universe / region、建议 decay 的各种变体）返回，旧代码和 notebook 无需修改。
+- AlphaBatch：列式存储的一批记录，数值列为 numpy 数组，排序、top-k、筛选都是整批的数组运算；
+  每条记录只占几个数组元素，数十万条的 tracker 列表比列表记录小数倍。
+
+用法：
+    batch = AlphaBatch.from_records(get_alphas_from_csv(path, 1.2, 0.7))
+    best = batch.filter(batch.fitness > 1.0).top_k(200, 'sharpe')
+    fo_layer = best.digest()          # [[exp, decay], ...]，与 digest(records) 相同
+"""
+from typing import Iterable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+import pandas as pd
+
+# 列表记录中 pyramids 插入在 dateCreated 之后，universe / region 位于 margin 之后
+RECORD_FIELDS = ('alpha_id', 'exp', 'sharpe', 'turnover', 'fitness', 'margin', 'date_created', 'decay',
+                 'adjusted_decay', 'universe', 'region', 'pyramids')
+NUMERIC_FIELDS = ('sharpe', 'turnover', 'fitness', 'margin')
+# AlphaBatch 中 adjusted_decay 缺失（turnover <= 0.3，列表记录没有最后一项）的标记
+NO_DECAY = -1
+
+
+class AlphaRecord:
+    """
+    单条 alpha 记录。adjusted_decay 为按换手率建议的 decay（machine_lib.suggested_decay），没有时为 None；
+    universe、region 只有 get_alphas_with_universe_region 的记录才有；pyramids 为 MATCHES_PYRAMID 检查的原始列表。
+    """
+    __slots__ = RECORD_FIELDS
+
+    def __init__(self, alpha_id: str, exp: str, sharpe: float, turnover: float, fitness: float, margin: float,
+                 date_created: str, decay: int, adjusted_decay: Optional[int] = None,
+                 universe: Optional[str] = None, region: Optional[str] = None, pyramids: Optional[list] = None):
+        self.alpha_id = alpha_id
+        self.exp = exp
+        self.sharpe = sharpe
+        self.turnover = turnover
+        self.fitness = fitness
+        self.margin = margin
+        self.date_created = date_created
+        self.decay = decay
+        self.adjusted_decay = adjusted_decay
+        self.universe = universe
+        self.region = region
+        self.pyramids = pyramids
+
+    @classmethod
+    def from_list(cls, rec: Sequence, with_universe: Optional[bool] = None) -> "AlphaRecord":
+        """
+        由旧的列表记录构造，支持以下布局（[] 表示可选）：
+            [alpha_id, exp, sharpe, turnover, fitness, margin, dateCreated, [pyramids], decay, [adj_decay]]
+            [alpha_id, exp, sharpe, turnover, fitness, margin, universe, region, dateCreated, decay, [adj_decay]]
+
+        布局只由长度和 pyramids 的位置（下标 7 为列表）判断，不看字段内容，dateCreated 缺失（None、''）也能识别。
+        两种布局长度重叠（10 项）时，下标 7 不是列表即为带 universe 的布局；with_universe 可显式指定。
+
+        Raises:
+            ValueError: 长度不属于以上任何布局。
+        """
+        n = len(rec)
+        has_pyramids = n >= 9 and isinstance(rec[7], list)
+        if with_universe is None:
+            with_universe = not has_pyramids and n in (10, 11)
+        if with_universe:
+            if n not in (10, 11):
+                raise ValueError(f"unrecognized alpha record layout: {rec!r}")
+            return cls(rec[0], rec[1], rec[2], rec[3], rec[4], rec[5], rec[8], rec[9],
+                       rec[10] if n == 11 else None, rec[6], rec[7])
+        if has_pyramids:
+            if n not in (9, 10):
+                raise ValueError(f"unrecognized alpha record layout: {rec!r}")
+            return cls(rec[0], rec[1], rec[2], rec[3], rec[4], rec[5], rec[6], rec[8],
+                       rec[9] if n == 10 else None, pyramids=rec[7])
+        if n not in (8, 9):
+            raise ValueError(f"unrecognized alpha record layout: {rec!r}")
+        return cls(rec[0], rec[1], rec[2], rec[3], rec[4], rec[5], rec[6], rec[7], rec[8] if n == 9 else None)
+
+    @classmethod
+    def coerce(cls, rec: Union["AlphaRecord", Sequence], with_universe: Optional[bool] = None) -> "AlphaRecord":
+        return rec if isinstance(rec, cls) else cls.from_list(rec, with_universe)
+
+    @property
+    def effective_decay(self) -> int:
+        """
+        模拟时使用的 decay：有建议 decay 时取建议值，否则为原 decay（即旧列表记录的 rec[-1]）。
+        """
+        return self.decay if self.adjusted_decay is None else self.adjusted_decay
+
+    def to_list(self) -> list:
+        """
+        按旧的列表布局返回。
+        """
+        rec = [self.alpha_id, self.exp, self.sharpe, self.turnover, self.fitness, self.margin]
+        if self.universe is not None or self.region is not None:
+            rec += [self.universe, self.region]
+        rec.append(self.date_created)
+        if self.pyramids is not None:
+            rec.append(self.pyramids)
+        rec.append(self.decay)
+        if self.adjusted_decay is not None:
+            rec.append(self.adjusted_decay)
+        return rec
+
+    def __getitem__(self, index):
+        return self.to_list()[index]
+
+    def __len__(self) -> int:
+        return len(self.to_list())
+
+    def __iter__(self) -> Iterator:
+        return iter(self.to_list())
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, AlphaRecord):
+            return all(getattr(self, name) == getattr(other, name) for name in RECORD_FIELDS)
+        if isinstance(other, list):
+            return self.to_list() == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"AlphaRecord({self.to_list()!r})"
+
+
+def iter_records(records: Iterable) -> Iterator[AlphaRecord]:
+    """
+    把列表记录、AlphaRecord 或 AlphaBatch 统一逐条转换为 AlphaRecord。
+    """
+    if isinstance(records, AlphaBatch):
+        yield from records
+        return
+    for rec in records:
+        yield AlphaRecord.coerce(rec)
+
+
+class AlphaBatch:
+    """
+    列式存储的一批 alpha 记录：数值列（sharpe、turnover、fitness、margin、decay、adjusted_decay）为 numpy 数组，
+    其余列为列表。切片、布尔掩码和下标数组返回新的 AlphaBatch，单个下标返回 AlphaRecord。
+    """
+
+    def __init__(self,
+                 alpha_id: Sequence[str],
+                 exp: Sequence[str],
+                 sharpe: Sequence[float],
+                 turnover: Sequence[float],
+                 fitness: Sequence[float],
+                 margin: Sequence[float],
+                 date_created: Sequence[str],
+                 decay: Sequence[int],
+                 adjusted_decay: Optional[Sequence[int]] = None,
+                 universe: Optional[Sequence[Optional[str]]] = None,
+                 region: Optional[Sequence[Optional[str]]] = None,
+                 pyramids: Optional[Sequence[Optional[list]]] = None):
+        """
+        Args:
+            adjusted_decay: 建议 decay，缺失处为 NO_DECAY（-1）或 None；整列为 None 表示都没有。
+            universe, region, pyramids: 整列为 None 表示记录中没有这一项。
+        """
+        n = len(alpha_id)
+        self.alpha_id = list(alpha_id)
+        self.exp = list(exp)
+        self.sharpe = np.asarray(sharpe, dtype=np.float64)
+        self.turnover = np.asarray(turnover, dtype=np.float64)
+        self.fitness = np.asarray(fitness, dtype=np.float64)
+        self.margin = np.asarray(margin, dtype=np.float64)
+        self.date_created = list(date_created)
+        self.decay = np.asarray(decay, dtype=np.int64)
+        if adjusted_decay is None:
+            self.adjusted_decay = np.full(n, NO_DECAY, dtype=np.int64)
+        else:
+            self.adjusted_decay = np.array([NO_DECAY if d is None or d is pd.NA else d for d in adjusted_decay],
+                                           dtype=np.int64)
+        self.universe = None if universe is None else list(universe)
+        self.region = None if region is None else list(region)
+        self.pyramids = None if pyramids is None else list(pyramids)
+
+    @classmethod
+    def from_records(cls, records: Iterable) -> "AlphaBatch":
+        """
+        由列表记录（任意支持的布局，可以混合）或 AlphaRecord 构造。
+        """
+        columns = {name: [] for name in RECORD_FIELDS}
+        for rec in iter_records(records):
+            for name in RECORD_FIELDS:
+                columns[name].append(getattr(rec, name))
+        for name in ('universe', 'region', 'pyramids'):
+            if all(value is None for value in columns[name]):
+                columns[name] = None
+        return cls(**columns)
+
+    def __len__(self) -> int:
+        return len(self.alpha_id)
+
+    def _record(self, i: int) -> AlphaRecord:
+        adjusted = int(self.adjusted_decay[i])
+        return AlphaRecord(self.alpha_id[i], self.exp[i], float(self.sharpe[i]), float(self.turnover[i]),
+                           float(self.fitness[i]), float(self.margin[i]), self.date_created[i], int(self.decay[i]),
+                           None if adjusted == NO_DECAY else adjusted,
+                           None if self.universe is None else self.universe[i],
+                           None if self.region is None else self.region[i],
+                           None if self.pyramids is None else self.pyramids[i])
+
+    def take(self, indices: Sequence[int]) -> "AlphaBatch":
+        """
+        按下标数组取出子集（保持给定顺序）。
+        """
+        indices = np.asarray(indices, dtype=np.int64)
+        pick = lambda column: None if column is None else [column[i] for i in indices]
+        return AlphaBatch(pick(self.alpha_id), pick(self.exp), self.sharpe[indices], self.turnover[indices],
+                          self.fitness[indices], self.margin[indices], pick(self.date_created),
+                          self.decay[indices], self.adjusted_decay[indices], pick(self.universe),
+                          pick(self.region), pick(self.pyramids))
+
+    def __getitem__(self, index) -> Union[AlphaRecord, "AlphaBatch"]:
+        if isinstance(index, (int, np.integer)):
+            n = len(self)
+            if not -n <= index < n:
+                raise IndexError(index)
+            return self._record(index % n)
+        if isinstance(index, slice):
+            return self.take(range(*index.indices(len(self))))
+        index = np.asarray(index)
+        return self.filter(index) if index.dtype == bool else self.take(index)
+
+    def __iter__(self) -> Iterator[AlphaRecord]:
+        for i in range(len(self)):
+            yield self._record(i)
+
+    def __repr__(self) -> str:
+        return f"AlphaBatch({len(self)} records)"
+
+    def filter(self, mask) -> "AlphaBatch":
+        """
+        按布尔掩码筛选，例如 batch.filter((batch.sharpe > 1.5) & (batch.turnover < 0.4))。
+        """
+        return self.take(np.flatnonzero(np.asarray(mask, dtype=bool)))
+
+    def _key(self, key: str) -> np.ndarray:
+        if key == 'effective_decay':
+            return self.effective_decay
+        column = getattr(self, key)
+        return column if isinstance(column, np.ndarray) else np.asarray(column, dtype=object)
+
+    def sort(self, key: str = 'sharpe', reverse: bool = True) -> "AlphaBatch":
+        """
+        按一列排序（稳定排序），默认 sharpe 从高到低。
+        """
+        values = self._key(key)
+        order = np.argsort(-values if reverse and values.dtype != object else values, kind='stable')
+        if reverse and values.dtype == object:
+            order = order[::-1]
+        return self.take(order)
+
+    def top_k(self, k: int, key: str = 'sharpe') -> "AlphaBatch":
+        """
+        取 key 最大的 k 条并按从高到低排序，只对候选部分排序，耗时约为 O(n + k log k)。
+        """
+        values = self._key(key)
+        if k >= len(self):
+            return self.sort(key)
+        if values.dtype == object:
+            # 字符串等列不能取负，退回整列排序
+            return self.sort(key).take(np.arange(k))
+        candidates = np.argpartition(-values, k)[:k]
+        order = candidates[np.argsort(-values[candidates], kind='stable')]
+        return self.take(order)
+
+    @property
+    def effective_decay(self) -> np.ndarray:
+        return np.where(self.adjusted_decay == NO_DECAY, self.decay, self.adjusted_decay)
+
+    def digest(self) -> List[list]:
+        """
+        [[exp, decay], ...]，与 machine_lib.digest 对列表记录的结果相同。
+        """
+        return [[exp, int(decay)] for exp, decay in zip(self.exp, self.effective_decay)]
+
+    def extend(self, other: Union["AlphaBatch", Iterable]) -> "AlphaBatch":
+        """
+        返回拼接后的新批次，other 可以是 AlphaBatch 或记录列表。
+        """
+        if not isinstance(other, AlphaBatch):
+            other = AlphaBatch.from_records(other)
+        if len(self) == 0:
+            return other
+        optional = lambda a, b, n_a, n_b: None if a is None and b is None else \
+            (a or [None] * n_a) + (b or [None] * n_b)
+        return AlphaBatch(self.alpha_id + other.alpha_id, self.exp + other.exp,
+                          np.concatenate([self.sharpe, other.sharpe]),
+                          np.concatenate([self.turnover, other.turnover]),
+                          np.concatenate([self.fitness, other.fitness]),
+                          np.concatenate([self.margin, other.margin]),
+                          self.date_created + other.date_created,
+                          np.concatenate([self.decay, other.decay]),
+                          np.concatenate([self.adjusted_decay, other.adjusted_decay]),
+                          optional(self.universe, other.universe, len(self), len(other)),
+                          optional(self.region, other.region, len(self), len(other)),
+                          optional(self.pyramids, other.pyramids, len(self), len(other)))
+
+    def to_lists(self) -> List[list]:
+        """
+        转换回旧的列表记录。
+        """
+        return [record.to_list() for record in self]
+
+    def to_frame(self) -> pd.DataFrame:
+        data = {name: getattr(self, name) for name in RECORD_FIELDS if getattr(self, name) is not None}
+        df = pd.DataFrame(data)
+        df['adjusted_decay'] = df['adjusted_decay'].where(df['adjusted_decay'] != NO_DECAY).astype('Int64')
+        return df
@@ -1,7 +1,7 @@
-import itertools
 from machine_lib import *
+from template_engine import render_all
 
-def generate_alpha_expressions(targets, group1, group2, days):
+def generate_alpha_expressions(targets, group1, group2, days, processes=None):
     """
     Generate all combinations of alpha expressions based on the provided template.
     
@@ -9,6 +9,8 @@ def generate_alpha_expressions(targets, group1, group2, days):
         targets (list): List of fundamental field IDs or expressions (e.g., ['fnd17_ttmepsincx', '-fnd17_apr2rev']).
         group1 (list): List of group fields for volume_factor, fundamental_factor, and price_momentum (e.g., ['sector', 'industry']).
         group2 (list): List of group fields for group_neutralize (e.g., ['sector', 'market']).
+        days (list): Windows for ts_rank of the fundamental data.
+        processes (int, optional): Render in a process pool of this size for very large products.
     
     Returns:
         list: List of alpha expression strings for all combinations of targets, group1, and group2.
@@ -33,29 +35,14 @@ def generate_alpha_expressions(targets, group1, group2, days):
                     trade_signal = trade_when(volume > adv20,group_neutralize(alpha, my_group2),-1);
                     trade_signal"""
     
-    # Generate all combinations of targets, group1, and group2
-    combinations = list(itertools.product(targets, group1, group2, days))
-    
-    # Generate alpha expressions for each combination
-    expressions = []
-    seen = set()  # For deduplication
-    for target, g1, g2, d in combinations:
-        # Format the expression
-        expression = alpha_template.format(
-            target=target,
-            group1=g1,
-            group2=g2,
-            day = d
-        )
-        
-        # Deduplicate using expression string
-        if expression not in seen:
-            seen.add(expression)
-            expressions.append(expression)
-    
-    return expressions
+    # Render all combinations of targets, group1, group2 and days with the compiled template.
+    # Duplicates are removed at the slot level: atomic input values (fields, calls) with the same
+    # canonical form are rendered once, so no per-expression fingerprint set is needed. Compound
+    # values such as 'a+b' are only merged when the text is identical.
+    return render_all(alpha_template, {'target': targets, 'group1': group1, 'group2': group2, 'day': days},
+                      dedupe="slots", processes=processes)
 
-def generate_sentiment_alpha_expressions(targets, groups):
+def generate_sentiment_alpha_expressions(targets, groups, processes=None):
     
     # Input validation
     if not isinstance(targets, list) or not targets:
@@ -70,25 +57,8 @@ def generate_sentiment_alpha_expressions(targets, groups):
                         alpha=group_rank(ehat,densify({group}));
                         alpha"""
     
-    # Generate all combinations of targets, group1, and group2
-    combinations = list(itertools.product(targets, groups))
-    
-    # Generate alpha expressions for each combination
-    expressions = []
-    seen = set()  # For deduplication
-    for target, group in combinations:
-        # Format the expression
-        expression = alpha_template.format(
-            target=target,
-            group=group
-        )
-        
-        # Deduplicate using expression string
-        if expression not in seen:
-            seen.add(expression)
-            expressions.append(expression)
-    
-    return expressions
+    # Render all combinations of targets and groups, deduplicated at the slot level
+    return render_all(alpha_template, {'target': targets, 'group': groups}, dedupe="slots", processes=processes)
 
 
 def generate_group_mean_datafield(df_list):
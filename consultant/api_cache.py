@@ -0,0 +1,112 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+import requests
+
+from rate_limiter import PRIORITY_DEFAULT, limited_get
+
+
+def cache_key(url: str, params: Optional[Dict] = None) -> str:
+    """
+    由接口地址和查询参数生成缓存键：URL 中的查询串与 params 合并后按参数名排序，参数顺序不影响命中。
+    """
+    parts = urlsplit(url)
+    query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True)]
+    query += [(k, str(v)) for k, v in (params or {}).items()]
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(sorted(query)), ""))
+
+
+class ResponseCache:
+    """
+    基于 SQLite 的持久化 JSON 响应缓存，用于数据集、数据字段等很少变化的目录接口。
+    """
+
+    def __init__(self, path: str = "data/api_cache.db", ttl: float = 24 * 3600):
+        """
+        Args:
+            path: 缓存数据库路径。
+            ttl: 默认有效期（秒）。
+        """
+        self.path = path
+        self.ttl = ttl
+        self._conn = None
+        self._lock = threading.Lock()
+
+    def _connect(self) -> sqlite3.Connection:
+        # 首次使用时才创建数据库文件，导入模块不产生副作用；调用方需持有 self._lock
+        if self._conn is None:
+            if os.path.dirname(self.path):
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            self._conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, body TEXT NOT NULL, created_at REAL)")
+        return self._conn
+
+    def get(self, key: str, ttl: Optional[float] = None) -> Optional[Dict]:
+        """
+        返回未过期的缓存内容，不存在或过期时返回 None。
+        """
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            row = self._connect().execute("SELECT body, created_at FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None or time.time() - row[1] > ttl:
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: str, body: Dict) -> None:
+        with self._lock:
+            self._connect().execute("INSERT OR REPLACE INTO responses (key, body, created_at) VALUES (?, ?, ?)",
+                                    (key, json.dumps(body), time.time()))
+
+    def invalidate(self, url_prefix: Optional[str] = None) -> int:
+        """
+        删除缓存。url_prefix 为 None 时清空全部，否则只删除以该地址开头的条目，例如 brain_api_url + "/data-fields"。
+
+        Returns:
+            int: 删除的条目数。
+        """
+        with self._lock:
+            if url_prefix is None:
+                cursor = self._connect().execute("DELETE FROM responses")
+            else:
+                cursor = self._connect().execute("DELETE FROM responses WHERE substr(key, 1, ?) = ?",
+                                                 (len(url_prefix), url_prefix))
+            return cursor.rowcount
+
+    def get_json(self,
+                 sess: requests.Session,
+                 url: str,
+                 params: Optional[Dict] = None,
+                 ttl: Optional[float] = None,
+                 refresh: bool = False,
+                 priority: int = PRIORITY_DEFAULT) -> Dict:
+        """
+        带缓存的 GET 请求，返回 JSON。命中缓存时不发送请求，也不占用限流额度。
+
+        Args:
+            sess: 已认证的会话。
+            url: 接口地址，可带查询串。
+            params: 查询参数。
+            ttl: 本次使用的有效期（秒），None 表示使用默认值。
+            refresh: 为 True 时忽略缓存，重新请求并覆盖。
+            priority: 限流优先级。
+        """
+        key = cache_key(url, params)
+        if not refresh:
+            body = self.get(key, ttl)
+            if body is not None:
+                return body
+        response = limited_get(sess, url, priority, params=params)
+        response.raise_for_status()
+        body = response.json()
+        self.set(key, body)
+        return body
+
+
+api_cache = ResponseCache()
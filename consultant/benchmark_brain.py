@@ -0,0 +1,103 @@
+"""
+基于本地模拟服务器（mock_brain.py）的端到端基准测试，测量 multi_simulate、get_alphas、
+check_submission、get_alpha_pnls 每小时可处理的表达式数，用于在消耗真实模拟额度前验证调度和并发改动。
+
+用法：
+    python benchmark_brain.py --alphas 200 --simulation-duration 5 --latency 0.05 --throttle-rate 20
+"""
+import argparse
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+from mock_brain import MockBrainServer, MockConfig
+
+
+def _measure(name: str, n: int, func: Callable[[], object]) -> Dict:
+    start = time.time()
+    func()
+    elapsed = time.time() - start
+    return {'benchmark': name, 'n': n, 'seconds': round(elapsed, 2), 'per_hour': round(n / elapsed * 3600)}
+
+
+def run_benchmarks(config: MockConfig, n_alphas: int, limit_of_children_simulations: int = 10,
+                   limit_of_multi_simulations: int = 8, benchmarks: List[str] = None) -> List[Dict]:
+    """
+    启动模拟服务器并依次运行各项基准测试。
+
+    Args:
+        config: 模拟服务器配置。
+        n_alphas: 每项测试处理的表达式 / alpha 数量。
+        limit_of_children_simulations: 每个 multi-simulation 的子模拟数。
+        limit_of_multi_simulations: 同时在途的 multi-simulation 数。
+        benchmarks: 要运行的测试名称，默认全部。
+
+    Returns:
+        list: 每项测试的 {'benchmark', 'n', 'seconds', 'per_hour'}。
+    """
+    benchmarks = benchmarks or ['multi_simulate', 'get_alphas', 'check_submission', 'get_alpha_pnls']
+    with MockBrainServer(config) as server:
+        # machine_lib 在导入时读取 BRAIN_API_URL，必须先设置
+        os.environ['BRAIN_API_URL'] = server.url
+        import machine_lib
+        from calc_self_corr import get_alpha_pnls
+
+        if machine_lib.brain_api_url != server.url:
+            raise RuntimeError("machine_lib 已在设置 BRAIN_API_URL 之前导入，请在新进程中运行基准测试")
+        # 不读写真实账号的 cookie 文件
+        machine_lib.session_manager.cookie_path = None
+        s = machine_lib.session_manager.get()
+
+        alphas = list(server.state.alphas.values())[:n_alphas]
+        results = []
+        for name in benchmarks:
+            if name == 'multi_simulate':
+                alpha_list = [(f"ts_rank(mock_field_{i}, {5 + i % 20})", i % 10) for i in range(n_alphas)]
+                pools = machine_lib.load_task_pool(alpha_list, limit_of_children_simulations,
+                                                   limit_of_multi_simulations)
+                func = lambda: machine_lib.multi_simulate(pools, "SUBINDUSTRY", "USA", "TOP3000", 0)
+            elif name == 'get_alphas':
+                # 模拟服务器预置的 alpha 创建于过去一年内
+                end = datetime.now() + timedelta(days=1)
+                func = lambda: machine_lib.get_alphas(end - timedelta(days=367), end, 0, 0, "USA", n_alphas, "submit")
+            elif name == 'check_submission':
+                func = lambda: machine_lib.check_submission([alpha['id'] for alpha in alphas], [], 0)
+            elif name == 'get_alpha_pnls':
+                func = lambda: get_alpha_pnls(alphas, s)
+            else:
+                raise ValueError(f"unknown benchmark: {name}")
+            results.append(_measure(name, n_alphas, func))
+        print(f"server counters: {server.counters}")
+    return results
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="BRAIN API 客户端基准测试（本地模拟服务器）")
+    parser.add_argument("--alphas", type=int, default=100, help="每项测试的表达式数量")
+    parser.add_argument("--children", type=int, default=10, help="每个 multi-simulation 的子模拟数")
+    parser.add_argument("--in-flight", type=int, default=8, help="同时在途的 multi-simulation 数")
+    parser.add_argument("--latency", type=float, default=0.05, help="各端点默认延迟（秒）")
+    parser.add_argument("--simulation-duration", type=float, default=5.0, help="模拟时长（秒）")
+    parser.add_argument("--check-duration", type=float, default=1.0, help="check 计算时长（秒）")
+    parser.add_argument("--poll-retry-after", type=float, default=1.0, help="未完成时返回的 Retry-After（秒）")
+    parser.add_argument("--throttle-rate", type=float, default=None, help="服务端每秒允许的请求数")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="随机 500 的概率")
+    parser.add_argument("--only", nargs="*", default=None, help="只运行指定的测试")
+    args = parser.parse_args()
+
+    config = MockConfig(default_latency=args.latency,
+                        simulation_duration=args.simulation_duration,
+                        check_duration=args.check_duration,
+                        poll_retry_after=args.poll_retry_after,
+                        throttle_rate=args.throttle_rate,
+                        failure_rate=args.failure_rate,
+                        n_alphas=max(args.alphas, 100))
+    results = run_benchmarks(config, args.alphas, args.children, args.in_flight, args.only)
+    for result in results:
+        print(f"{result['benchmark']:<18} n={result['n']:<6} {result['seconds']:>8.2f}s "
+              f"{result['per_hour']:>10} expressions/hour")
+
+
+if __name__ == "__main__":
+    main()
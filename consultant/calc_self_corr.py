@@ -1,3 +1,4 @@
+import os
 import requests
 import pandas as pd
 import logging
@@ -9,6 +10,7 @@ from collections import defaultdict
 import numpy as np
 from pathlib import Path
 from dataclasses import dataclass
+from rate_limiter import PRIORITY_BULK, limited_get
 
 # 定义配置类
 @dataclass
@@ -17,6 +19,8 @@ class Config:
 
 cfg = Config()
 
+brain_api_url = os.environ.get('BRAIN_API_URL', 'https://api.worldquantbrain.com')
+
 def sign_in(username: str, password: str) -> Optional[requests.Session]:
     """
     与 WorldQuant Brain API 进行身份验证，创建并返回一个已验证的会话。
@@ -24,7 +28,7 @@ def sign_in(username: str, password: str) -> Optional[requests.Session]:
     s = requests.Session()
     s.auth = (username, password)
     try:
-        response = s.post('https://api.worldquantbrain.com/authentication')
+        response = s.post(brain_api_url + '/authentication')
         response.raise_for_status()
         logging.info("成功登录")
         return s
@@ -48,15 +52,17 @@ def load_obj(name: str) -> object:
     with open(name + '.pickle', 'rb') as f:
         return pickle.load(f)
 
-def wait_get(url: str, sess: requests.Session, max_retries: int = 10, max_wait: float = 300.0) -> requests.Response:
+def wait_get(url: str, sess: requests.Session, max_retries: int = 10, max_wait: float = 300.0,
+             priority: int = PRIORITY_BULK) -> requests.Response:
     """
-    执行带有重试逻辑和限流处理的 GET 请求。
+    执行带有重试逻辑和限流处理的 GET 请求，经进程级限流器发送。
 
     参数:
         url (str): API 地址。
         sess (requests.Session): 已认证的会话。
         max_retries (int): 最大重试次数。
         max_wait (float): 最大等待时间（秒）。
+        priority (int): 限流优先级，默认按批量拉取处理。
     """
     start_time = time.time()
     retries = 0
@@ -65,7 +71,7 @@ def wait_get(url: str, sess: requests.Session, max_retries: int = 10, max_wait:
             raise TimeoutError(f"Request timed out: {url}")
         
         try:
-            simulation_progress = sess.get(url, timeout=30)
+            simulation_progress = limited_get(sess, url, priority, timeout=30)
             retry_after = simulation_progress.headers.get("Retry-After", 0)
             if retry_after:
                 time.sleep(float(retry_after))
@@ -85,7 +91,7 @@ def _get_alpha_pnl(alpha_id: str, sess: requests.Session) -> pd.DataFrame:
     """
     从 WorldQuant Brain API 获取特定 alpha 的盈亏（PnL）数据。
     """
-    pnl = wait_get(f"https://api.worldquantbrain.com/alphas/{alpha_id}/recordsets/pnl", sess).json()
+    pnl = wait_get(f"{brain_api_url}/alphas/{alpha_id}/recordsets/pnl", sess).json()
     df = pd.DataFrame(pnl['records'], columns=[item['name'] for item in pnl['schema']['properties']])
     df = df.rename(columns={'date': 'Date', 'pnl': alpha_id})
     df = df[['Date', alpha_id]]
@@ -128,7 +134,7 @@ def get_os_alphas(sess: requests.Session, limit: int = 100, get_first: bool = Fa
     total_alphas = 100
     while len(fetched_alphas) < total_alphas:
         print(f"从偏移 {offset} 到 {offset + limit} 获取 alpha")
-        url = (f"https://api.worldquantbrain.com/users/self/alphas?"
+        url = (f"{brain_api_url}/users/self/alphas?"
                f"stage=OS&limit={limit}&offset={offset}&order=-dateSubmitted")
         res = wait_get(url, sess).json()
         if offset == 0:
@@ -155,7 +161,7 @@ def calc_self_corr(
     计算目标 alpha 与同一区域内其他 alpha 的最大相关性。
     """
     if alpha_result is None:
-        alpha_result = wait_get(f"https://api.worldquantbrain.com/alphas/{alpha_id}", sess).json()
+        alpha_result = wait_get(f"{brain_api_url}/alphas/{alpha_id}", sess).json()
     
     if alpha_pnls is not None and len(alpha_pnls) == 0:
         alpha_pnls = None
@@ -1,3 +1,5 @@
+from template_engine import compile_template, iter_render
+
 # 定义组合
 target_list = [
     "returns",
@@ -444,42 +446,26 @@ eur_sector_list = [
 ]
 
 
-def generate_alpha_list(target_list, market_list, sector_list, cap, days, templates=None):
-    """
-    生成 alpha 表达式列表，支持指定模板。
-
-    Args:
-        target_list (list): 目标数据字段列表。
-        market_list (list): 市场数据字段列表。
-        sector_list (list): 行业分类字段列表。
-        cap (str): 市值字段。
-        days (list): 回归天数列表。
-        templates (list, optional): 需要生成的 alpha 模板名称列表，例如 ['basic_alpha', 'residual_alpha']。
-                                   如果为 None，则生成所有模板。
-
-    Returns:
-        list: 包含生成的 alpha 表达式的列表。
-    """
-    # 定义所有 alpha 模板
-    alpha_templates = {
-        'base_alpha': """
+# 所有 alpha 模板，{count} 为参数组合的序号
+ALPHA_TEMPLATES = {
+    'base_alpha': """
             target_data = winsorize(ts_backfill({target}, 63), std=4.0);
             alpha_{count}_basic = ts_regression(target_data, group_mean(target_data, log(ts_mean({cap}, 21)), densify({sector})), {day}, rettype=2);
             alpha_{count}_basic
         """,
-        'base_rank_alpha': """
+    'base_rank_alpha': """
             target_data = winsorize(ts_backfill({target}, 63), std=4.0);
             alpha_{count}_basic = ts_regression(target_data, group_mean(target_data, log(ts_mean({cap}, 21)), densify({sector})), {day}, rettype=2);
             alpha = rank(alpha_{count}_basic);
             alpha
         """,
-        'basic_alpha': """
+    'basic_alpha': """
             target_data = winsorize(ts_backfill({target}, 63), std=4.0);
             market_data = winsorize(ts_backfill({market}, 63), std=4.0);
             alpha_{count}_basic = ts_regression(target_data, group_mean(market_data, log(ts_mean({cap}, 21)), densify({sector})), {day}, rettype=2);
             alpha_{count}_basic
         """,
-        'residual_alpha': """
+    'residual_alpha': """
             target_data = winsorize(ts_backfill({target}, 63), std=4.0);
             market_data = winsorize(ts_backfill({market}, 63), std=4.0);
             beta = ts_regression(target_data, group_mean(market_data, log(ts_mean({cap}, 21)), densify({sector})), {day}, rettype=2);
@@ -487,20 +473,20 @@ def generate_alpha_list(target_list, market_list, sector_list, cap, days, templa
             alpha_{count}_residual = - target_data + predicted_return;
             alpha_{count}_residual
         """,
-        'beta_alpha': """
+    'beta_alpha': """
             target_data = winsorize(ts_backfill({target}, 63), std=4.0);
             market_data = winsorize(ts_backfill({market}, 63), std=4.0);
             alpha_{count}_beta = rank(ts_regression(target_data, group_mean(market_data, log(ts_mean({cap}, 21)), densify({sector})), {day}, rettype=2));
             alpha_{count}_beta
         """,
-        'beta_change_alpha': """
+    'beta_change_alpha': """
             target_data = winsorize(ts_backfill({target}, 63), std=4.0);
             market_data = winsorize(ts_backfill({market}, 63), std=4.0);
             beta = ts_regression(target_data, group_mean(market_data, log(ts_mean({cap}, 21)), densify({sector})), {day}, rettype=2);
             alpha_{count}_beta_change = rank(ts_delta(beta, 21));
             alpha_{count}_beta_change
         """,
-        'residual_trend_alpha': """
+    'residual_trend_alpha': """
             target_data = winsorize(ts_backfill({target}, 63), std=4.0);
             market_data = winsorize(ts_backfill({market}, 63), std=4.0);
             beta = ts_regression(target_data, group_mean(market_data, log(ts_mean({cap}, 21)), densify({sector})), {day}, rettype=2);
@@ -509,7 +495,7 @@ def generate_alpha_list(target_list, market_list, sector_list, cap, days, templa
             alpha_{count}_residual_trend = rank(ts_mean(residual, 21));
             alpha_{count}_residual_trend
         """,
-        'fundamental_alpha':"""
+    'fundamental_alpha':"""
             fundamental_data = winsorize(ts_backfill({target}, 63), std=4.0);
             my_group = {group1};
             my_group2 = {group2};
@@ -527,35 +513,51 @@ def generate_alpha_list(target_list, market_list, sector_list, cap, days, templa
             );
             trade_signal
         """
-    }
+}
+
+
+def generate_alpha_list(target_list, market_list, sector_list, cap, days, templates=None, dedupe=None, processes=None):
+    """
+    iter_alpha_list 的列表版本。
+    """
+    return list(iter_alpha_list(target_list, market_list, sector_list, cap, days, templates, dedupe, processes))
+
+
+def iter_alpha_list(target_list, market_list, sector_list, cap, days, templates=None, dedupe=None, processes=None):
+    """
+    逐个生成 alpha 表达式（生成器），支持指定模板。模板经 template_engine 预编译后按笛卡尔积批量渲染，
+    输出顺序与 target、market、sector、day 四层循环相同。
+
+    Args:
+        target_list (list): 目标数据字段列表。
+        market_list (list): 市场数据字段列表。
+        sector_list (list): 行业分类字段列表。
+        cap (str): 市值字段。
+        days (list): 回归天数列表。
+        templates (list, optional): 需要生成的 alpha 模板名称列表，例如 ['basic_alpha', 'residual_alpha']。
+                                   如果为 None，则生成所有参数齐全的模板。
+        dedupe (str, optional): 去重方式，见 template_engine.iter_render；"slots" 会跳过只有 market
+                                不同而模板并未使用 market 的重复表达式。默认不去重。
+        processes (int, optional): 大于 1 时在进程池中渲染。
+
+    Yields:
+        str: alpha 表达式。
+    """
+    values = {'target': target_list, 'market': market_list, 'sector': sector_list, 'day': days, 'cap': [cap]}
+    compiled = {name: compile_template(template) for name, template in ALPHA_TEMPLATES.items()}
 
-    # 如果 templates 为 None，生成所有模板
+    # 如果 templates 为 None，生成所有参数齐全的模板
     if templates is None:
-        templates = list(alpha_templates.keys())
+        templates = [name for name, template in compiled.items()
+                     if set(template.fields) <= set(values) | {'count'}]
+        skipped = [name for name in compiled if name not in templates]
+        if skipped:
+            print(f"跳过缺少参数的模板: {skipped}")
 
     # 验证 templates 参数
-    invalid_templates = [t for t in templates if t not in alpha_templates]
+    invalid_templates = [t for t in templates if t not in compiled]
     if invalid_templates:
         raise ValueError(f"无效的模板名称: {invalid_templates}")
 
-    alpha_list = []
-    count = 0
-
-    for target in target_list:
-        for market in market_list:
-            for sector in sector_list:
-                for day in days:
-                    count += 1
-                    # 根据指定的模板生成 alpha 表达式
-                    for template_name in templates:
-                        alpha_expr = alpha_templates[template_name].format(
-                            target=target,
-                            market=market,
-                            sector=sector,
-                            cap=cap,
-                            day=day,
-                            count=count
-                        )
-                        alpha_list.append(alpha_expr)
-
-    return alpha_list
\ No newline at end of file
+    yield from iter_render([compiled[name] for name in templates], values, counter='count',
+                           dedupe=dedupe, processes=processes)
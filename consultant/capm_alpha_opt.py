@@ -1,6 +1,7 @@
 import re
 from itertools import product
-import hashlib
+from fastexpr import fingerprint
+from alpha_records import AlphaRecord
 
 # 输入数据
 alphas = [
@@ -15,31 +16,30 @@ def deduplicate_alphas(alphas, metric='sharpe'):
     
     参数：
     - alphas: Alpha列表，每个元素为 [alpha_id, exp, sharpe, turnover, fitness, margin, universe, region, dateCreated, decay]
+      或 AlphaRecord，也可以是 AlphaBatch
     - metric: 用于比较的指标，'sharpe' 或 'fitness'，默认 'sharpe'
     
     返回：
-    - deduped_alphas: 去重后的Alpha列表
+    - deduped_alphas: 去重后的Alpha列表（元素保持输入的类型）
     """
     target_data_map = {}
     
-    # 选择比较指标的索引
-    metric_index = 2 if metric == 'sharpe' else 4  # sharpe: 2, fitness: 4
-    
     # 第一次遍历：记录每个target_data的最佳Alpha
     for alpha in alphas:
-        match = re.search(r'target_data = (.*?);', alpha[1], re.DOTALL)
+        rec = AlphaRecord.coerce(alpha)
+        match = re.search(r'target_data = (.*?);', rec.exp, re.DOTALL)
         if match:
             target_data = match.group(1).strip()
+            score = rec.sharpe if metric == 'sharpe' else rec.fitness
             if target_data not in target_data_map:
-                target_data_map[target_data] = alpha
+                target_data_map[target_data] = (score, alpha)
             else:
                 # 如果已有该target_data，比较指标值，保留更好的
-                current_best = target_data_map[target_data]
-                if alpha[metric_index] > current_best[metric_index]:
-                    target_data_map[target_data] = alpha
+                if score > target_data_map[target_data][0]:
+                    target_data_map[target_data] = (score, alpha)
     
     # 收集去重后的Alpha
-    deduped_alphas = list(target_data_map.values())
+    deduped_alphas = [alpha for _, alpha in target_data_map.values()]
     return deduped_alphas
 # 改造函数
 def transform_target_data(original_exp, data_types=['implied_volatility_put'], 
@@ -114,7 +114,8 @@ def generate_transformed_alpha(alpha_data, **transform_params):
             'original_sharpe': alpha_data[2],
             'original_fitness': alpha_data[4],
             'params': transform_params,
-            'exp_hash': hashlib.md5(new_exp.encode()).hexdigest()
+            # 规范化指纹：仅空白、布局或变量名不同的改造结果视为重复
+            'exp_hash': fingerprint(new_exp)
         }
         return result
     else:
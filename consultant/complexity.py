@@ -0,0 +1,196 @@
+"""
+表达式复杂度的离线检查：不提交模拟，直接由语法树计算算子数、嵌套深度和最长回看窗口，
+在写入待模拟列表之前过滤（或标记）超出平台 / pyramid 限制的表达式，避免浪费模拟名额。
+
+- 算子数：函数调用、二元运算、取反 / 逻辑非和三元表达式各计 1 个，多行表达式按写出的语句逐条累加，
+  与平台返回的 operatorCount 计数方式一致（负数字面量不计）；
+- 嵌套深度：从结果到叶子的最长算子链长度，局部变量按其定义展开；
+- 回看窗口：ts_* 算子（及 inst_tvr）的天数参数沿嵌套链累加，例如 ts_mean(ts_delta(x, 5), 20) 为 25 天。
+
+用法：
+    alphas = iter_within_limits(iter_first_order_factory(fields, ops), PYRAMID_LIMITS)
+    generate_pending_simulation_data(pool, ..., limits=PLATFORM_LIMITS)
+    complexity_report(alphas, PLATFORM_LIMITS)
+"""
+from dataclasses import dataclass
+from functools import wraps
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+import pandas as pd
+
+from fastexpr import (BinOp, Call, FastExprSyntaxError, MultiLineExpression, Name, Number, Program, Ternary,
+                      UnaryOp, parse)
+
+# 除 ts_* 外带回看窗口的算子
+LOOKBACK_OPERATORS = frozenset({'inst_tvr'})
+# 作为天数参数的关键字参数名
+LOOKBACK_KEYWORDS = ('d', 'days', 'lookback')
+
+
+@dataclass(frozen=True)
+class ExpressionComplexity:
+    operators: int
+    depth: int
+    lookback: int
+
+
+@dataclass(frozen=True)
+class ComplexityLimits:
+    """
+    复杂度上限，None 表示不限制。
+    """
+    max_operators: Optional[int] = None
+    max_depth: Optional[int] = None
+    max_lookback: Optional[int] = None
+
+    def violations(self, complexity: ExpressionComplexity) -> List[str]:
+        """
+        返回超出的各项限制说明，未超限时为空列表。
+        """
+        output = []
+        if self.max_operators is not None and complexity.operators > self.max_operators:
+            output.append(f"operators {complexity.operators} > {self.max_operators}")
+        if self.max_depth is not None and complexity.depth > self.max_depth:
+            output.append(f"depth {complexity.depth} > {self.max_depth}")
+        if self.max_lookback is not None and complexity.lookback > self.max_lookback:
+            output.append(f"lookback {complexity.lookback} > {self.max_lookback}")
+        return output
+
+
+# 平台对单个表达式的限制；账号限制不同时传入自定义的 ComplexityLimits
+PLATFORM_LIMITS = ComplexityLimits(max_operators=64, max_lookback=512)
+# 与 get_alphas_from_csv 中 pyramid 筛选一致的算子数上限
+PYRAMID_LIMITS = ComplexityLimits(max_operators=8, max_lookback=512)
+
+
+def _window(node: Call) -> int:
+    # ts_* 的天数参数：第一个参数之后的第一个数字，或 d= 之类的关键字参数
+    for key, value in node.kwargs:
+        if key in LOOKBACK_KEYWORDS and isinstance(value, Number):
+            return int(value.value)
+    for arg in node.args[1:]:
+        if isinstance(arg, Number):
+            return int(arg.value)
+    return 0
+
+
+def _measure(node, env: Dict[str, Tuple[int, int]]) -> Tuple[int, int, int]:
+    """
+    返回 (算子数, 深度, 回看窗口)。env 为局部变量名到 (深度, 回看窗口) 的映射，变量引用不计算子数。
+    """
+    if isinstance(node, Name):
+        depth, lookback = env.get(node.id, (0, 0))
+        return 0, depth, lookback
+    if isinstance(node, Call):
+        children = list(node.args) + [value for _, value in node.kwargs]
+    elif isinstance(node, UnaryOp):
+        children = [node.operand]
+    elif isinstance(node, BinOp):
+        children = [node.left, node.right]
+    elif isinstance(node, Ternary):
+        children = [node.cond, node.then, node.other]
+    else:
+        return 0, 0, 0
+    operators, depth, lookback = 1, 0, 0
+    for child in children:
+        child_operators, child_depth, child_lookback = _measure(child, env)
+        operators += child_operators
+        depth = max(depth, child_depth)
+        lookback = max(lookback, child_lookback)
+    if isinstance(node, Call) and (node.func.startswith('ts_') or node.func in LOOKBACK_OPERATORS):
+        lookback += _window(node)
+    return operators, depth + 1, lookback
+
+
+def analyze(expression: Union[str, MultiLineExpression, Program]) -> ExpressionComplexity:
+    """
+    计算表达式的算子数、嵌套深度和最长回看窗口。
+
+    Args:
+        expression: 单行或多行表达式文本、MultiLineExpression 或已解析的 Program。
+
+    Returns:
+        ExpressionComplexity: 复杂度。
+
+    Raises:
+        FastExprSyntaxError: 表达式无法解析。
+    """
+    program = expression if isinstance(expression, Program) else parse(str(expression))
+    env: Dict[str, Tuple[int, int]] = {}
+    total = 0
+    for assign in program.assignments:
+        operators, depth, lookback = _measure(assign.value, env)
+        total += operators
+        env[assign.name] = (depth, lookback)
+    operators, depth, lookback = _measure(program.result, env)
+    return ExpressionComplexity(total + operators, depth, lookback)
+
+
+def check(expression, limits: ComplexityLimits = PLATFORM_LIMITS) -> List[str]:
+    """
+    返回表达式超出的限制说明；无法解析的表达式返回空列表，交给平台判断。
+    """
+    try:
+        return limits.violations(analyze(expression))
+    except FastExprSyntaxError:
+        return []
+
+
+def within_limits(expression, limits: ComplexityLimits = PLATFORM_LIMITS) -> bool:
+    return not check(expression, limits)
+
+
+def iter_within_limits(items: Iterable, limits: ComplexityLimits = PLATFORM_LIMITS,
+                       verbose: bool = True) -> Iterator:
+    """
+    过滤掉超限的表达式（生成器），可直接串在工厂函数之后。
+
+    Args:
+        items: 表达式（字符串或 MultiLineExpression），或 (alpha, decay) 元组，原样产出。
+        limits: 复杂度上限。
+        verbose: 遍历结束时打印被过滤的数量。
+    """
+    dropped = 0
+    for item in items:
+        alpha = item[0] if isinstance(item, tuple) else item
+        if check(alpha, limits):
+            dropped += 1
+            continue
+        yield item
+    if verbose and dropped:
+        print(f"Dropped {dropped} expressions over complexity limits {limits}")
+
+
+def limited_by_complexity(generator_function):
+    """
+    为工厂生成器增加关键字参数 limits：传入 ComplexityLimits 时只产出未超限的表达式。
+    """
+    @wraps(generator_function)
+    def wrapper(*args, limits: Optional[ComplexityLimits] = None, **kwargs):
+        expressions = generator_function(*args, **kwargs)
+        return expressions if limits is None else iter_within_limits(expressions, limits)
+    return wrapper
+
+
+def complexity_report(expressions: Iterable, limits: Optional[ComplexityLimits] = None) -> pd.DataFrame:
+    """
+    逐条列出复杂度，用于在模拟前检查一批表达式。
+
+    Returns:
+        pd.DataFrame: 列为 expression、operators、depth、lookback，给出 limits 时附加 violations
+            （超限说明，以 '; ' 连接，未超限为空字符串）。无法解析的表达式各项为 None。
+    """
+    rows = []
+    for item in expressions:
+        alpha = str(item[0] if isinstance(item, tuple) else item)
+        try:
+            complexity = analyze(alpha)
+        except FastExprSyntaxError:
+            rows.append({'expression': alpha, 'operators': None, 'depth': None, 'lookback': None})
+            continue
+        row = {'expression': alpha, 'operators': complexity.operators,
+               'depth': complexity.depth, 'lookback': complexity.lookback}
+        if limits is not None:
+            row['violations'] = "; ".join(limits.violations(complexity))
+        rows.append(row)
+    return pd.DataFrame(rows)
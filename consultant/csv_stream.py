@@ -0,0 +1,198 @@
+"""
+常量内存的 CSV 流式读写：逐行（或按块）读取，边读边修复字段数不一致的行，写出时按需切换文件，
+排序使用外部归并。拆分、抽取列、排序、修复和结果加载都基于这一层，内存占用只与块大小有关，与文件大小无关，
+可以在内存小于文件的机器上处理数 GB 的模拟结果。
+
+用法：
+    with CsvReader("output/simulated_alphas_USA.csv.2025-07-17") as reader:
+        for chunk in reader.iter_dict_chunks(50000):
+            ...
+    repair_csv("output/simulated_alphas.csv", "output/simulated_alphas_fixed.csv")
+    sort_csv("in.csv", "out.csv", key_column="description")
+"""
+import csv
+import heapq
+import os
+import sys
+import tempfile
+from itertools import islice
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Sequence
+
+# 多行表达式、checks 等字段可能超过 csv 默认的 128KB 单字段上限
+csv.field_size_limit(min(sys.maxsize, 2 ** 31 - 1))
+
+REPAIR_MODES = ("fix", "skip", None)
+DEFAULT_CHUNK_SIZE = 50000
+
+
+def fit_row(row: List[str], width: int) -> List[str]:
+    """
+    把行修复为 width 个字段：多余字段截断，缺少的字段补空字符串。
+    """
+    return row[:width] + [""] * (width - len(row))
+
+
+class CsvReader:
+    """
+    流式 CSV 读取器，首行为表头。字段数与表头不一致的行按 repair 处理：
+    - "fix"：多余字段截断、缺少的字段补空字符串（与 fix_csv 的截断一致）；
+    - "skip"：跳过并记录行号；
+    - None：原样产出。
+    空行（csv.reader 产出 []）一律跳过，不算作格式错误。
+    repaired、skipped 记录处理过的行号（表头为第 1 行，按记录计数，引号内的换行不计）。
+    """
+
+    def __init__(self, path: str, repair: Optional[str] = "fix", encoding: str = "utf-8"):
+        if repair not in REPAIR_MODES:
+            raise ValueError(f"repair must be one of {REPAIR_MODES}")
+        self.path = path
+        self.repair = repair
+        self._file = open(path, "r", encoding=encoding, newline="")
+        self._reader = csv.reader(self._file)
+        self.header: List[str] = next(self._reader, [])
+        self.repaired: List[int] = []
+        self.skipped: List[int] = []
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "CsvReader":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+    def __iter__(self) -> Iterator[List[str]]:
+        width = len(self.header)
+        for line_number, row in enumerate(self._reader, start=2):
+            if not row:
+                continue
+            if len(row) != width and self.repair is not None:
+                if self.repair == "skip":
+                    self.skipped.append(line_number)
+                    continue
+                self.repaired.append(line_number)
+                row = fit_row(row, width)
+            yield row
+
+    def iter_dicts(self) -> Iterator[Dict[str, str]]:
+        header = self.header
+        for row in self:
+            yield dict(zip(header, row))
+
+    def iter_chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[List[str]]]:
+        rows = iter(self)
+        while True:
+            chunk = list(islice(rows, chunk_size))
+            if not chunk:
+                return
+            yield chunk
+
+    def iter_dict_chunks(self, chunk_size: int = DEFAULT_CHUNK_SIZE) -> Iterator[List[Dict[str, str]]]:
+        header = self.header
+        for chunk in self.iter_chunks(chunk_size):
+            yield [dict(zip(header, row)) for row in chunk]
+
+    def report(self) -> None:
+        if self.repaired:
+            print(f"警告：修复 {len(self.repaired)} 行字段数不一致的记录（{self.path}）")
+        if self.skipped:
+            print(f"警告：跳过 {len(self.skipped)} 行格式错误（{self.path}）")
+
+
+def write_csv(path: str, header: Sequence[str], rows: Iterable[Sequence[str]], encoding: str = "utf-8") -> int:
+    """
+    写出表头和所有行（行可以是生成器），返回写入的行数。
+    """
+    count = 0
+    with open(path, "w", encoding=encoding, newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        for row in rows:
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def count_rows(path: str) -> int:
+    """
+    流式统计数据行数（不含表头），引号内的换行不会被算作新行。
+    """
+    with CsvReader(path, repair=None) as reader:
+        return sum(1 for _ in reader)
+
+
+def repair_csv(input_path: str, output_path: str) -> int:
+    """
+    流式修复字段数不一致的行：多余字段截断，缺少的字段补空。返回修复的行数。
+    """
+    with CsvReader(input_path, repair="fix") as reader:
+        write_csv(output_path, reader.header, reader)
+        reader.report()
+        return len(reader.repaired)
+
+
+def split_rows(input_path: str, output_paths: Sequence[str], rows_per_file: int) -> None:
+    """
+    依次把每 rows_per_file 行写入 output_paths 中的一个文件，每个文件都带表头；行数不足时后面的文件只有表头。
+    """
+    with CsvReader(input_path) as reader:
+        rows = iter(reader)
+        for path in output_paths:
+            write_csv(path, reader.header, islice(rows, rows_per_file))
+        reader.report()
+
+
+def _spill(rows: List[List[str]], key: Callable[[List[str]], str], directory: str) -> str:
+    rows.sort(key=key)
+    fd, path = tempfile.mkstemp(suffix=".csv", dir=directory)
+    with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+        csv.writer(f).writerows(rows)
+    return path
+
+
+def _iter_spilled(path: str) -> Iterator[List[str]]:
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        yield from csv.reader(f)
+
+
+def sort_csv(input_path: str,
+             output_path: str,
+             key_column: str,
+             key: Optional[Callable[[str], str]] = None,
+             chunk_size: int = 200000,
+             repair: Optional[str] = "skip",
+             temp_dir: Optional[str] = None) -> CsvReader:
+    """
+    外部归并排序：每 chunk_size 行排序后写入临时文件，再用 heapq.merge 合并，排序稳定。
+
+    Args:
+        input_path, output_path: 输入、输出文件。
+        key_column: 排序列名。
+        key: 对该列取值的变换，默认原值。
+        chunk_size: 每个有序块的行数，决定内存上限。
+        repair: 格式错误行的处理方式，同 CsvReader。
+        temp_dir: 临时文件目录，默认与输出文件相同。
+
+    Returns:
+        CsvReader: 已关闭的读取器，可查看 repaired、skipped。
+
+    Raises:
+        KeyError: key_column 不在表头中。
+    """
+    temp_dir = temp_dir or os.path.dirname(os.path.abspath(output_path))
+    with CsvReader(input_path, repair=repair) as reader:
+        if key_column not in reader.header:
+            raise KeyError(key_column)
+        index = reader.header.index(key_column)
+        row_key = (lambda row: row[index]) if key is None else (lambda row: key(row[index]))
+        spilled = []
+        try:
+            for chunk in reader.iter_chunks(chunk_size):
+                spilled.append(_spill(chunk, row_key, temp_dir))
+            write_csv(output_path, reader.header,
+                      heapq.merge(*(_iter_spilled(path) for path in spilled), key=row_key))
+        finally:
+            for path in spilled:
+                os.remove(path)
+    return reader
@@ -0,0 +1,517 @@
+import hashlib
+import re
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+
+class FastExprSyntaxError(ValueError):
+    pass
+
+
+@dataclass(frozen=True)
+class Number:
+    value: float
+
+
+@dataclass(frozen=True)
+class String:
+    value: str
+
+
+@dataclass(frozen=True)
+class Name:
+    id: str
+
+
+@dataclass(frozen=True)
+class Call:
+    func: str
+    args: Tuple["Node", ...]
+    kwargs: Tuple[Tuple[str, "Node"], ...] = ()
+
+
+@dataclass(frozen=True)
+class UnaryOp:
+    op: str
+    operand: "Node"
+
+
+@dataclass(frozen=True)
+class BinOp:
+    op: str
+    left: "Node"
+    right: "Node"
+
+
+@dataclass(frozen=True)
+class Ternary:
+    cond: "Node"
+    then: "Node"
+    other: "Node"
+
+
+@dataclass(frozen=True)
+class Assign:
+    name: str
+    value: "Node"
+
+
+@dataclass(frozen=True)
+class Program:
+    """
+    多行表达式：若干赋值语句加最后的结果表达式。单行表达式的 assignments 为空。
+    """
+    assignments: Tuple[Assign, ...]
+    result: "Node"
+
+
+Node = Union[Number, String, Name, Call, UnaryOp, BinOp, Ternary]
+
+# 二元运算符优先级，数值越大结合越紧
+BINARY_PRECEDENCE = {
+    '||': 1, '&&': 2,
+    '==': 3, '!=': 3,
+    '<': 4, '<=': 4, '>': 4, '>=': 4,
+    '+': 5, '-': 5,
+    '*': 6, '/': 6,
+    '^': 7,
+}
+TERNARY_PRECEDENCE = 0
+UNARY_PRECEDENCE = 8
+
+_TOKEN_RE = re.compile(r"""
+    (?P<ws>\s+|\#[^\n]*)
+  | (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?)
+  | (?P<name>[A-Za-z_][A-Za-z0-9_.]*)
+  | (?P<string>'[^']*'|"[^"]*")
+  | (?P<op>&&|\|\||==|!=|<=|>=|[-+*/^<>!?:=,;()])
+""", re.VERBOSE)
+
+
+def tokenize(expression: str) -> List[Tuple[str, str]]:
+    tokens, pos = [], 0
+    while pos < len(expression):
+        match = _TOKEN_RE.match(expression, pos)
+        if match is None:
+            raise FastExprSyntaxError(f"unexpected character {expression[pos]!r} at {pos}")
+        pos = match.end()
+        if match.lastgroup != 'ws':
+            tokens.append((match.lastgroup, match.group()))
+    tokens.append(('end', ''))
+    return tokens
+
+
+class _Parser:
+    def __init__(self, expression: str):
+        self.tokens = tokenize(expression)
+        self.pos = 0
+
+    def peek(self, offset: int = 0) -> Tuple[str, str]:
+        return self.tokens[min(self.pos + offset, len(self.tokens) - 1)]
+
+    def take(self, value: Optional[str] = None) -> Tuple[str, str]:
+        token = self.peek()
+        if value is not None and token[1] != value:
+            raise FastExprSyntaxError(f"expected {value!r}, got {token[1] or 'end of expression'!r}")
+        self.pos += 1
+        return token
+
+    def program(self) -> Program:
+        assignments, result = [], None
+        while self.peek()[0] != 'end':
+            if self.peek()[0] == 'name' and self.peek(1)[1] == '=':
+                name = self.take()[1]
+                self.take('=')
+                assignments.append(Assign(name, self.expression()))
+                result = None
+            else:
+                if result is not None:
+                    raise FastExprSyntaxError("missing ';' between statements")
+                result = self.expression()
+            if self.peek()[1] == ';':
+                while self.peek()[1] == ';':
+                    self.take()
+            elif self.peek()[0] != 'end':
+                raise FastExprSyntaxError(f"unexpected {self.peek()[1]!r}")
+        if result is None:
+            raise FastExprSyntaxError("expression has no result")
+        return Program(tuple(assignments), result)
+
+    def expression(self, min_precedence: int = 0) -> Node:
+        left = self.unary()
+        while True:
+            op = self.peek()[1]
+            if op == '?' and min_precedence <= TERNARY_PRECEDENCE:
+                self.take()
+                then = self.expression()
+                self.take(':')
+                left = Ternary(left, then, self.expression(TERNARY_PRECEDENCE))
+                continue
+            precedence = BINARY_PRECEDENCE.get(op) if self.peek()[0] == 'op' else None
+            if precedence is None or precedence < min_precedence:
+                return left
+            self.take()
+            # '^' 右结合，其余左结合
+            right = self.expression(precedence if op == '^' else precedence + 1)
+            left = BinOp(op, left, right)
+
+    def unary(self) -> Node:
+        if self.peek()[1] in ('-', '+', '!'):
+            op = self.take()[1]
+            operand = self.expression(UNARY_PRECEDENCE)
+            if op == '-' and isinstance(operand, Number):
+                return Number(-operand.value)
+            return operand if op == '+' else UnaryOp(op, operand)
+        return self.primary()
+
+    def primary(self) -> Node:
+        kind, value = self.take()
+        if kind == 'number':
+            return Number(float(value))
+        if kind == 'string':
+            return String(value[1:-1])
+        if kind == 'name':
+            if self.peek()[1] != '(':
+                return Name(value)
+            self.take('(')
+            args, kwargs = [], []
+            while self.peek()[1] != ')':
+                if self.peek()[0] == 'name' and self.peek(1)[1] == '=':
+                    key = self.take()[1]
+                    self.take('=')
+                    kwargs.append((key, self.expression()))
+                elif kwargs:
+                    raise FastExprSyntaxError(f"positional argument after keyword argument in {value}()")
+                else:
+                    args.append(self.expression())
+                if self.peek()[1] != ')':
+                    self.take(',')
+            self.take(')')
+            return Call(value, tuple(args), tuple(kwargs))
+        if value == '(':
+            node = self.expression()
+            self.take(')')
+            return node
+        raise FastExprSyntaxError(f"unexpected {value or 'end of expression'!r}")
+
+
+def parse(expression: str) -> Program:
+    """
+    将 FASTEXPR 表达式（单行或以 ';' 分隔的多行）解析为语法树。
+
+    Raises:
+        FastExprSyntaxError: 表达式无法解析。
+    """
+    return _Parser(expression).program()
+
+
+def _walk_names(node: Node) -> Iterable[str]:
+    if isinstance(node, Name):
+        yield node.id
+    elif isinstance(node, Call):
+        for arg in node.args + tuple(value for _, value in node.kwargs):
+            yield from _walk_names(arg)
+    elif isinstance(node, UnaryOp):
+        yield from _walk_names(node.operand)
+    elif isinstance(node, BinOp):
+        yield from _walk_names(node.left)
+        yield from _walk_names(node.right)
+    elif isinstance(node, Ternary):
+        for child in (node.cond, node.then, node.other):
+            yield from _walk_names(child)
+
+
+def _substitute(node: Node, env: Dict[str, Node]) -> Node:
+    if isinstance(node, Name):
+        return env.get(node.id, node)
+    if isinstance(node, Call):
+        return Call(node.func, tuple(_substitute(arg, env) for arg in node.args),
+                    tuple(sorted(((key, _substitute(value, env)) for key, value in node.kwargs),
+                                 key=lambda item: item[0])))
+    if isinstance(node, UnaryOp):
+        return UnaryOp(node.op, _substitute(node.operand, env))
+    if isinstance(node, BinOp):
+        return BinOp(node.op, _substitute(node.left, env), _substitute(node.right, env))
+    if isinstance(node, Ternary):
+        return Ternary(_substitute(node.cond, env), _substitute(node.then, env), _substitute(node.other, env))
+    if isinstance(node, String):
+        # range='0.1, 1, 0.1' 与 range='0.1,1,0.1' 等价
+        return String(re.sub(r"\s*,\s*", ",", node.value.strip()))
+    return node
+
+
+def canonicalize(program: Union[str, Program]) -> Program:
+    """
+    规范化表达式：
+    - 只使用一次的局部变量内联，未使用的赋值删除；
+    - 使用多次的局部变量按定义顺序重命名为 v0、v1……，消除 alpha_{count}_basic 之类的命名差异；
+    - 关键字参数按名称排序，字符串参数去除逗号两侧空白，数字统一格式。
+    """
+    if isinstance(program, str):
+        program = parse(program)
+    # 每条赋值视为一个独立绑定（同名变量可被重新赋值），统计各绑定被引用的次数
+    statements = list(program.assignments) + [Assign('', program.result)]
+    bindings, uses = {}, [0] * len(statements)
+    for index, statement in enumerate(statements):
+        for name in _walk_names(statement.value):
+            if name in bindings:
+                uses[bindings[name]] += 1
+        if statement.name:
+            bindings[statement.name] = index
+
+    env, assignments = {}, []
+    for index, statement in enumerate(statements[:-1]):
+        value = _substitute(statement.value, env)
+        if uses[index] == 0:
+            env.pop(statement.name, None)
+            continue
+        if uses[index] == 1:
+            env[statement.name] = value
+        else:
+            name = f"v{len(assignments)}"
+            assignments.append(Assign(name, value))
+            env[statement.name] = Name(name)
+    return Program(tuple(assignments), _substitute(program.result, env))
+
+
+def _format_number(value: float) -> str:
+    return str(int(value)) if value == int(value) and abs(value) < 1e15 else repr(value)
+
+
+def _precedence(node: Node) -> int:
+    if isinstance(node, BinOp):
+        return BINARY_PRECEDENCE[node.op]
+    if isinstance(node, Ternary):
+        return TERNARY_PRECEDENCE
+    if isinstance(node, UnaryOp) or (isinstance(node, Number) and node.value < 0):
+        return UNARY_PRECEDENCE
+    return UNARY_PRECEDENCE + 1
+
+
+def to_fastexpr(node: Union[Program, Node]) -> str:
+    """
+    将语法树输出为紧凑的 FASTEXPR 文本，只保留必要的括号。多行表达式以 ";\\n" 分隔。
+    """
+    if isinstance(node, Program):
+        lines = [f"{a.name} = {to_fastexpr(a.value)}" for a in node.assignments]
+        return ";\n".join(lines + [to_fastexpr(node.result)])
+    if isinstance(node, Number):
+        return _format_number(node.value)
+    if isinstance(node, String):
+        return "'" + node.value + "'"
+    if isinstance(node, Name):
+        return node.id
+    if isinstance(node, Call):
+        args = [to_fastexpr(arg) for arg in node.args] + [f"{k}={to_fastexpr(v)}" for k, v in node.kwargs]
+        return f"{node.func}({', '.join(args)})"
+
+    def wrap(child: Node, min_precedence: int) -> str:
+        text = to_fastexpr(child)
+        return f"({text})" if _precedence(child) < min_precedence else text
+
+    if isinstance(node, UnaryOp):
+        # 操作数本身带符号时加括号，避免输出 "--x"
+        return node.op + wrap(node.operand, UNARY_PRECEDENCE + 1)
+    if isinstance(node, BinOp):
+        precedence = BINARY_PRECEDENCE[node.op]
+        if node.op == '^':
+            return f"{wrap(node.left, precedence + 1)} ^ {wrap(node.right, precedence)}"
+        return f"{wrap(node.left, precedence)} {node.op} {wrap(node.right, precedence + 1)}"
+    if isinstance(node, Ternary):
+        return (f"{wrap(node.cond, TERNARY_PRECEDENCE + 1)} ? {wrap(node.then, TERNARY_PRECEDENCE)} : "
+                f"{wrap(node.other, TERNARY_PRECEDENCE)}")
+    raise TypeError(f"unknown node: {node!r}")
+
+
+def canonical_form(expression: Union[str, "MultiLineExpression"]) -> str:
+    """
+    返回表达式的规范文本；无法解析时退化为去除多余空白的原文。也接受 MultiLineExpression。
+    """
+    expression = str(expression)
+    try:
+        return to_fastexpr(canonicalize(expression))
+    except FastExprSyntaxError:
+        return " ".join(expression.split())
+
+
+def fingerprint(expression: str) -> str:
+    """
+    表达式的稳定指纹（规范文本的 md5），仅空白、换行布局、局部变量名或单次使用的中间变量不同的表达式指纹相同。
+    """
+    return hashlib.md5(canonical_form(expression).encode()).hexdigest()
+
+
+def compact_fingerprint(expression: str) -> int:
+    """
+    与 fingerprint 等价的 64 位整数指纹，用于内存中的大规模去重集合：每个元素约为 md5 十六进制串的一半大小，
+    百万级表达式的碰撞概率约为 3e-8。需要持久化或跨进程比对时仍使用 fingerprint。
+    """
+    return int.from_bytes(hashlib.blake2b(canonical_form(expression).encode(), digest_size=8).digest(), "big")
+
+
+def iter_unique(expressions: Iterable, seen: Optional[set] = None) -> Iterator:
+    """
+    按指纹惰性去重，保留首次出现的表达式及原有顺序，可直接串接在生成器工厂之后。
+    元素可以是表达式字符串，也可以是 (alpha, decay) 元组（此时 decay 参与去重）。
+
+    Args:
+        expressions: 表达式或 (alpha, decay) 的可迭代对象。
+        seen: 已见过的指纹集合（compact_fingerprint），传入后会被更新，可跨多个工厂共享。
+    """
+    seen = set() if seen is None else seen
+    for item in expressions:
+        key = (compact_fingerprint(item[0]),) + tuple(item[1:]) if isinstance(item, tuple) else compact_fingerprint(item)
+        if key not in seen:
+            seen.add(key)
+            yield item
+
+
+def dedupe_expressions(expressions: Iterable, seen: Optional[set] = None) -> List:
+    """
+    iter_unique 的列表版本。
+    """
+    return list(iter_unique(expressions, seen))
+
+
+# 平台内置常量，作为名称出现但不是数据字段（不区分大小写）
+CONSTANTS = frozenset({'nan', 'true', 'false'})
+
+
+def referenced_fields(expression: Union[str, "MultiLineExpression", Program]) -> List[str]:
+    """
+    返回表达式引用的数据字段（按首次出现顺序去重）：不含函数名、关键字参数名、数字、字符串参数、
+    CONSTANTS 中的常量（nan、true、false），也不含赋值语句定义的局部变量（定义之前引用的同名变量仍视为字段）。
+    无法解析时退化为按词法单元提取：后面不是 '(' 或 '=' 的名称。
+
+    Raises:
+        FastExprSyntaxError: 表达式中有无法识别的字符。
+    """
+    if not isinstance(expression, Program):
+        expression = str(expression)
+        try:
+            expression = parse(expression)
+        except FastExprSyntaxError:
+            tokens = tokenize(expression)
+            # 末尾补一个空词法单元，最后一个名称也参与判断
+            return list(dict.fromkeys(value for (kind, value), (_, following) in zip(tokens, tokens[1:] + [('', '')])
+                                      if kind == 'name' and following not in ('(', '=')
+                                      and value.lower() not in CONSTANTS))
+    local_names, fields = set(), []
+    for statement in list(expression.assignments) + [Assign('', expression.result)]:
+        fields += [name for name in _walk_names(statement.value)
+                   if name not in local_names and name.lower() not in CONSTANTS]
+        if statement.name:
+            local_names.add(statement.name)
+    return list(dict.fromkeys(fields))
+
+
+def split_statements(text: str) -> List[str]:
+    """
+    按分号拆分多行表达式的语句（引号内的分号不拆），去掉首尾空白和空语句。
+    """
+    if "'" not in text and '"' not in text:
+        parts = text.split(";")
+    else:
+        parts, current, quote = [], [], None
+        for ch in text:
+            if quote:
+                if ch == quote:
+                    quote = None
+            elif ch in "'\"":
+                quote = ch
+            elif ch == ";":
+                parts.append("".join(current))
+                current = []
+                continue
+            current.append(ch)
+        parts.append("".join(current))
+    return [part.strip() for part in parts if part.strip()]
+
+
+class MultiLineExpression:
+    """
+    结构化的多行表达式：若干赋值语句加结果表达式。
+
+    wrap / assign / negate 只创建一个引用原表达式的新节点，不复制、不重新拆分原有语句，复杂度 O(1)；
+    一阶 → 二阶 → 三阶逐级包装时无需反复解析字符串，提交前由 to_string()（或 str()）序列化一次。
+    """
+    __slots__ = ('parent', 'statements', 'result')
+
+    def __init__(self, result: str, statements: Iterable[str] = (),
+                 parent: Optional["MultiLineExpression"] = None):
+        """
+        Args:
+            result: 结果表达式（最后一行，不带分号）。
+            statements: 本节点新增的赋值语句，如 'alpha = rank(x)'，不带分号。
+            parent: 前置表达式，其语句排在本节点语句之前，其结果已被本节点引用或丢弃。
+        """
+        self.parent = parent
+        self.statements = tuple(statements)
+        self.result = result
+
+    @classmethod
+    def from_string(cls, text: str) -> "MultiLineExpression":
+        """
+        由表达式文本构造：最后一条语句为结果，其余为赋值语句。单行表达式没有赋值语句。
+        """
+        statements = split_statements(text)
+        if not statements:
+            raise ValueError("empty expression")
+        return cls(statements[-1], statements[:-1])
+
+    @classmethod
+    def coerce(cls, expression: Union[str, "MultiLineExpression"]) -> "MultiLineExpression":
+        return expression if isinstance(expression, cls) else cls.from_string(expression)
+
+    def wrap(self, result: str) -> "MultiLineExpression":
+        """
+        以新的结果表达式包装，result 通常由 self.result 组成，例如 f"group_rank({expr.result}, sector)"。
+        """
+        return MultiLineExpression(result, (), self)
+
+    def assign(self, name: str, value: str) -> "MultiLineExpression":
+        """
+        追加赋值语句 name = value，并以 name 作为结果。
+        """
+        return MultiLineExpression(name, (f"{name} = {value}",), self)
+
+    def negate(self) -> "MultiLineExpression":
+        return self.wrap(f"-({self.result})")
+
+    @property
+    def is_single_line(self) -> bool:
+        return next(self.iter_statements(), None) is None
+
+    def iter_statements(self) -> Iterator[str]:
+        """
+        按顺序产出全部赋值语句。
+        """
+        chain = []
+        node = self
+        while node is not None:
+            chain.append(node.statements)
+            node = node.parent
+        for statements in reversed(chain):
+            yield from statements
+
+    def to_string(self, indent: str = "") -> str:
+        """
+        序列化为 FASTEXPR 文本：每条语句一行并以分号结尾，最后一行为结果。
+        """
+        lines = [f"{indent}{statement};" for statement in self.iter_statements()]
+        lines.append(indent + self.result)
+        return "\n".join(lines)
+
+    def __str__(self) -> str:
+        return self.to_string()
+
+    def __repr__(self) -> str:
+        return f"MultiLineExpression({self.to_string()!r})"
+
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, MultiLineExpression):
+            return NotImplemented
+        return self.result == other.result and list(self.iter_statements()) == list(other.iter_statements())
+
+    def __hash__(self) -> int:
+        return hash((self.result, tuple(self.iter_statements())))
@@ -0,0 +1,373 @@
+import ast
+import os
+import sqlite3
+import threading
+from fnmatch import fnmatch
+from functools import lru_cache
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import pandas as pd
+
+from fastexpr import FastExprSyntaxError, referenced_fields
+
+CATALOG_COLUMNS = ['id', 'region', 'universe', 'delay', 'dataset', 'category', 'type', 'coverage',
+                   'user_count', 'alpha_count', 'description']
+# 未指定的 region、universe、delay 存为 '' 和 -1：SQLite 的 UNIQUE 约束把 NULL 视为互不相同，
+# 存 NULL 时重复导入不会命中 ON CONFLICT，而是产生重复行。读出时再还原为 None。
+SCOPE_DEFAULTS = {'region': '', 'universe': '', 'delay': -1}
+# 平台内置的分组名，不一定出现在爬取的字段目录中
+BUILTIN_FIELDS = frozenset({'market', 'sector', 'industry', 'subindustry', 'exchange', 'country'})
+
+
+@lru_cache(maxsize=4096)
+def _parse_nested(value: str):
+    try:
+        return ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return value
+
+
+def _nested_id(value) -> Optional[str]:
+    """
+    接口返回的 dataset、category 为 {'id': ..., 'name': ...}，写入 CSV 后变为字符串，统一取出 id。
+    """
+    if isinstance(value, str) and value.startswith("{"):
+        # 同一数据集的字段共享同一个字符串，缓存解析结果
+        value = _parse_nested(value)
+    if isinstance(value, dict):
+        return value.get('id')
+    if value is None or (isinstance(value, float) and value != value):
+        return None
+    return str(value)
+
+
+def _number(value) -> Optional[float]:
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        return None
+    return None if value != value else value
+
+
+def _select_column(column: str, prefix: str = "") -> str:
+    # 读出时把 SCOPE_DEFAULTS 还原为 NULL
+    if column in SCOPE_DEFAULTS:
+        return f"NULLIF({prefix}{column}, {SCOPE_DEFAULTS[column]!r}) AS {column}"
+    return prefix + column
+
+
+class FieldCatalog:
+    """
+    本地数据字段目录：把爬取到的所有数据字段存入一个 SQLite 库，按区域、股票池、数据集、类型、覆盖率等建索引，
+    并对描述建立全文索引。选字段只需一次查询，无需每次重新扫描 CSV 目录。
+    """
+
+    def __init__(self, path: str = "data/field_catalog.db"):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS fields (
+                    rowid INTEGER PRIMARY KEY,
+                    id TEXT NOT NULL,
+                    region TEXT NOT NULL DEFAULT '',
+                    universe TEXT NOT NULL DEFAULT '',
+                    delay INTEGER NOT NULL DEFAULT -1,
+                    dataset TEXT,
+                    category TEXT,
+                    type TEXT,
+                    coverage REAL,
+                    user_count INTEGER,
+                    alpha_count INTEGER,
+                    description TEXT,
+                    UNIQUE (id, region, universe, delay)
+                );
+                CREATE INDEX IF NOT EXISTS idx_fields_scope ON fields(region, universe, delay, type);
+                CREATE INDEX IF NOT EXISTS idx_fields_dataset ON fields(dataset);
+                CREATE INDEX IF NOT EXISTS idx_fields_id ON fields(id);
+                CREATE VIRTUAL TABLE IF NOT EXISTS fields_fts USING fts5(
+                    id, description, content='fields', content_rowid='rowid');
+                CREATE TRIGGER IF NOT EXISTS fields_ai AFTER INSERT ON fields BEGIN
+                    INSERT INTO fields_fts(rowid, id, description) VALUES (new.rowid, new.id, new.description);
+                END;
+                CREATE TRIGGER IF NOT EXISTS fields_ad AFTER DELETE ON fields BEGIN
+                    INSERT INTO fields_fts(fields_fts, rowid, id, description)
+                    VALUES ('delete', old.rowid, old.id, old.description);
+                END;
+                CREATE TRIGGER IF NOT EXISTS fields_au AFTER UPDATE ON fields BEGIN
+                    INSERT INTO fields_fts(fields_fts, rowid, id, description)
+                    VALUES ('delete', old.rowid, old.id, old.description);
+                    INSERT INTO fields_fts(rowid, id, description) VALUES (new.rowid, new.id, new.description);
+                END;
+            """)
+            self._migrate_null_scope()
+
+    def _migrate_null_scope(self) -> None:
+        """
+        旧版本的库中 region、universe、delay 可能为 NULL（且可能因此有重复行）：保留每组最后写入的一行，
+        再把 NULL 改为 SCOPE_DEFAULTS。调用方持有锁。
+        """
+        if self._conn.execute("SELECT 1 FROM fields WHERE region IS NULL OR universe IS NULL OR delay IS NULL "
+                              "LIMIT 1").fetchone() is None:
+            return
+        self._conn.execute("BEGIN")
+        self._conn.execute("""
+            DELETE FROM fields WHERE rowid NOT IN (
+                SELECT MAX(rowid) FROM fields
+                GROUP BY id, IFNULL(region, ''), IFNULL(universe, ''), IFNULL(delay, -1))""")
+        self._conn.execute("""
+            UPDATE fields SET region = IFNULL(region, ''), universe = IFNULL(universe, ''), delay = IFNULL(delay, -1)
+            WHERE region IS NULL OR universe IS NULL OR delay IS NULL""")
+        self._conn.execute("COMMIT")
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def add_records(self,
+                    records: Iterable[Dict],
+                    region: Optional[str] = None,
+                    universe: Optional[str] = None,
+                    delay: Optional[int] = None) -> int:
+        """
+        写入 /data-fields 接口返回的字段记录（或由其保存的 CSV 行），已存在的字段会被更新。
+        记录中缺少 region、universe、delay 时使用参数值。
+
+        Returns:
+            int: 写入的记录数。
+        """
+        rows = []
+        for record in records:
+            record_delay = record.get('delay', delay)
+            rows.append((
+                record['id'],
+                record.get('region') or region or SCOPE_DEFAULTS['region'],
+                record.get('universe') or universe or SCOPE_DEFAULTS['universe'],
+                int(record_delay) if _number(record_delay) is not None else SCOPE_DEFAULTS['delay'],
+                _nested_id(record.get('dataset')),
+                _nested_id(record.get('category')),
+                record.get('type'),
+                _number(record.get('coverage')),
+                _number(record.get('userCount')),
+                _number(record.get('alphaCount')),
+                record.get('description') if isinstance(record.get('description'), str) else None,
+            ))
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(f"""
+                INSERT INTO fields ({', '.join(CATALOG_COLUMNS)}) VALUES ({', '.join('?' * len(CATALOG_COLUMNS))})
+                ON CONFLICT (id, region, universe, delay) DO UPDATE SET
+                    dataset = excluded.dataset, category = excluded.category, type = excluded.type,
+                    coverage = excluded.coverage, user_count = excluded.user_count,
+                    alpha_count = excluded.alpha_count, description = excluded.description""", rows)
+            self._conn.execute("COMMIT")
+        return len(rows)
+
+    def add_dataframe(self, df: pd.DataFrame, **scope) -> int:
+        """
+        写入 get_datafields 返回的 DataFrame。scope 同 add_records 的 region、universe、delay。
+        """
+        return self.add_records(df.to_dict("records"), **scope)
+
+    def import_csv_directory(self,
+                             directory_path: str,
+                             suffix_pattern: str = "*.csv",
+                             **scope) -> int:
+        """
+        导入目录下爬取保存的字段 CSV（与 get_ids_from_csv_directory 读取的文件相同）。
+        缺少 'id' 列的文件会被跳过。
+
+        Returns:
+            int: 导入的记录数。
+        """
+        total = 0
+        for file_name in sorted(os.listdir(directory_path)):
+            if not fnmatch(file_name, suffix_pattern):
+                continue
+            csv_file_path = os.path.join(directory_path, file_name)
+            try:
+                df = pd.read_csv(csv_file_path)
+            except (pd.errors.EmptyDataError, pd.errors.ParserError) as e:
+                print(f"读取文件 {csv_file_path} 时发生错误: {e}，跳过")
+                continue
+            if 'id' not in df.columns:
+                print(f"文件 {csv_file_path} 中缺少 'id' 列，跳过")
+                continue
+            total += self.add_dataframe(df, **scope)
+        print(f"从 {directory_path} 导入 {total} 条字段记录")
+        return total
+
+    def crawl(self, s, region: str, universe: str, delay: int = 1, dataset_ids: Iterable[str] = (),
+              instrument_type: str = 'EQUITY') -> int:
+        """
+        通过 get_datafields（带本地缓存）拉取指定数据集的字段并写入目录。
+        """
+        from machine_lib import get_datafields
+
+        total = 0
+        for dataset_id in dataset_ids:
+            df = get_datafields(s, instrument_type, region, delay, universe, dataset_id=dataset_id)
+            if not df.empty:
+                total += self.add_dataframe(df, region=region, universe=universe, delay=delay)
+        return total
+
+    def query(self,
+              region: Optional[str] = None,
+              universe: Optional[str] = None,
+              delay: Optional[int] = None,
+              dataset: Optional[str] = None,
+              category: Optional[str] = None,
+              field_type: Optional[str] = None,
+              min_coverage: Optional[float] = None,
+              min_user_count: Optional[int] = None,
+              max_alpha_count: Optional[int] = None,
+              id_pattern: Optional[str] = None,
+              search: Optional[str] = None,
+              order_by: str = "id",
+              limit: Optional[int] = None) -> pd.DataFrame:
+        """
+        按条件查询字段，所有条件之间为“且”关系，None 表示不过滤。
+
+        Args:
+            region, universe, delay: 区域、股票池、延迟。
+            dataset, category: 数据集 ID、类别 ID。
+            field_type: 字段类型，如 'MATRIX'、'VECTOR'、'GROUP'。
+            min_coverage: 最低覆盖率。
+            min_user_count: 最少使用人数。
+            max_alpha_count: 最多 alpha 数，用于挑选较少被使用的字段。
+            id_pattern: 字段 ID 的 glob 模式，例如 'anl15_*_gro'。
+            search: 对 ID 和描述的全文检索（FTS5 语法），例如 'earnings OR revenue'、'"free cash flow"'。
+            order_by: 排序列，检索时可用 'rank' 按相关度排序。
+            limit: 最多返回条数。
+
+        Returns:
+            pd.DataFrame: 列为 CATALOG_COLUMNS。
+        """
+        conditions, params = [], []
+        for column, value in [('region', region), ('universe', universe), ('delay', delay), ('dataset', dataset),
+                              ('category', category), ('type', field_type)]:
+            if value is not None:
+                conditions.append(f"f.{column} = ?")
+                params.append(value)
+        for column, op, value in [('coverage', '>=', min_coverage), ('user_count', '>=', min_user_count),
+                                  ('alpha_count', '<=', max_alpha_count)]:
+            if value is not None:
+                conditions.append(f"f.{column} {op} ?")
+                params.append(value)
+        if id_pattern is not None:
+            conditions.append("f.id GLOB ?")
+            params.append(id_pattern)
+        source = "fields f"
+        if search:
+            source += " JOIN fields_fts ON fields_fts.rowid = f.rowid"
+            conditions.append("fields_fts MATCH ?")
+            params.append(search)
+        if order_by not in CATALOG_COLUMNS + (['rank'] if search else []):
+            raise ValueError(f"unsupported order_by: {order_by}")
+        sql = f"SELECT {', '.join(_select_column(c, 'f.') for c in CATALOG_COLUMNS)} FROM {source}"
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += f" ORDER BY {order_by if order_by == 'rank' else 'f.' + order_by}"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return pd.DataFrame(rows, columns=CATALOG_COLUMNS)
+
+    def ids(self, **filters) -> List[str]:
+        """
+        返回满足条件的去重字段 ID 列表，条件同 query。
+        """
+        return list(dict.fromkeys(self.query(**filters)['id']))
+
+    def counts(self) -> pd.DataFrame:
+        """
+        按区域、股票池、延迟、类型统计字段数。
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {', '.join(_select_column(c) for c in ('region', 'universe', 'delay', 'type'))}, COUNT(*) "
+                "FROM fields "
+                "GROUP BY region, universe, delay, type").fetchall()
+        return pd.DataFrame(rows, columns=['region', 'universe', 'delay', 'type', 'count'])
+
+
+class FieldValidator:
+    """
+    按字段目录校验表达式引用的数据字段：用 fastexpr 的词法 / 语法分析取出全部字段，
+    与指定区域、股票池、延迟下的字段集合比对，在表达式进入模拟队列之前剔除引用了不存在字段的表达式。
+    字段集合在构造时一次性读入内存，校验不再访问数据库。
+    """
+
+    def __init__(self,
+                 catalog: FieldCatalog,
+                 region: str,
+                 universe: Optional[str] = None,
+                 delay: Optional[int] = 1,
+                 extra_fields: Iterable[str] = BUILTIN_FIELDS):
+        """
+        Args:
+            catalog: 字段目录。
+            region, universe, delay: 校验范围，universe 或 delay 为 None 时不按其过滤。
+            extra_fields: 目录之外也视为可用的名称，默认为平台内置的分组名。
+
+        Raises:
+            ValueError: 目录中没有该范围的字段（通常是尚未导入或爬取）。
+        """
+        known = catalog.ids(region=region, universe=universe, delay=delay)
+        if not known:
+            raise ValueError(f"字段目录中没有 {region}/{universe}/{delay} 的字段，请先导入或爬取")
+        self.scope = (region, universe, delay)
+        self.fields = frozenset(known) | frozenset(extra_fields)
+
+    def missing_fields(self, expression) -> List[str]:
+        """
+        返回表达式中不在目录里的字段。
+
+        Raises:
+            FastExprSyntaxError: 表达式中有无法识别的字符。
+        """
+        return [field for field in referenced_fields(expression) if field not in self.fields]
+
+    def is_valid(self, expression) -> bool:
+        try:
+            return not self.missing_fields(expression)
+        except FastExprSyntaxError:
+            return False
+
+    def iter_valid(self, items: Iterable, verbose: bool = True) -> Iterator:
+        """
+        过滤掉引用了不存在字段（或含无法识别字符）的表达式（生成器），可直接串在工厂函数之后。
+
+        Args:
+            items: 表达式（字符串或 MultiLineExpression），或 (alpha, decay) 元组，原样产出。
+            verbose: 遍历结束时打印被过滤的数量及出现最多的未知字段。
+        """
+        unknown: Dict[str, int] = {}
+        dropped = 0
+        for item in items:
+            alpha = item[0] if isinstance(item, tuple) else item
+            try:
+                missing = self.missing_fields(alpha)
+            except FastExprSyntaxError:
+                missing = ['<syntax error>']
+            if missing:
+                dropped += 1
+                for field in missing:
+                    unknown[field] = unknown.get(field, 0) + 1
+                continue
+            yield item
+        if verbose and dropped:
+            top = sorted(unknown.items(), key=lambda item: -item[1])[:10]
+            print(f"Dropped {dropped} expressions with fields unavailable in {'/'.join(map(str, self.scope))}: "
+                  + ", ".join(f"{field}({count})" for field, count in top))
+
+    def filter(self, expressions: Iterable, verbose: bool = True) -> list:
+        """
+        iter_valid 的列表版本。
+        """
+        return list(self.iter_valid(expressions, verbose))
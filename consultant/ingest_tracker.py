@@ -0,0 +1,242 @@
+"""
+模拟结果文件的增量读取：模拟器只会向 output/simulated_alphas_<REGION>.csv.<date> 追加，
+因此为每个文件记录已消费到的字节偏移量和表头指纹，之后只解析新追加的完整记录。
+没有新数据时一次轮询只需一次 stat 和读取表头行，耗时为毫秒级。
+
+- 文件末尾尚未写完的记录（最后一行没有换行，或引号内的换行尚未闭合）留到下次读取；
+- 表头变化、文件变短，或偏移量之前的最后一段字节与上次读取时不同（被 repair_csv / sort_csv 等原地重写，
+  表头相同且文件更长）时从头重新读取，并通知调用方丢弃旧结果；
+- 偏移量在调用方取走下一块（或遍历结束）时才提交，中途中断的块下次会重新读取（至少一次）。
+
+用法：
+    tracker = IngestionTracker()
+    restarted, new_records = tracker.poll_alpha_records(path, 1.0, 0.3, "submit", "USA", single_data_set_filter=True)
+    if restarted:
+        tracker_list = []                    # 文件被重写，new_records 为整个文件的结果
+    tracker_list += new_records
+    tracker.ingest_new(path, store)          # 增量写入 ResultsStore
+"""
+import csv
+import hashlib
+import io
+import json
+import os
+import sqlite3
+import threading
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import pandas as pd
+
+from csv_stream import fit_row
+from results_store import ResultsStore, results_frame
+
+DEFAULT_BLOCK_SIZE = 64 * 1024 * 1024
+# 用偏移量之前最多这么多字节的指纹判断已读部分是否被改写
+TAIL_BYTES = 4096
+
+
+def _tail_hash(f, start: int, offset: int) -> str:
+    """
+    文件 [max(start, offset - TAIL_BYTES), offset) 字节的指纹，读取后恢复文件位置。
+    """
+    position = f.tell()
+    lo = max(start, offset - TAIL_BYTES)
+    f.seek(lo)
+    digest = hashlib.md5(f.read(offset - lo)).hexdigest()
+    f.seek(position)
+    return digest
+
+
+def _complete_length(data: bytes) -> int:
+    """
+    返回 data 中完整记录部分的字节数：截止到最后一个不在引号内的换行。末尾缺少换行的记录不计入，等待写完。
+    """
+    end = 0
+    quotes = 0
+    start = 0
+    while True:
+        newline = data.find(b"\n", start)
+        if newline < 0:
+            break
+        quotes += data.count(b'"', start, newline)
+        start = newline + 1
+        # CSV 中引号成对出现（转义为 ""），偶数个时换行位于引号外，是记录边界
+        if quotes % 2 == 0:
+            end = start
+    return end
+
+
+class IngestionTracker:
+    """
+    记录每个结果文件已消费的位置：(表头指纹, 字节偏移量, 已读行数, 偏移量前末尾字节的指纹)，保存在 SQLite 中，
+    多个 notebook 可共享。
+    """
+
+    def __init__(self, path: str = "output/ingestion.db"):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS files (
+                    path TEXT PRIMARY KEY,
+                    header_hash TEXT NOT NULL,
+                    header TEXT NOT NULL,
+                    offset INTEGER NOT NULL,
+                    rows INTEGER NOT NULL,
+                    tail_hash TEXT NOT NULL DEFAULT ''
+                )""")
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(files)")]
+            if 'tail_hash' not in columns:
+                # 旧版本的库没有该列，空指纹的文件下次从头重新读取一次
+                self._conn.execute("ALTER TABLE files ADD COLUMN tail_hash TEXT NOT NULL DEFAULT ''")
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def state(self, csv_path: str) -> Optional[Tuple[str, List[str], int, int, str]]:
+        """
+        返回 (表头指纹, 表头, 字节偏移量, 已读行数, 偏移量前末尾字节的指纹)，未读过时为 None。
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT header_hash, header, offset, rows, tail_hash FROM files WHERE path = ?",
+                                     (os.path.abspath(csv_path),)).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]), row[2], row[3], row[4]
+
+    def _commit(self, csv_path: str, header_hash: str, header: List[str], offset: int, rows: int,
+                tail_hash: str) -> None:
+        with self._lock:
+            self._conn.execute("""
+                INSERT INTO files (path, header_hash, header, offset, rows, tail_hash) VALUES (?, ?, ?, ?, ?, ?)
+                ON CONFLICT (path) DO UPDATE SET header_hash = excluded.header_hash, header = excluded.header,
+                    offset = excluded.offset, rows = excluded.rows, tail_hash = excluded.tail_hash""",
+                               (os.path.abspath(csv_path), header_hash, json.dumps(header), offset, rows,
+                                tail_hash))
+
+    def reset(self, csv_path: Optional[str] = None) -> None:
+        """
+        清除某个文件（或全部文件）的读取位置，下次从头读取。
+        """
+        with self._lock:
+            if csv_path is None:
+                self._conn.execute("DELETE FROM files")
+            else:
+                self._conn.execute("DELETE FROM files WHERE path = ?", (os.path.abspath(csv_path),))
+
+    def iter_new_chunks(self, csv_path: str, block_size: int = DEFAULT_BLOCK_SIZE
+                        ) -> Iterator[Tuple[int, bool, List[Dict[str, str]]]]:
+        """
+        逐块产出新追加的完整记录（生成器）。
+
+        Args:
+            csv_path: 结果文件路径。
+            block_size: 每次读取的字节数，决定内存上限（单条记录超过该大小时按需扩大）。
+
+        Yields:
+            (起始字节偏移量, 是否从头重新读取, 记录列表)：记录为 {列名: 字符串}，字段数与表头不一致的行已修复。
+            “从头重新读取”只会出现在第一块（此时记录列表可能为空），表示文件已被重写（表头变化、文件变短，
+            或已读部分末尾的字节变化），之前读到的结果应丢弃。
+        """
+        state = self.state(csv_path)
+        with open(csv_path, "rb") as f:
+            header_line = f.readline()
+            if not header_line.endswith(b"\n"):
+                return  # 表头还没写完
+            header_hash = hashlib.md5(header_line).hexdigest()
+            header_length = len(header_line)
+            size = os.fstat(f.fileno()).st_size
+            restarted = False
+            if state is None or state[0] != header_hash or size < state[2] \
+                    or _tail_hash(f, header_length, state[2]) != state[4]:
+                restarted = state is not None
+                header = next(csv.reader([header_line.decode("utf-8")]))
+                offset, rows = header_length, 0
+            else:
+                _, header, offset, rows, _ = state
+            if offset >= size:
+                if restarted:
+                    yield offset, True, []
+                if restarted or state is None:
+                    self._commit(csv_path, header_hash, header, offset, rows, _tail_hash(f, header_length, offset))
+                return
+
+            width = len(header)
+            f.seek(offset)
+            pending = b""
+            while True:
+                block = f.read(block_size)
+                data = pending + block
+                final = not block
+                length = _complete_length(data)
+                if length == 0:
+                    if final:
+                        break
+                    # 单条记录超过 block_size，继续累积
+                    pending = data
+                    continue
+                text = data[:length].decode("utf-8")
+                records = [dict(zip(header, fit_row(row, width) if len(row) != width else row))
+                           for row in csv.reader(io.StringIO(text, newline=""))]
+                start = offset
+                offset += length
+                rows += len(records)
+                pending = data[length:]
+                if records or restarted:
+                    yield start, restarted, records
+                    restarted = False
+                # 调用方取走下一块时，上一块已经处理完毕，再提交偏移量
+                self._commit(csv_path, header_hash, header, offset, rows, _tail_hash(f, header_length, offset))
+                if final:
+                    break
+            if restarted or state is None:
+                self._commit(csv_path, header_hash, header, offset, rows, _tail_hash(f, header_length, offset))
+
+    def poll_frame(self, csv_path: str, processes: Optional[int] = None) -> Tuple[bool, pd.DataFrame]:
+        """
+        返回 (是否从头重新读取, 新追加记录展开后的结果)，结果为 results_frame 的格式，没有新记录时为空 DataFrame。
+        重新读取时结果是重写后整个文件的内容，调用方应先丢弃之前累积的结果再合并。
+        """
+        restarted = False
+        frames = []
+        for _, chunk_restarted, records in self.iter_new_chunks(csv_path):
+            restarted |= chunk_restarted
+            frames.append(results_frame(records, processes))
+        if not frames:
+            return restarted, results_frame([])
+        return restarted, pd.concat(frames, ignore_index=True)
+
+    def poll_alpha_records(self, csv_path: str, min_sharpe: float, min_fitness: float, mode: str = "track",
+                           region_filter: Optional[str] = None, single_data_set_filter: Optional[bool] = None,
+                           processes: Optional[int] = None) -> Tuple[bool, list]:
+        """
+        只对新追加的记录做 get_alphas_from_csv 的筛选，返回 (是否从头重新读取, 同样格式的记录)。
+        未重新读取时记录可直接追加到 tracker 列表；重新读取时记录是重写后整个文件的结果，应先清空 tracker 列表。
+        """
+        from machine_lib_output import alpha_records_from_frame
+
+        restarted = False
+        output = []
+        for _, chunk_restarted, records in self.iter_new_chunks(csv_path):
+            restarted |= chunk_restarted
+            if records:
+                output += alpha_records_from_frame(results_frame(records, processes), min_sharpe, min_fitness,
+                                                   mode, region_filter, single_data_set_filter)
+        return restarted, output
+
+    def ingest_new(self, csv_path: str, store: ResultsStore, processes: Optional[int] = None) -> int:
+        """
+        把新追加的记录写入 ResultsStore，每块写为 "<源文件名>@<起始偏移量>" 分区文件；
+        文件被重写时先删除该文件之前写入的全部分区。返回写入的行数。
+        """
+        source = os.path.basename(csv_path)
+        total = 0
+        for start, restarted, records in self.iter_new_chunks(csv_path):
+            if restarted:
+                store.remove_source(source)
+            total += store.ingest_frame(results_frame(records, processes), f"{source}@{start:012d}")
+        return total
@@ -3,9 +3,14 @@ from machine_lib import *
 
 import os
 import csv
-from typing import List, Tuple
+from typing import Iterable, List, Optional, Tuple
 import re
 from fnmatch import fnmatch
+from fastexpr import FastExprSyntaxError, MultiLineExpression, compact_fingerprint, referenced_fields
+from region_registry import load_registry
+from complexity import ComplexityLimits, check, limited_by_complexity
+from results_store import load_results_csv
+from csv_stream import CsvReader, count_rows, sort_csv, split_rows, write_csv
 
 ts_ops_2 = ["ts_rank", "ts_zscore", "ts_sum", "ts_delay", "ts_av_diff", "ts_ir",
             "ts_std_dev", "ts_mean",  "ts_arg_min", "ts_arg_max","ts_scale", "ts_quantile",
@@ -172,7 +177,8 @@ def extract_target_data_fields(file_path):
 def filter_expressions_by_list_b(expression_list, list_b):
     """
     根据 list_b 过滤表达式列表，只保留所有字段都在 list_b 中的表达式。
-    支持函数式表达式（如 subtract(arg1 ,arg2)）和数学式表达式（如 arg1 / arg2）。
+    支持任意 FASTEXPR 表达式（如 subtract(arg1 ,arg2)、arg1 / arg2、多行表达式）。
+    需要按区域 / 股票池校验时使用 field_catalog.FieldValidator。
 
     Args:
         expression_list (list): 表达式列表，例如 ['subtract(anl14_high_cfps_fp3 ,anl14_high_div_fp3)', 'fnd17_2anrhsfcfq / fnd17_2rhsfcfq']
@@ -181,19 +187,9 @@ def filter_expressions_by_list_b(expression_list, list_b):
     Returns:
         list: 过滤后的表达式列表
     """
-    common_list = ['0', '4', '6', '9766', '1', '2', '3', '5', '10', '20', '250', '01', '90', '7',
-                   '21', '50', '100', '252', '60', '40', '63', '365', 'ts_rank', 'ts_delay', 
-                   'vec_avg', 'abs', 'ts_mean', 'power',
-                   'ts_std_dev', 'ts_sum', 'ts_delta', 'signed_power', 'log']
     # 将 list_b 转换为集合，便于快速查找
-    list_b_set = set(list_b + common_list)
-    
-    # 正则表达式 1：匹配函数式表达式 function_name(arg1 ,arg2)
-    func_pattern = r'^(subtract|add|divide|ts_corr|multiply)\(([^,]+)\s*,\s*([^)]+)\)'
-    
-    # 正则表达式 2：匹配字段名称（字母、数字、下划线组成）
-    field_pattern = r'[a-zA-Z0-9_]+'
-    
+    list_b_set = set(list_b)
+
     # 存储过滤后的表达式
     filtered_expressions = []
     
@@ -203,20 +199,15 @@ def filter_expressions_by_list_b(expression_list, list_b):
     # 遍历表达式列表
     for expr in expression_list:
         expr = expr.strip()
-        
-        # 首先尝试匹配函数式表达式
-        func_match = re.match(func_pattern, expr)
-        if func_match:
-            # 提取 arg1 和 arg2
-            arg1 = func_match.group(2).strip()
-            arg2 = func_match.group(3).strip()
-            fields = [arg1, arg2]
-        else:
-            # 如果不是函数式表达式，视为数学式表达式，提取所有字段
-            fields = re.findall(field_pattern, expr)
-            if not fields:
-                print(f"表达式 '{expr}' 格式不正确或无有效字段，跳过")
-                continue
+
+        # 用 fastexpr 的词法 / 语法分析提取字段，函数名、关键字参数名、数字和局部变量不计入
+        try:
+            fields = referenced_fields(expr)
+        except FastExprSyntaxError:
+            fields = []
+        if not fields:
+            print(f"表达式 '{expr}' 格式不正确或无有效字段，跳过")
+            continue
         
         # 检查所有字段是否都在 list_b 中
         missing_fields = [field for field in fields if field not in list_b_set]
@@ -231,24 +222,34 @@ def filter_expressions_by_list_b(expression_list, list_b):
     return filtered_expressions
 
 
-def generate_pending_simulation_data(alpha_pool: List[Tuple[str, int]],
+def generate_pending_simulation_data(alpha_pool: Iterable[Tuple[str, int]],
                                      neut: str,
                                      region: str,
                                      universe: str,
                                      max_trade: str,
                                      visualization: bool = False,
                                      mode: str = "append",
-                                     output_filename: str = None) -> None:
+                                     output_filename: str = None,
+                                     queue=None,
+                                     dedupe: bool = False,
+                                     limits: Optional[ComplexityLimits] = None,
+                                     validator=None) -> None:
     """
     生成待模拟的 alpha 数据并写入指定的 CSV 文件。
 
     Args:
-        alpha_pool (List[Tuple[str, int]]): 任务列表，每个任务包含多个 (alpha, decay) 元组。
+        alpha_pool (Iterable[Tuple[str, int]]): (alpha, decay) 元组，可以是生成器，逐条写入不占用额外内存。
         neut (str): 中性化参数，如 "MARKET", "SECTOR", "COUNTRY"。
         region (str): 区域，如 "USA"。
         universe (str): 投资宇宙，如 "TOP3000"。
         mode (str): 文件操作模式，"append" 表示追加，"overwrite" 表示删除后新建，默认为 "append"。
         output_filename (str, optional): 输出文件名，若未指定则使用默认值 "alpha_list_pending_simulated.csv"。
+        queue (SimulationQueue, optional): 持久化模拟队列，指定时同时写入队列（已存在的条目自动忽略），
+            供 sim_scheduler.queue_simulate 断点续跑。
+        dedupe (bool): 是否按表达式指纹（fastexpr.fingerprint）和 decay 去重，默认关闭，与原先逐条写入的结果一致。
+        limits (ComplexityLimits, optional): 复杂度上限（如 complexity.PLATFORM_LIMITS、PYRAMID_LIMITS），
+            指定时跳过算子数、嵌套深度或回看窗口超限的表达式，不写入文件和队列。
+        validator (FieldValidator, optional): 字段校验器，指定时跳过引用了该区域 / 股票池下不存在字段的表达式。
 
     Returns:
         None: 数据直接写入文件，不返回任何值。
@@ -297,19 +298,45 @@ def generate_pending_simulation_data(alpha_pool: List[Tuple[str, int]],
         if file_mode == 'w' or (file_mode == 'a' and os.path.getsize(output_file) == 0):
             writer.writeheader()
 
+        # 待写入队列的条目，按批提交以减少事务次数
+        queue_batch = []
+        # 已写入的 (表达式指纹, decay)，跳过仅空白、布局或变量名不同的重复表达式
+        seen = set()
+        skipped = 0
+        over_limit = 0
+        unknown_fields = 0
+
         # 遍历 alpha_pool 中的每个项目
         for x, item in enumerate(alpha_pool):
             # 处理不同的输入结构
             if isinstance(item, tuple) and len(item) >= 2:
                 # 标准格式: (alpha, decay)
                 alpha, decay = item[0], item[1]
-            elif isinstance(item, str):
+            elif isinstance(item, (str, MultiLineExpression)):
                 # 只有 alpha 字符串，使用默认 decay
                 alpha = item
                 decay = 0  # 默认 decay 值
             else:
                 print(f"跳过无效项目: {item}")
                 continue
+
+            # 结构化的多行表达式在写出前序列化一次
+            alpha = str(alpha)
+
+            if dedupe:
+                key = (compact_fingerprint(alpha), decay)
+                if key in seen:
+                    skipped += 1
+                    continue
+                seen.add(key)
+
+            if limits is not None and check(alpha, limits):
+                over_limit += 1
+                continue
+
+            if validator is not None and not validator.is_valid(alpha):
+                unknown_fields += 1
+                continue
             
             # 构造 simulation_data，与 single_simulate 一致
             simulation_data = {
@@ -333,12 +360,27 @@ def generate_pending_simulation_data(alpha_pool: List[Tuple[str, int]],
                 'regular': alpha  # alpha 表达式
             }
 
+            if queue is not None:
+                queue_batch.append(dict(simulation_data))
+                if len(queue_batch) >= 1000:
+                    queue.enqueue(queue_batch)
+                    queue_batch = []
+
             # 将 settings 转换为字符串，以便写入 CSV
             simulation_data['settings'] = str(simulation_data['settings'])
 
             # 写入一行 simulation_data
             writer.writerow(simulation_data)
 
+        if queue is not None and queue_batch:
+            queue.enqueue(queue_batch)
+
+    if skipped:
+        print(f"Skipped {skipped} duplicate expressions")
+    if over_limit:
+        print(f"Skipped {over_limit} expressions over complexity limits {limits}")
+    if unknown_fields:
+        print(f"Skipped {unknown_fields} expressions referencing fields unavailable in {region}/{universe}")
     print(f"All simulation data written to {output_file} in {mode} mode")
 
 
@@ -559,6 +601,18 @@ def process_list_datafields(df_list):
     return ["winsorize(ts_backfill(%s, 120), std=4)"%field for field in df_list]
 
 
+def iter_txt_lines(file_path="data/datafield.txt"):
+    """
+    逐行读取 txt 文件（去除首尾空白），以生成器方式返回，不把整个文件读入内存。
+
+    Raises:
+        FileNotFoundError: 文件不存在。
+    """
+    with open(file_path, 'r', encoding='utf-8') as file:
+        for line in file:
+            yield line.strip()
+
+
 def read_txt_to_list(file_path="data/datafield.txt") -> list:
     """
     将 txt 文件中的内容读取到列表，每行作为一个元素。
@@ -572,16 +626,8 @@ def read_txt_to_list(file_path="data/datafield.txt") -> list:
     Raises:
         FileNotFoundError: 如果文件不存在，抛出异常并返回空列表。
     """
-    result = []  # 初始化空列表，用于存储文件内容
-
     try:
-        # 以读取模式打开文件
-        with open(file_path, 'r', encoding='utf-8') as file:
-            # 逐行读取文件内容
-            for line in file:
-                # 去除每行首尾的空白字符（如换行符 \n），并添加到列表
-                result.append(line.strip())
-
+        result = list(iter_txt_lines(file_path))
         print(f"Successfully read {len(result)} lines from {file_path}")
         return result
 
@@ -671,23 +717,22 @@ def merge_csv_files(file_a_path, file_b_path, mode='prepend'):
         raise RuntimeError(f"文件合并失败：{e}")
 
 
-def fetch_data(session, params):
+def fetch_data(session, params, refresh=False):
     """
     使用 session.get 方法调用 API 获取数据集，并返回 DataFrame 格式的 results 数据。
 
     Args:
         session: requests.Session 对象，用于发送 HTTP 请求。
         params (dict): API 请求参数字典，例如 {'category': 'analyst', 'instrumentType': 'EQUITY', ...}。
+        refresh (bool): 为 True 时忽略本地缓存重新请求。
 
     Returns:
         pd.DataFrame: API 返回的 results 数据，转换为 DataFrame 格式。如果请求失败或无数据，返回空的 DataFrame。
     """
-    base_url = "https://api.worldquantbrain.com/data-sets"
+    base_url = brain_api_url + "/data-sets"
     try:
-        # 使用 session.get 发送请求，params 自动转换为查询字符串
-        response = session.get(base_url, params=params)
-        response.raise_for_status()  # 检查请求是否成功，若失败抛出异常
-        data = response.json()
+        # 优先读取本地缓存，未命中时经限流器请求；请求失败时抛出异常
+        data = api_cache.get_json(session, base_url, params=params, refresh=refresh)
         results = data.get('results', [])
         if not results:
             print(f"类别 '{params.get('category', 'unknown')}' 未返回数据")
@@ -719,9 +764,9 @@ def write_to_csv(data, filename):
             writer.writerow(row)
 
 import csv
-import ast
 
-def get_alphas_from_csv(csv_file_path, min_sharpe, min_fitness, mode="track", region_filter=None, single_data_set_filter=None):
+def get_alphas_from_csv(csv_file_path, min_sharpe, min_fitness, mode="track", region_filter=None, single_data_set_filter=None,
+                        processes=None, as_batch=False):
     """
     Process CSV file to generate alpha records in the format:
     [alpha_id, exp, sharpe, turnover, fitness, margin, dateCreated, decay]
@@ -733,9 +778,14 @@ def get_alphas_from_csv(csv_file_path, min_sharpe, min_fitness, mode="track", re
         mode: Filter mode - 'submit' or 'track' (default: 'track')
         region_filter: Optional region filter (e.g. "USA"). If None, no region filtering.
         single_data_set_filter: Optional boolean to filter Single Data Set Alphas. If None, no filtering.
+        processes: Parse the literal columns in a process pool of this size on the first load.
+        as_batch: Return an alpha_records.AlphaBatch (columnar, named fields) instead of a list of lists.
+
+    The file is parsed once (results_store.load_results_csv, cached until it changes);
+    repeated calls with other thresholds only run column filters.
     
     Returns:
-        List of filtered alpha records
+        List of filtered alpha records, or an AlphaBatch when as_batch is True
 
     Examples:
         # Basic usage - filter by sharpe and fitness only
@@ -752,136 +802,68 @@ def get_alphas_from_csv(csv_file_path, min_sharpe, min_fitness, mode="track", re
         # Combined filter - USA region and Single Data Set Alphas
         results = get_alphas_from_csv("output/simulated_alphas.csv", 1.0, 0.5,
                                     region_filter="USA", single_data_set_filter=True)
+
+        # Columnar batch - sort / top-k / filter on whole columns
+        batch = get_alphas_from_csv("output/simulated_alphas.csv", 1.0, 0.5, as_batch=True)
+        best = batch.filter(batch.turnover < 0.4).top_k(100, 'fitness')
+    """
+    # 同一文件只解析一次（按修改时间和大小缓存），之后的筛选全部是列运算
+    df = load_results_csv(csv_file_path, processes)
+    return alpha_records_from_frame(df, min_sharpe, min_fitness, mode, region_filter, single_data_set_filter,
+                                    as_batch)
+
+
+def alpha_records_from_frame(df, min_sharpe, min_fitness, mode="track", region_filter=None,
+                             single_data_set_filter=None, as_batch=False):
     """
+    get_alphas_from_csv 的筛选部分：对已展开的模拟结果（results_store.results_frame 的输出，
+    例如 IngestionTracker 新读到的行）做同样的筛选，返回同样格式的记录；
+    as_batch 为 True 时直接由筛选后的列构造 AlphaBatch，不创建逐条的列表记录。
+    """
+    mask = (df['long_count'] + df['short_count']).fillna(0) > 100
+    if region_filter is not None:
+        mask &= (df['region'] == region_filter).fillna(False)
+    if single_data_set_filter is not None:
+        # 单数据集筛选时同时要求 operatorCount 不超过 8
+        mask &= (df['single_data_set'] == single_data_set_filter) & (df['operator_count'] <= 8).fillna(True)
+
+    positive = (df['sharpe'] >= min_sharpe) & (df['fitness'] >= min_fitness)
+    if mode == "submit":
+        mask &= positive & ~df['has_failed_checks']
+    else:  # track mode
+        mask &= positive | ((df['sharpe'] <= min_sharpe * -1.0) & (df['fitness'] <= min_fitness * -1.0))
+    selected = df[mask.fillna(False).astype(bool)]
+    if selected.empty:
+        return AlphaBatch([], [], [], [], [], [], [], []) if as_batch else []
+
+    # 负 sharpe 的表达式批量取反
+    expressions = [fix_newline_expression(code) for code in selected['code'].fillna('').tolist()]
+    negative = (selected['sharpe'] < 0).tolist()
+    expressions = [negate_expression(exp) if flip else exp for exp, flip in zip(expressions, negative)]
+
+    decays = selected['decay'].fillna(0).astype('int64')
+    adjusted = suggested_decays(decays, selected['turnover'])
+    if as_batch:
+        pyramids = [json.loads(p) if isinstance(p, str) else None for p in selected['pyramids'].tolist()]
+        return AlphaBatch(selected['id'].tolist(), expressions, selected['sharpe'].to_numpy(dtype=float),
+                          selected['turnover'].to_numpy(dtype=float), selected['fitness'].to_numpy(dtype=float),
+                          selected['margin'].to_numpy(dtype=float), selected['date_created'].tolist(),
+                          decays.to_numpy(), adjusted.tolist(),
+                          pyramids=None if all(p is None for p in pyramids) else pyramids)
+    columns = zip(selected['id'].tolist(), expressions, selected['sharpe'].tolist(), selected['turnover'].tolist(),
+                  selected['fitness'].tolist(), selected['margin'].tolist(), selected['date_created'].tolist(),
+                  decays.tolist(), selected['pyramids'].tolist(), adjusted.tolist())
+
     output = []
-    
-    with open(csv_file_path, 'r', encoding='utf-8') as csvfile:
-        reader = csv.DictReader(csvfile)
-        
-        for row in reader:
-            try:
-                # Parse the necessary fields from the row
-                alpha_id = row['id']
-                
-                # Parse the settings dictionary
-                settings = ast.literal_eval(row['settings'])
-                decay = settings.get('decay', 0)
-                
-                # Parse the regular code (expression)
-                regular = ast.literal_eval(row['regular'])
-                exp = fix_newline_expression(regular.get('code', ''))
-                operatorCount = regular.get('operatorCount', 0)
-                
-        
-                # Parse the is dictionary
-                is_data = ast.literal_eval(row['is'])
-                sharpe = is_data.get('sharpe', 0)
-                fitness = is_data.get('fitness', 0)
-                turnover = is_data.get('turnover', 0)
-                margin = is_data.get('margin', 0)
-                longCount = is_data.get('longCount', 0)
-                shortCount = is_data.get('shortCount', 0)
-                checks = is_data.get('checks', [])
-                
-                dateCreated = row['dateCreated']
-                has_failed_checks = any(check['result'] == 'FAIL' for check in checks)
-                # Apply region filter if specified
-                if region_filter is not None and settings.get('region') != region_filter:
-                    continue
-                    
-                # Apply single data set filter if specified
-                if single_data_set_filter is not None:
-                    classifications = ast.literal_eval(row.get('classifications', '[]'))
-                    is_single_data_set = any(
-                        classification.get('id') == 'DATA_USAGE:SINGLE_DATA_SET' 
-                        for classification in classifications
-                    )
-                    if single_data_set_filter != is_single_data_set:
-                        continue
-                    elif operatorCount > 8:
-                        continue
-                
-                # Apply other filters
-                if (longCount + shortCount) > 100:
-                    if mode == "submit":
-                        if (sharpe >= min_sharpe and fitness >= min_fitness) and not has_failed_checks:
-                            if sharpe is not None and sharpe < 0:
-                                exp = negate_expression(exp)
-                            # Create the record
-                            rec = [
-                                alpha_id,
-                                exp,
-                                sharpe,
-                                turnover,
-                                fitness,
-                                margin,
-                                dateCreated,
-                                decay
-                            ]
-                            
-                            # Extract pyramids info from checks if available
-                            pyramid_checks = [check for check in checks if check.get('name') == 'MATCHES_PYRAMID']
-                            if pyramid_checks and 'pyramids' in pyramid_checks[0]:
-                                pyramids = pyramid_checks[0]['pyramids']
-                                rec.insert(7, pyramids)  # Insert after dateCreated
-                            
-                            # Add additional decay modifier based on turnover
-                            if turnover > 0.7:
-                                rec.append(decay * 4)
-                            elif turnover > 0.6:
-                                rec.append(decay * 3 + 3)
-                            elif turnover > 0.5:
-                                rec.append(decay * 3)
-                            elif turnover > 0.4:
-                                rec.append(decay * 2)
-                            elif turnover > 0.35:
-                                rec.append(decay + 4)
-                            elif turnover > 0.3:
-                                rec.append(decay + 2)
-                            
-                            output.append(rec)
-                    else:  # track mode
-                        if (sharpe >= min_sharpe and fitness >= min_fitness) or (sharpe <= min_sharpe * -1.0 and fitness <= min_fitness * -1.0):
-                            if sharpe is not None and sharpe < 0:
-                                exp = negate_expression(exp)
-                            # Create the record
-                            rec = [
-                                alpha_id,
-                                exp,
-                                sharpe,
-                                turnover,
-                                fitness,
-                                margin,
-                                dateCreated,
-                                decay
-                            ]
-                            
-                            # Extract pyramids info from checks if available
-                            pyramid_checks = [check for check in checks if check.get('name') == 'MATCHES_PYRAMID']
-                            if pyramid_checks and 'pyramids' in pyramid_checks[0]:
-                                pyramids = pyramid_checks[0]['pyramids']
-                                rec.insert(7, pyramids)  # Insert after dateCreated
-                            
-                            # Add additional decay modifier based on turnover
-                            if turnover > 0.7:
-                                rec.append(decay * 4)
-                            elif turnover > 0.6:
-                                rec.append(decay * 3 + 3)
-                            elif turnover > 0.5:
-                                rec.append(decay * 3)
-                            elif turnover > 0.4:
-                                rec.append(decay * 2)
-                            elif turnover > 0.35:
-                                rec.append(decay + 4)
-                            elif turnover > 0.3:
-                                rec.append(decay + 2)
-                            
-                            output.append(rec)
-                    
-            except (ValueError, SyntaxError, KeyError) as e:
-                # Skip rows with parsing errors or missing required fields
-                continue
-                
+    for alpha_id, exp, sharpe, turnover, fitness, margin, date_created, decay, pyramids, adjusted_decay in columns:
+        rec = [alpha_id, exp, sharpe, turnover, fitness, margin, date_created, decay]
+        # Extract pyramids info from checks if available
+        if isinstance(pyramids, str):
+            rec.insert(7, json.loads(pyramids))  # Insert after dateCreated
+        # Add additional decay modifier based on turnover
+        if adjusted_decay is not pd.NA:
+            rec.append(adjusted_decay)
+        output.append(rec)
     return output
 
 
@@ -945,33 +927,16 @@ def split_csv(csv_path, num_splits, output_dir=None):
     else:
         os.makedirs(output_dir, exist_ok=True)
 
-    # 读取原 CSV 文件
-    with open(csv_path, 'r', encoding='utf-8') as file:
-        reader = csv.reader(file)
-        header = next(reader)  # 读取表头
-        rows = list(reader)  # 读取所有行
-
-    # 计算每个文件应包含的行数
-    rows_per_file = math.ceil(len(rows) / num_splits)
+    # 第一遍流式统计行数，计算每个文件应包含的行数
+    rows_per_file = math.ceil(count_rows(csv_path) / num_splits)
 
     # 获取文件名和扩展名
     base_name = os.path.basename(csv_path)
     base_name, ext = os.path.splitext(base_name)
 
-    # 拆分文件
-    for i in range(num_splits):
-        # 计算当前文件的起始和结束行
-        start = i * rows_per_file
-        end = start + rows_per_file
-
-        # 生成新文件名
-        new_file = os.path.join(output_dir, f"{base_name}_part{i+1}{ext}")
-
-        # 写入新文件
-        with open(new_file, 'w', encoding='utf-8', newline='') as out_file:
-            writer = csv.writer(out_file)
-            writer.writerow(header)  # 写入表头
-            writer.writerows(rows[start:end])  # 写入行
+    # 第二遍流式写出，不把所有行读入内存
+    new_files = [os.path.join(output_dir, f"{base_name}_part{i+1}{ext}") for i in range(num_splits)]
+    split_rows(csv_path, new_files, rows_per_file)
 
 
 def extract_id_description(csv_path, output_dir=None):
@@ -990,11 +955,6 @@ def extract_id_description(csv_path, output_dir=None):
     else:
         os.makedirs(output_dir, exist_ok=True)
 
-    # 读取原 CSV 文件
-    with open(csv_path, 'r', encoding='utf-8') as file:
-        reader = csv.DictReader(file)
-        rows = list(reader)
-
     # 获取文件名和扩展名
     base_name = os.path.basename(csv_path)
     base_name, ext = os.path.splitext(base_name)
@@ -1002,27 +962,43 @@ def extract_id_description(csv_path, output_dir=None):
     # 生成新文件名
     new_file = os.path.join(output_dir, f"{base_name}_id_description{ext}")
 
-    # 写入新文件
-    with open(new_file, 'w', encoding='utf-8', newline='') as out_file:
-        writer = csv.DictWriter(out_file, fieldnames=['id', 'description'])
-        writer.writeheader()
-        for row in rows:
-            writer.writerow({'id': row['id'], 'description': row['description']})
+    # 边读边写，只保留 id 和 description 两列
+    with CsvReader(csv_path) as reader:
+        id_index = reader.header.index('id')
+        desc_index = reader.header.index('description')
+        write_csv(new_file, ['id', 'description'], ((row[id_index], row[desc_index]) for row in reader))
+        reader.report()
 
 
 def view_alphas_margin(gold_bag):
-    s = login()
+    s = session_manager.get()
     sharp_list = []
     for gold, pc in gold_bag:
 
-        triple = locate_alpha(s, gold)
-        info = [triple[0], triple[2], triple[3], triple[4], triple[5], triple[6], triple[1]]
-        info.append(pc)
-        sharp_list.append(info)
+        rec = AlphaRecord.from_list(locate_alpha(s, gold))
+        sharp_list.append((rec, pc))
+
+    sharp_list.sort(reverse=True, key = lambda x : x[0].margin)
+    for rec, pc in sharp_list:
+        print([rec.alpha_id, rec.sharpe, rec.turnover, rec.fitness, rec.margin, rec.date_created, rec.exp, pc])
 
-    sharp_list.sort(reverse=True, key = lambda x : x[4]) # x[4] 是 margin 的位置
-    for i in sharp_list:
-        print(i)
+
+def iter_alpha_blocks(file_path, block_size=3):
+    """
+    parse_alpha_blocks 的生成器版本：逐行读取文件，每凑满 block_size 个非空行产出一个表达式块。
+    """
+    block_lines = []
+    with open(file_path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            block_lines.append(line)
+            if len(block_lines) == block_size:
+                yield '\n'.join(block_lines)
+                block_lines = []
+    if block_lines:
+        print(f"Skipping incomplete block of {len(block_lines)} lines at end of {file_path}")
 
 
 def parse_alpha_blocks(file_path,block_size=3):
@@ -1039,18 +1015,7 @@ def parse_alpha_blocks(file_path,block_size=3):
     Returns:
         list: List of valid alpha blocks (each as a string with 3 lines)
     """
-    with open(file_path, 'r') as f:
-        lines = [line.strip() for line in f if line.strip()]
-    
-    # Group lines into blocks of block_size
-    blocks = []
-    for i in range(0, len(lines), block_size):
-        block_lines = lines[i:i+block_size]
-        if len(block_lines) == block_size:
-            blocks.append('\n'.join(block_lines))
-        else:
-            print(f"Skipping incomplete block at line {i+1}")
-    
+    blocks = list(iter_alpha_blocks(file_path, block_size))
     print(f"Found {len(blocks)} valid alpha blocks in {file_path}")
     return blocks
 
@@ -1078,84 +1043,60 @@ def negate_expression(expression):
     为表达式添加负号
     
     Args:
-        expression (str): 输入表达式字符串
+        expression (str | MultiLineExpression): 输入表达式
         
     Returns:
-        str: 处理后的表达式
+        str | MultiLineExpression: 处理后的表达式，类型与输入相同
             如果是单行表达式，直接在前面加负号
-            如果是多行表达式，在最后一行前加负号
+            如果是多行表达式，对最后的结果表达式取负
     """
-    if "\n" not in expression:
-        # 单行表达式
-        return f"-({expression})"
-    else:
-        # 多行表达式
-        lines = expression.split("\n")
-        last_line = lines[-1].strip()
-        # 在最后一行前加负号
-        lines[-1] = f"-({last_line})"
-        return "\n".join(lines)
+    if isinstance(expression, MultiLineExpression):
+        return expression.negate()
+    if not expression.strip():
+        return expression
+    return MultiLineExpression.from_string(expression).negate().to_string()
 
 
-def generate_atom_expressions(datafield: str, region: str, day: int = 10) -> list:
+def generate_atom_expressions(datafield: str, region: str, day: int = 10,
+                              limits: Optional[ComplexityLimits] = None) -> list:
     """
-    根据datafield、region和day生成表达式列表
+    iter_atom_expressions 的列表版本。
+    """
+    return list(iter_atom_expressions(datafield, region, day, limits=limits))
+
+
+@limited_by_complexity
+def iter_atom_expressions(datafield: str, region: str, day: int = 10):
+    """
+    根据datafield、region和day逐个生成表达式（生成器），group 两两组合的数量随 group 数平方增长，不必全部放入内存
     
     参数:
         datafield (str): 数据字段名
         region (str): 地区，必须是'USA', 'ASI', 'EUR', 'GLB'或'CHN'（大写）
         day (int): 时间窗口d的值，默认为10
+        limits (ComplexityLimits, 关键字参数): 指定时只产出未超限的表达式（8-11 的算子数较多）
         
     返回:
-        list: 包含所有表达式变体的字符串列表
+        Iterator[str]: 逐个产出的表达式
     """
-    # 定义各地区的group集合
-    usa_atom_group = ["market", "sector", "industry", "subindustry", "exchange"]
-    
-    asi_atom_group = ["market", "sector", "industry", "subindustry", "exchange", "country",
-                     "group_cartesian_product(country, market)", 
-                     "group_cartesian_product(country, industry)", 
-                     "group_cartesian_product(country, subindustry)", 
-                     "group_cartesian_product(country, exchange)",
-                     "group_cartesian_product(country, sector)"]
-    
-    eur_atom_group = asi_atom_group.copy()
-    glb_atom_group = asi_atom_group.copy()
-    
-    chn_atom_group = ["market", "sector", "industry", "subindustry", "exchange"]
-    
-    # 根据region选择对应的group集合（直接匹配大写）
-    if region == 'USA':
-        groups = usa_atom_group
-    elif region == 'ASI':
-        groups = asi_atom_group
-    elif region == 'EUR':
-        groups = eur_atom_group
-    elif region == 'GLB':
-        groups = glb_atom_group
-    elif region == 'CHN':
-        groups = chn_atom_group
-    else:
-        raise ValueError(f"无效的region: {region}，必须是'USA', 'ASI', 'EUR', 'GLB'或'CHN'（大写）")
-    
-    expressions = []
+    groups = load_registry().atom_groups_for(region)
     
     # 1. x (只有1个)
-    expressions.append(f"{datafield}")
+    yield (f"{datafield}")
     
     # 2-5. 涉及单个group的表达式 (每个group生成一个)
     for group in groups:
         # 2. x - group_mean(x, 1, group)
-        expressions.append(f"{datafield} - group_mean({datafield}, 1, densify({group}))")
+        yield (f"{datafield} - group_mean({datafield}, 1, densify({group}))")
         
         # 3. x / group_mean(x, 1, group)
-        expressions.append(f"{datafield} / group_mean({datafield}, 1, densify({group}))")
+        yield (f"{datafield} / group_mean({datafield}, 1, densify({group}))")
         
         # 4. ts_corr(x, group_mean(x, 1, group), day)
-        expressions.append(f"ts_corr({datafield}, group_mean({datafield}, 1, densify({group})), {day})")
+        yield (f"ts_corr({datafield}, group_mean({datafield}, 1, densify({group})), {day})")
         
         # 5. ts_regression(x, group_mean(x, 1, group), day, rettype = 0)
-        expressions.append(f"ts_regression({datafield}, group_mean({datafield}, 1, densify({group})), {day}, rettype = 0)")
+        yield (f"ts_regression({datafield}, group_mean({datafield}, 1, densify({group})), {day}, rettype = 0)")
     
     # 6-11. 涉及两个不同group的表达式 (遍历所有group1 != group2的组合)
     for i in range(len(groups)):
@@ -1164,24 +1105,23 @@ def generate_atom_expressions(datafield: str, region: str, day: int = 10) -> lis
                 group1, group2 = groups[i], groups[j]
                 
                 # 6. group_rank(x, group1) - group_rank(x, group2)
-                expressions.append(f"group_rank({datafield}, densify({group1})) - group_rank({datafield}, densify({group2}))")
+                yield (f"group_rank({datafield}, densify({group1})) - group_rank({datafield}, densify({group2}))")
                 
                 # 7. group_rank(x, group1) / group_rank(x, group2)
-                expressions.append(f"group_rank({datafield}, densify({group1})) / group_rank({datafield}, densify({group2}))")
+                yield (f"group_rank({datafield}, densify({group1})) / group_rank({datafield}, densify({group2}))")
                 
                 # 8. ts_corr(group_rank(x, group1), group_rank(x, group2), day)  op超长，暂时不使用
-                expressions.append(f"ts_corr(group_rank({datafield}, densify({group1})), group_rank({datafield}, densify({group2})), {day})")
+                yield (f"ts_corr(group_rank({datafield}, densify({group1})), group_rank({datafield}, densify({group2})), {day})")
                 
                 # 9. ts_regression(group_rank(x, group1), group_rank(x, group2), day, rettype = 0) op超长，暂时不使用
-                expressions.append(f"ts_regression(group_rank({datafield}, densify({group1})), group_rank({datafield}, densify({group2})), {day}, rettype = 0)")
+                yield (f"ts_regression(group_rank({datafield}, densify({group1})), group_rank({datafield}, densify({group2})), {day}, rettype = 0)")
                 
                 # 10. group_rank(x, group1) - group_rank(group_mean(x, 1, group1),  group2) op超长，暂时不使用
-                expressions.append(f"group_rank({datafield}, densify({group1})) - group_rank(group_mean({datafield}, 1, densify({group1})),  densify({group2}))")
+                yield (f"group_rank({datafield}, densify({group1})) - group_rank(group_mean({datafield}, 1, densify({group1})),  densify({group2}))")
                 
                 # 11. group_rank(x, group1) / group_rank(group_mean(x, 1, group1),  group2) op超长，暂时不使用
-                expressions.append(f"group_rank({datafield}, densify({group1})) / group_rank(group_mean({datafield}, 1, densify({group1})), densify({group2}))")
-    
-    return expressions
+                yield (f"group_rank({datafield}, densify({group1})) / group_rank(group_mean({datafield}, 1, densify({group1})), densify({group2}))")
+
 
 def generate_std_expressions(datafield: str, region: str) -> list:
     """
@@ -1195,29 +1135,7 @@ def generate_std_expressions(datafield: str, region: str) -> list:
     返回:
         list: 包含所有表达式变体的字符串列表
     """
-    # 定义各地区的group集合
-    usa_atom_group = ["sector"]
-    
-    asi_atom_group = ["sector"]
-    
-    eur_atom_group = asi_atom_group.copy()
-    glb_atom_group = asi_atom_group.copy()
-    
-    chn_atom_group = ["sector"]
-    
-    # 根据region选择对应的group集合（直接匹配大写）
-    if region == 'USA':
-        groups = usa_atom_group
-    elif region == 'ASI':
-        groups = asi_atom_group
-    elif region == 'EUR':
-        groups = eur_atom_group
-    elif region == 'GLB':
-        groups = glb_atom_group
-    elif region == 'CHN':
-        groups = chn_atom_group
-    else:
-        raise ValueError(f"无效的region: {region}，必须是'USA', 'ASI', 'EUR', 'GLB'或'CHN'（大写）")
+    groups = load_registry().std_groups_for(region)
     
     expressions = []
     
@@ -1318,48 +1236,30 @@ def first_order_factory_with_day(fields, ops_set, days = None):
  
     return alpha_set
 
-def sort_csv_by_description(input_path, output_path):
+def sort_csv_by_description(input_path, output_path, chunk_size=200000):
+    """
+    按 description 列（去除首尾双引号）排序 CSV，字段数与表头不一致的行被跳过。
+    使用外部归并排序，每次只在内存中保留 chunk_size 行。
+
+    Returns:
+        int: 成功返回 0，出错返回 1。
+    """
     try:
-        # 存储有效行和对应的description（用于排序）
-        rows = []
-        descriptions = []
-        error_lines = []
-        
-        with open(input_path, 'r', encoding='utf-8') as f:
-            reader = csv.reader(f)
-            headers = next(reader)
-            
-            # 检查description列是否存在
-            if 'description' not in headers:
-                print(f"错误：文件 {input_path} 中不存在 'description' 列")
-                print(f"可用列名：{', '.join(headers)}")
-                return 1
-                
-            desc_index = headers.index('description')
-            
-            # 处理每一行
-            for i, row in enumerate(reader, start=2):  # 行号从2开始（标题行是第1行）
-                if len(row) != len(headers):
-                    error_lines.append(i)
-                    continue
-                # 提取description，并去除首尾的双引号
-                desc = row[desc_index].strip('"')
-                rows.append(row)
-                descriptions.append(desc)
-        
+        with CsvReader(input_path) as reader:
+            headers = reader.header
+        # 检查description列是否存在
+        if 'description' not in headers:
+            print(f"错误：文件 {input_path} 中不存在 'description' 列")
+            print(f"可用列名：{', '.join(headers)}")
+            return 1
+
+        reader = sort_csv(input_path, output_path, 'description', key=lambda desc: desc.strip('"'),
+                          chunk_size=chunk_size, repair="skip")
+
         # 打印跳过行的警告
-        if error_lines:
-            print(f"警告：跳过 {len(error_lines)} 行格式错误（行号: {', '.join(map(str, error_lines))}）")
-        
-        # 根据descriptions对rows进行排序
-        sorted_rows = [row for _, row in sorted(zip(descriptions, rows), key=lambda x: x[0])]
-        
-        # 写入输出文件
-        with open(output_path, 'w', encoding='utf-8', newline='') as out_f:
-            writer = csv.writer(out_f)
-            writer.writerow(headers)
-            writer.writerows(sorted_rows)
-            
+        if reader.skipped:
+            print(f"警告：跳过 {len(reader.skipped)} 行格式错误（行号: {', '.join(map(str, reader.skipped))}）")
+
         print(f"文件已排序并保存至: {output_path}")
         return 0
     except Exception as e:
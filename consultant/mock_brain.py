@@ -0,0 +1,376 @@
+import itertools
+import json
+import random
+import re
+import string
+import threading
+import time
+from dataclasses import dataclass, field
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from datetime import datetime
+from urllib.parse import parse_qs, unquote, urlparse
+
+# 端点名称，用于按端点配置延迟
+ENDPOINTS = ["authentication", "simulations", "simulation_progress", "alpha", "alpha_patch", "check",
+             "pnl", "alphas_list", "data_sets", "data_fields"]
+
+
+@dataclass
+class MockConfig:
+    """
+    本地模拟 BRAIN API 的行为参数。
+
+    Args:
+        latency: 各端点的固定响应延迟（秒），未列出的端点使用 default_latency。
+        default_latency: 默认响应延迟（秒）。
+        throttle_rate: 每秒允许的请求数，超出时返回 429 和 Retry-After；None 表示不限流。
+        throttle_retry_after: 429 响应中的 Retry-After（秒）。
+        failure_rate: 随机返回 500 的概率（不含登录）。
+        simulation_duration: 模拟从提交到完成的时长（秒）。
+        simulation_jitter: 模拟时长的随机浮动比例。
+        check_duration: check 从首次请求到出结果的时长（秒），期间返回 Retry-After。
+        poll_retry_after: 模拟、check 未完成时返回的 Retry-After（秒）。
+        session_ttl: 登录会话有效期（秒），过期后返回 401；None 表示不过期。
+        n_alphas: /users/self/alphas 中预置的 alpha 数量。
+        n_datafields: /data-fields 中预置的字段数量。
+        pnl_days: PnL 记录的天数。
+        seed: 随机种子。
+    """
+    latency: Dict[str, float] = field(default_factory=dict)
+    default_latency: float = 0.05
+    throttle_rate: Optional[float] = None
+    throttle_retry_after: float = 1.0
+    failure_rate: float = 0.0
+    simulation_duration: float = 5.0
+    simulation_jitter: float = 0.2
+    check_duration: float = 1.0
+    poll_retry_after: float = 1.0
+    session_ttl: Optional[float] = None
+    n_alphas: int = 500
+    n_datafields: int = 200
+    pnl_days: int = 1000
+    seed: int = 0
+
+
+class _BrainState:
+    """
+    模拟服务器的内存状态：会话、模拟任务、alpha、check 请求及限流窗口。
+    """
+
+    def __init__(self, config: MockConfig, base_url: str):
+        self.config = config
+        self.base_url = base_url
+        self.lock = threading.Lock()
+        self.random = random.Random(config.seed)
+        self.tokens = {}
+        self.simulations = {}
+        self.alphas = {}
+        self.checks = {}
+        self.request_times = []
+        self.counters = {endpoint: 0 for endpoint in ENDPOINTS}
+        self.counters.update(throttled=0, failed=0, unauthorized=0)
+        self._ids = itertools.count(1)
+        # 预置的 alpha 创建时间分布在过去一年内
+        for _ in range(config.n_alphas):
+            self._create_alpha({'regular': 'rank(close)', 'settings': {'region': 'USA', 'universe': 'TOP3000',
+                                                                       'decay': 0}},
+                               created=time.time() - self.random.uniform(0, 365 * 86400))
+
+    def new_id(self) -> str:
+        # 自增序号编码为 base62，保证唯一
+        n, chars, digits = next(self._ids), string.digits + string.ascii_letters, []
+        while n:
+            n, r = divmod(n, 62)
+            digits.append(chars[r])
+        return "".join(reversed(digits)).rjust(7, "0")
+
+    def _create_alpha(self, simulation_data: Dict, created: Optional[float] = None) -> str:
+        alpha_id = self.new_id()
+        rnd = self.random
+        sharpe = rnd.uniform(-3, 3)
+        self.alphas[alpha_id] = {
+            'id': alpha_id,
+            'name': None,
+            'dateCreated': time.strftime("%Y-%m-%dT%H:%M:%S-04:00", time.localtime(created)),
+            'settings': dict(simulation_data.get('settings', {})),
+            'regular': {'code': simulation_data.get('regular', ''), 'description': None},
+            'is': {'sharpe': round(sharpe, 2), 'fitness': round(sharpe * rnd.uniform(0.3, 0.9), 2),
+                   'turnover': round(rnd.uniform(0.01, 0.8), 4), 'margin': round(rnd.uniform(-0.001, 0.002), 6),
+                   'longCount': rnd.randint(0, 1500), 'shortCount': rnd.randint(0, 1500)},
+        }
+        return alpha_id
+
+    def create_simulation(self, payload) -> str:
+        """
+        新建模拟任务。payload 为列表时是 multi-simulation，每个元素生成一个子模拟。
+        """
+        duration = self.config.simulation_duration * (
+            1 + self.random.uniform(-self.config.simulation_jitter, self.config.simulation_jitter))
+        done_at = time.monotonic() + duration
+        sim_id = self.new_id()
+        if isinstance(payload, list):
+            children = []
+            for simulation_data in payload:
+                child_id = self.new_id()
+                self.simulations[child_id] = {'done_at': done_at, 'alpha': self._create_alpha(simulation_data)}
+                children.append(child_id)
+            self.simulations[sim_id] = {'done_at': done_at, 'children': children}
+        else:
+            self.simulations[sim_id] = {'done_at': done_at, 'alpha': self._create_alpha(payload)}
+        return sim_id
+
+    def throttled(self) -> bool:
+        """
+        以 1 秒滑动窗口统计请求数，超过 throttle_rate 时判定为限流。
+        """
+        if self.config.throttle_rate is None:
+            return False
+        now = time.monotonic()
+        self.request_times = [t for t in self.request_times if now - t < 1.0]
+        if len(self.request_times) >= self.config.throttle_rate:
+            return True
+        self.request_times.append(now)
+        return False
+
+    def pnl(self, alpha_id: str) -> Dict:
+        rnd = random.Random(alpha_id)
+        start = time.mktime((2019, 1, 1, 0, 0, 0, 0, 0, -1))
+        records, cumulative = [], 0.0
+        for day in range(self.config.pnl_days):
+            cumulative += rnd.gauss(100, 5000)
+            records.append([time.strftime("%Y-%m-%d", time.localtime(start + day * 86400)), round(cumulative, 2)])
+        return {'schema': {'properties': [{'name': 'date'}, {'name': 'pnl'}]}, 'records': records}
+
+    def check(self, alpha_id: str) -> Optional[Dict]:
+        """
+        返回 check 结果；首次请求后 check_duration 秒内返回 None 表示仍在计算。
+        """
+        started = self.checks.setdefault(alpha_id, time.monotonic())
+        if time.monotonic() - started < self.config.check_duration:
+            return None
+        rnd = random.Random(alpha_id)
+        checks = [{'name': name, 'result': 'PASS' if rnd.random() > 0.3 else 'FAIL'}
+                  for name in ['LOW_SHARPE', 'LOW_FITNESS', 'LOW_TURNOVER', 'HIGH_TURNOVER', 'CONCENTRATED_WEIGHT']]
+        checks.append({'name': 'PROD_CORRELATION', 'result': 'PASS', 'value': round(rnd.uniform(0.1, 0.9), 4)})
+        return {'is': {'checks': checks}}
+
+
+def _compare(left, op: str, right) -> bool:
+    return {'>': left > right, '>=': left >= right, '<': left < right, '<=': left <= right,
+            '=': left == right, '!=': left != right}[op]
+
+
+class _BrainHandler(BaseHTTPRequestHandler):
+    state: _BrainState = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send(self, status: int, body=None, headers: Optional[Dict[str, str]] = None) -> None:
+        data = json.dumps(body).encode() if body is not None else b""
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _route(self, method: str) -> Tuple[Optional[str], List[str]]:
+        path = urlparse(self.path).path.rstrip("/")
+        routes = [
+            ("POST", r"/authentication", "authentication"),
+            ("POST", r"/simulations", "simulations"),
+            ("GET", r"/simulations/([^/]+)", "simulation_progress"),
+            ("GET", r"/alphas/([^/]+)/check", "check"),
+            ("GET", r"/alphas/([^/]+)/recordsets/pnl", "pnl"),
+            ("GET", r"/alphas/([^/]+)", "alpha"),
+            ("PATCH", r"/alphas/([^/]+)", "alpha_patch"),
+            ("GET", r"/users/self/alphas", "alphas_list"),
+            ("GET", r"/data-sets", "data_sets"),
+            ("GET", r"/data-fields", "data_fields"),
+        ]
+        for route_method, pattern, endpoint in routes:
+            match = re.fullmatch(pattern, path)
+            if route_method == method and match:
+                return endpoint, list(match.groups())
+        return None, []
+
+    def _authorized(self) -> bool:
+        cookie = self.headers.get("Cookie", "")
+        match = re.search(r"t=([^;]+)", cookie)
+        if not match or match.group(1) not in self.state.tokens:
+            return False
+        ttl = self.state.config.session_ttl
+        return ttl is None or time.monotonic() - self.state.tokens[match.group(1)] < ttl
+
+    def _handle(self, method: str) -> None:
+        state = self.state
+        config = state.config
+        endpoint, args = self._route(method)
+        length = int(self.headers.get("Content-Length") or 0)
+        payload = json.loads(self.rfile.read(length)) if length else None
+        if endpoint is None:
+            self._send(404, {'detail': 'Not found.'})
+            return
+        time.sleep(config.latency.get(endpoint, config.default_latency))
+
+        with state.lock:
+            state.counters[endpoint] += 1
+            if state.throttled():
+                state.counters['throttled'] += 1
+                self._send(429, {'detail': 'Throttled'}, {"Retry-After": str(config.throttle_retry_after)})
+                return
+            if endpoint != "authentication" and not self._authorized():
+                state.counters['unauthorized'] += 1
+                self._send(401, {'detail': 'Incorrect authentication credentials.'})
+                return
+            if endpoint != "authentication" and state.random.random() < config.failure_rate:
+                state.counters['failed'] += 1
+                self._send(500, {'detail': 'Internal server error.'})
+                return
+            getattr(self, "_" + endpoint)(*args, payload=payload)
+
+    def _authentication(self, payload=None) -> None:
+        token = self.state.new_id()
+        self.state.tokens[token] = time.monotonic()
+        self._send(201, {'user': {'id': 'MOCK'}, 'token': {'expiry': self.state.config.session_ttl}},
+                   {"Set-Cookie": f"t={token}; Path=/"})
+
+    def _simulations(self, payload=None) -> None:
+        sim_id = self.state.create_simulation(payload)
+        self._send(201, None, {"Location": f"{self.state.base_url}/simulations/{sim_id}"})
+
+    def _simulation_progress(self, sim_id: str, payload=None) -> None:
+        simulation = self.state.simulations.get(sim_id)
+        if simulation is None:
+            self._send(404, {'detail': 'Not found.'})
+            return
+        remaining = simulation['done_at'] - time.monotonic()
+        if remaining > 0:
+            progress = 1 - remaining / max(self.state.config.simulation_duration, 1e-9)
+            self._send(200, {'progress': round(max(progress, 0.0), 2)},
+                       {"Retry-After": str(self.state.config.poll_retry_after)})
+        elif 'children' in simulation:
+            self._send(200, {'id': sim_id, 'status': 'COMPLETE', 'children': simulation['children']})
+        else:
+            self._send(200, {'id': sim_id, 'status': 'COMPLETE', 'alpha': simulation['alpha']})
+
+    def _alpha(self, alpha_id: str, payload=None) -> None:
+        alpha = self.state.alphas.get(alpha_id)
+        self._send(200, alpha) if alpha else self._send(404, {'detail': 'Not found.'})
+
+    def _alpha_patch(self, alpha_id: str, payload=None) -> None:
+        alpha = self.state.alphas.get(alpha_id)
+        if alpha is None:
+            self._send(404, {'detail': 'Not found.'})
+            return
+        alpha.update({k: v for k, v in (payload or {}).items() if k in ('name', 'color', 'tags')})
+        self._send(200, alpha)
+
+    def _check(self, alpha_id: str, payload=None) -> None:
+        if alpha_id not in self.state.alphas:
+            self._send(404, {'detail': 'Not found.'})
+            return
+        result = self.state.check(alpha_id)
+        if result is None:
+            self._send(200, None, {"Retry-After": str(self.state.config.poll_retry_after)})
+        else:
+            self._send(200, result)
+
+    def _pnl(self, alpha_id: str, payload=None) -> None:
+        if alpha_id not in self.state.alphas:
+            self._send(404, {'detail': 'Not found.'})
+            return
+        self._send(200, self.state.pnl(alpha_id))
+
+    def _page(self, items: List[Dict]) -> None:
+        query = parse_qs(urlparse(self.path).query)
+        limit = int(query.get('limit', ['50'])[0])
+        offset = int(query.get('offset', ['0'])[0])
+        self._send(200, {'count': len(items), 'results': items[offset:offset + limit]})
+
+    def _alphas_list(self, payload=None) -> None:
+        """
+        支持 dateCreated、is.sharpe、is.fitness、settings.region、settings.universe 过滤和 order 排序。
+        """
+        alphas = list(self.state.alphas.values())
+        order = None
+        for piece in urlparse(self.path).query.split("&"):
+            match = re.fullmatch(r"([\w.]+)(>=|<=|!=|>|<|=)(.*)", unquote(piece))
+            if not match:
+                continue
+            key, op, value = match.groups()
+            if key == 'order':
+                order = value
+            elif key == 'dateCreated':
+                bound = datetime.fromisoformat(value)
+                alphas = [a for a in alphas if _compare(datetime.fromisoformat(a['dateCreated']), op, bound)]
+            elif key in ('is.sharpe', 'is.fitness'):
+                alphas = [a for a in alphas if _compare(a['is'][key[3:]], op, float(value))]
+            elif key in ('settings.region', 'settings.universe'):
+                alphas = [a for a in alphas if a['settings'].get(key[9:]) == value]
+        if order:
+            name = order.lstrip("-")
+            if name.startswith("is."):
+                alphas.sort(key=lambda a: a['is'][name[3:]], reverse=order.startswith("-"))
+        self._page(alphas)
+
+    def _data_sets(self, payload=None) -> None:
+        self._page([{'id': f'dataset{i}', 'name': f'Mock dataset {i}', 'category': {'id': 'pv'}}
+                    for i in range(20)])
+
+    def _data_fields(self, payload=None) -> None:
+        self._page([{'id': f'mock_field_{i}', 'description': f'mock field {i}',
+                     'type': 'MATRIX' if i % 5 else 'VECTOR', 'dataset': {'id': f'dataset{i % 20}'}}
+                    for i in range(self.state.config.n_datafields)])
+
+    def do_GET(self):
+        self._handle("GET")
+
+    def do_POST(self):
+        self._handle("POST")
+
+    def do_PATCH(self):
+        self._handle("PATCH")
+
+
+class MockBrainServer:
+    """
+    本地 BRAIN API 模拟服务器，在后台线程中运行，用于在不消耗真实模拟额度的情况下做性能测试。
+
+    用法：
+        with MockBrainServer(MockConfig(simulation_duration=2)) as server:
+            os.environ['BRAIN_API_URL'] = server.url  # 需在导入 machine_lib 之前设置
+    """
+
+    def __init__(self, config: Optional[MockConfig] = None, host: str = "127.0.0.1", port: int = 0):
+        self.config = config or MockConfig()
+        self._httpd = ThreadingHTTPServer((host, port), _BrainHandler)
+        self._httpd.daemon_threads = True
+        self.url = f"http://{host}:{self._httpd.server_address[1]}"
+        self.state = _BrainState(self.config, self.url)
+        # 每个服务器实例使用独立的 handler 子类，避免多个实例共享状态
+        self._httpd.RequestHandlerClass = type("BrainHandler", (_BrainHandler,), {'state': self.state})
+        self._thread = None
+
+    @property
+    def counters(self) -> Dict[str, int]:
+        return dict(self.state.counters)
+
+    def start(self) -> "MockBrainServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "MockBrainServer":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
@@ -0,0 +1,163 @@
+"""
+按字段并行生成表达式：把字段分片交给多个工作进程，每个进程对自己的分片调用单字段工厂、按指纹去重
+（可同时做复杂度和字段校验），主进程再按分片顺序合并并做跨分片去重，最后写入待模拟文件 / 队列。
+
+generate_atom_expressions 每个字段约 6·g² 个表达式，生成和计算指纹都是纯 CPU 开销，单进程时成为瓶颈；
+分片后耗时随核数下降，输出顺序与逐字段串行生成再去重的结果相同。
+
+用法：
+    expand = partial(atom_expressions, region="USA", day=10)
+    alphas = generate_parallel(expand, fields, processes=32)
+    generate_parallel_to_pending(expand, fields, decay=4, neut="SUBINDUSTRY", region="USA",
+                                 universe="TOP3000", max_trade="OFF", queue=queue, processes=32)
+
+expand 必须可被 pickle：使用本模块的单字段适配函数配合 functools.partial，或其他模块级函数，不能是 lambda。
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from complexity import ComplexityLimits, check
+from fastexpr import compact_fingerprint
+from machine_lib import twin_field_factory, with_decay
+from machine_lib_output import (first_order_factory_with_day, generate_atom_expressions,
+                                generate_pending_simulation_data, generate_std_expressions)
+
+Expander = Callable[[str], Iterable]
+
+
+def atom_expressions(field: str, region: str, day: int = 10) -> list:
+    return generate_atom_expressions(field, region, day)
+
+
+def std_expressions(field: str, region: str) -> list:
+    return generate_std_expressions(field, region)
+
+
+def first_order_with_day(field: str, ops_set: Sequence[str], days: Optional[Sequence[int]] = None) -> list:
+    return first_order_factory_with_day([field], ops_set, days)
+
+
+def twin_field(field: str, ops: Sequence[str], fields: Sequence[str]) -> list:
+    """
+    twin_field_factory 以 field 为主字段、fields 中其余字段为对手字段，依次对每个 op 展开。
+    """
+    return [alpha for op in ops for alpha in twin_field_factory(op, field, fields)]
+
+
+def _shards(fields: Sequence[str], n_shards: int) -> List[List[str]]:
+    step = max(1, -(-len(fields) // n_shards))
+    return [list(fields[lo:lo + step]) for lo in range(0, len(fields), step)]
+
+
+def _generate_shard(args) -> Tuple[List[str], List[int], int, int]:
+    """
+    工作进程：展开一个分片并在分片内去重，返回 (表达式, 指纹, 超限数, 字段无效数)。
+    """
+    expand, fields, dedupe, limits, validator = args
+    seen = set()
+    expressions, keys = [], []
+    over_limit = unknown_fields = 0
+    for field in fields:
+        for alpha in expand(field):
+            alpha = str(alpha)
+            key = compact_fingerprint(alpha) if dedupe else None
+            if dedupe:
+                if key in seen:
+                    continue
+                seen.add(key)
+            if limits is not None and check(alpha, limits):
+                over_limit += 1
+                continue
+            if validator is not None and not validator.is_valid(alpha):
+                unknown_fields += 1
+                continue
+            expressions.append(alpha)
+            keys.append(key)
+    return expressions, keys, over_limit, unknown_fields
+
+
+def iter_generate_parallel(expand: Expander,
+                           fields: Iterable[str],
+                           processes: Optional[int] = None,
+                           shards_per_process: int = 4,
+                           dedupe: bool = True,
+                           limits: Optional[ComplexityLimits] = None,
+                           validator=None,
+                           seen: Optional[set] = None,
+                           verbose: bool = True) -> Iterator[str]:
+    """
+    并行展开每个字段的表达式（生成器），按字段顺序产出。
+
+    Args:
+        expand: 单字段工厂，输入字段名，返回其表达式列表（字符串或 MultiLineExpression，产出时统一为字符串）。
+        fields: 字段列表。
+        processes: 进程数，默认为 CPU 核数；为 1 时在当前进程中逐片生成。
+        shards_per_process: 每个进程分到的分片数，分片越多负载越均衡。
+        dedupe: 是否按 compact_fingerprint 去重（分片内在工作进程中去重，跨分片在主进程中去重）。
+        limits: 复杂度上限，在工作进程中过滤超限表达式。
+        validator: field_catalog.FieldValidator，在工作进程中过滤引用了不存在字段的表达式。
+        seen: 已见过的指纹集合，传入后会被更新，可跨多次调用共享。
+        verbose: 结束时打印生成数量和过滤数量。
+    """
+    fields = list(fields)
+    processes = processes or os.cpu_count() or 1
+    seen = set() if seen is None else seen
+    jobs = [(expand, shard, dedupe, limits, validator)
+            for shard in _shards(fields, processes * shards_per_process)]
+    if processes > 1 and len(jobs) > 1:
+        executor = ProcessPoolExecutor(max_workers=processes)
+        results = executor.map(_generate_shard, jobs)
+    else:
+        executor = None
+        results = map(_generate_shard, jobs)
+
+    generated = over_limit = unknown_fields = duplicates = 0
+    try:
+        for expressions, keys, shard_over_limit, shard_unknown in results:
+            over_limit += shard_over_limit
+            unknown_fields += shard_unknown
+            for alpha, key in zip(expressions, keys):
+                if dedupe:
+                    if key in seen:
+                        duplicates += 1
+                        continue
+                    seen.add(key)
+                generated += 1
+                yield alpha
+    finally:
+        if executor is not None:
+            executor.shutdown(cancel_futures=True)
+
+    if verbose:
+        print(f"Generated {generated} expressions from {len(fields)} fields with {processes} processes"
+              f" (cross-shard duplicates {duplicates}, over limits {over_limit}, unknown fields {unknown_fields})")
+
+
+def generate_parallel(expand: Expander, fields: Iterable[str], **kwargs) -> List[str]:
+    """
+    iter_generate_parallel 的列表版本。
+    """
+    return list(iter_generate_parallel(expand, fields, **kwargs))
+
+
+def generate_parallel_to_pending(expand: Expander,
+                                 fields: Iterable[str],
+                                 decay: int,
+                                 neut: str,
+                                 region: str,
+                                 universe: str,
+                                 max_trade: str,
+                                 processes: Optional[int] = None,
+                                 limits: Optional[ComplexityLimits] = None,
+                                 validator=None,
+                                 **pending_kwargs) -> None:
+    """
+    并行生成并写入待模拟文件（及 queue），其余参数同 generate_pending_simulation_data。
+    去重（dedupe，默认开启）、复杂度和字段校验都已在工作进程中完成，写入时不再重复计算。
+    """
+    dedupe = pending_kwargs.pop('dedupe', True)
+    alphas = iter_generate_parallel(expand, fields, processes=processes, dedupe=dedupe, limits=limits,
+                                    validator=validator)
+    generate_pending_simulation_data(with_decay(alphas, decay), neut, region, universe, max_trade,
+                                     dedupe=False, **pending_kwargs)
@@ -0,0 +1,118 @@
+import heapq
+import itertools
+import threading
+import time
+from typing import Optional
+
+import requests
+
+# 优先级，数值越小越先放行：模拟提交和进度轮询优先于批量的 PnL / check 拉取
+PRIORITY_SIMULATE = 0
+PRIORITY_POLL = 1
+PRIORITY_DEFAULT = 2
+PRIORITY_BULK = 3
+
+
+class AdaptiveRateLimiter:
+    """
+    进程级令牌桶限流器，所有 BRAIN API 请求共用。
+
+    - 按优先级排队放行，同优先级先到先得；
+    - 收到 429 时速率减半，并在 Retry-After 指定的时间内暂停所有请求；
+    - 请求成功时速率线性回升，直至 max_rate。
+    """
+
+    def __init__(self,
+                 rate: float = 5.0,
+                 burst: float = 10.0,
+                 min_rate: float = 0.2,
+                 max_rate: float = 20.0,
+                 increase: float = 0.05):
+        """
+        Args:
+            rate: 初始速率（请求/秒）。
+            burst: 令牌桶容量。
+            min_rate, max_rate: 速率的下限和上限。
+            increase: 每次成功请求后速率的增量。
+        """
+        self.rate = rate
+        self.burst = burst
+        self.min_rate = min_rate
+        self.max_rate = max_rate
+        self.increase = increase
+        self._tokens = burst
+        self._last = time.monotonic()
+        self._blocked_until = 0.0
+        self._waiters = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float) -> None:
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def acquire(self, priority: int = PRIORITY_DEFAULT) -> None:
+        """
+        阻塞直到按优先级轮到本请求且桶中有令牌。
+        """
+        entry = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiters, entry)
+            while True:
+                now = time.monotonic()
+                self._refill(now)
+                if self._waiters[0] == entry:
+                    if now >= self._blocked_until and self._tokens >= 1:
+                        heapq.heappop(self._waiters)
+                        self._tokens -= 1
+                        self._cond.notify_all()
+                        return
+                    timeout = max(self._blocked_until - now, (1 - self._tokens) / self.rate, 0.001)
+                else:
+                    timeout = None
+                self._cond.wait(timeout)
+
+    def feedback(self, response: requests.Response) -> None:
+        """
+        根据响应调整速率：429 时减速并按 Retry-After 全局暂停，成功时缓慢提速。
+        """
+        with self._cond:
+            if response.status_code == requests.codes.too_many_requests:
+                try:
+                    retry_after = float(response.headers.get("Retry-After", 0) or 0)
+                except ValueError:
+                    retry_after = 0.0
+                self.rate = max(self.min_rate, self.rate / 2)
+                self._blocked_until = max(self._blocked_until, time.monotonic() + max(retry_after, 1.0 / self.rate))
+                self._tokens = min(self._tokens, 0.0)
+            elif response.status_code < 400:
+                self.rate = min(self.max_rate, self.rate + self.increase)
+            self._cond.notify_all()
+
+
+rate_limiter = AdaptiveRateLimiter()
+
+
+def limited_request(sess: requests.Session,
+                    method: str,
+                    url: str,
+                    priority: int = PRIORITY_DEFAULT,
+                    limiter: Optional[AdaptiveRateLimiter] = None,
+                    max_throttle_retries: int = 10,
+                    **kwargs) -> requests.Response:
+    """
+    经限流器发送请求。被 429 限流时由限流器暂停后自动重试；
+    其他带 Retry-After 的响应（如模拟、check 仍在计算）原样返回，由调用方决定等待。
+    """
+    limiter = limiter or rate_limiter
+    for _ in range(max_throttle_retries):
+        limiter.acquire(priority)
+        response = sess.request(method, url, **kwargs)
+        limiter.feedback(response)
+        if response.status_code != requests.codes.too_many_requests:
+            return response
+    return response
+
+
+def limited_get(sess: requests.Session, url: str, priority: int = PRIORITY_DEFAULT, **kwargs) -> requests.Response:
+    return limited_request(sess, "GET", url, priority, **kwargs)
@@ -0,0 +1,82 @@
+import json
+import os
+from dataclasses import dataclass
+from functools import lru_cache
+from types import MappingProxyType
+from typing import Iterable, Mapping, Tuple
+
+REGISTRY_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "region_registry.json")
+FIELD_PLACEHOLDER = "{field}"
+ATOM_REGIONS_MESSAGE = "必须是'USA', 'ASI', 'EUR', 'GLB'或'CHN'（大写）"
+
+
+def _unique(items: Iterable[str]) -> Tuple[str, ...]:
+    # 保持原有顺序去重
+    return tuple(dict.fromkeys(items))
+
+
+@dataclass(frozen=True)
+class RegionRegistry:
+    """
+    各地区的分组和 trade_when 事件，由 region_registry.json 构建，构建后只读。
+    每个地区的列表已按出现顺序去重，未登记的地区使用 'default' 项。
+    """
+    groups: Mapping[str, Tuple[str, ...]]
+    open_events: Mapping[str, Tuple[str, ...]]
+    exit_events: Tuple[str, ...]
+    atom_groups: Mapping[str, Tuple[str, ...]]
+    std_groups: Mapping[str, Tuple[str, ...]]
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "RegionRegistry":
+        group_sets = data["group_sets"]
+        groups = {region: _unique(group for name in set_names for group in group_sets[name])
+                  for region, set_names in data["region_groups"].items()}
+        # 地区事件追加在通用事件之后
+        default_events = data["open_events"]["default"]
+        open_events = {region: _unique(default_events if region == "default" else default_events + events)
+                       for region, events in data["open_events"].items()}
+        return cls(groups=MappingProxyType(groups),
+                   open_events=MappingProxyType(open_events),
+                   exit_events=_unique(data["exit_events"]),
+                   atom_groups=MappingProxyType({k: _unique(v) for k, v in data["atom_groups"].items()}),
+                   std_groups=MappingProxyType({k: _unique(v) for k, v in data["std_groups"].items()}))
+
+    def groups_for(self, region: str) -> Tuple[str, ...]:
+        """
+        group_factory 等使用的分组。
+        """
+        return self.groups.get(region, self.groups["default"])
+
+    def open_events_for(self, region: str, field: str) -> Tuple[str, ...]:
+        """
+        trade_when 的开仓事件，事件中的 {field} 替换为 field。
+        替换后不再去重：事件数与字段无关，SearchSpace 用探针字段算出的倍数对任意字段都成立。
+        """
+        events = self.open_events.get(region, self.open_events["default"])
+        return tuple(event.replace(FIELD_PLACEHOLDER, field) for event in events)
+
+    def atom_groups_for(self, region: str) -> Tuple[str, ...]:
+        """
+        generate_atom_expressions 使用的分组，未登记的地区抛出 ValueError。
+        """
+        if region not in self.atom_groups:
+            raise ValueError(f"无效的region: {region}，{ATOM_REGIONS_MESSAGE}")
+        return self.atom_groups[region]
+
+    def std_groups_for(self, region: str) -> Tuple[str, ...]:
+        """
+        generate_std_expressions 使用的分组，未登记的地区抛出 ValueError。
+        """
+        if region not in self.std_groups:
+            raise ValueError(f"无效的region: {region}，{ATOM_REGIONS_MESSAGE}")
+        return self.std_groups[region]
+
+
+@lru_cache(maxsize=None)
+def load_registry(path: str = REGISTRY_PATH) -> RegionRegistry:
+    """
+    读取并构建注册表，每个路径只读取一次。修改 JSON 后需调用 load_registry.cache_clear()。
+    """
+    with open(path, encoding="utf-8") as f:
+        return RegionRegistry.from_dict(json.load(f))
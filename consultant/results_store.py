@@ -0,0 +1,396 @@
+"""
+模拟结果的列式存储：把 simulated_alphas_*.csv.<date> 中以 Python 字面量字符串保存的 settings、regular、is、
+classifications 列只解析一次，展开为带类型的列，按 region/date 分区写入 Parquet（安装了 pyarrow 时），
+查询时按分区目录裁剪、按列读取并缓存，阈值、区域、单数据集、operatorCount 等筛选都是向量化的列运算。
+
+目录结构：
+    <root>/region=USA/date=2025-07-17/<源文件名>.parquet
+
+用法：
+    store = ResultsStore()
+    store.ingest_directory("output")
+    df = store.query(regions="USA", start_date="2025-06-01", min_sharpe=1.2, min_fitness=0.7,
+                     single_data_set=True, max_operator_count=8)
+"""
+import ast
+import glob
+import json
+import os
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from fnmatch import fnmatch
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+from csv_stream import DEFAULT_CHUNK_SIZE, CsvReader
+
+try:
+    import pyarrow  # noqa: F401 仅用于判断 to_parquet / read_parquet 是否可用
+    HAS_PYARROW = True
+except ImportError:
+    HAS_PYARROW = False
+
+DEFAULT_ROOT = "output/results_store"
+RESULT_FILE_PATTERN = "simulated_alphas*.csv*"
+SINGLE_DATA_SET_ID = 'DATA_USAGE:SINGLE_DATA_SET'
+
+# 展开后的列及类型
+RESULT_SCHEMA: Dict[str, str] = {
+    'id': 'string',
+    'region': 'string',
+    'universe': 'string',
+    'delay': 'Int64',
+    'decay': 'Int64',
+    'neutralization': 'string',
+    'truncation': 'float64',
+    'code': 'string',
+    'operator_count': 'Int64',
+    'sharpe': 'float64',
+    'fitness': 'float64',
+    'turnover': 'float64',
+    'margin': 'float64',
+    'returns': 'float64',
+    'drawdown': 'float64',
+    'long_count': 'Int64',
+    'short_count': 'Int64',
+    'has_failed_checks': 'bool',
+    'failed_checks': 'string',
+    'pyramids': 'string',
+    'single_data_set': 'bool',
+    'classifications': 'string',
+    'date_created': 'string',
+    'date': 'string',
+}
+
+
+def _literal(value) -> Union[dict, list]:
+    # CSV 中的字典 / 列表列以 Python 字面量保存，缺失或损坏时视为空
+    if not isinstance(value, str) or not value:
+        return {}
+    try:
+        return ast.literal_eval(value)
+    except (ValueError, SyntaxError):
+        return {}
+
+
+def flatten_result(row: Dict) -> Dict:
+    """
+    把一行模拟结果（CSV 行或 /alphas 接口返回的记录）展开为 RESULT_SCHEMA 的各列。
+    pyramids 保存为 JSON 文本（MATCHES_PYRAMID 检查中的原始列表），failed_checks、classifications 以逗号连接。
+    """
+    settings = row.get('settings')
+    settings = settings if isinstance(settings, dict) else _literal(settings)
+    regular = row.get('regular')
+    regular = regular if isinstance(regular, dict) else _literal(regular)
+    is_data = row.get('is')
+    is_data = is_data if isinstance(is_data, dict) else _literal(is_data)
+    classifications = row.get('classifications')
+    classifications = classifications if isinstance(classifications, list) else _literal(classifications) or []
+
+    checks = is_data.get('checks', []) or []
+    failed = [check.get('name', '') for check in checks if check.get('result') == 'FAIL']
+    pyramids = next((check['pyramids'] for check in checks
+                     if check.get('name') == 'MATCHES_PYRAMID' and 'pyramids' in check), None)
+    classification_ids = [c.get('id', '') for c in classifications if isinstance(c, dict)]
+    date_created = row.get('dateCreated')
+    date_created = date_created if isinstance(date_created, str) else None
+    return {
+        'id': row.get('id'),
+        'region': settings.get('region'),
+        'universe': settings.get('universe'),
+        'delay': settings.get('delay'),
+        'decay': settings.get('decay', 0),
+        'neutralization': settings.get('neutralization'),
+        'truncation': settings.get('truncation'),
+        'code': regular.get('code', ''),
+        'operator_count': regular.get('operatorCount', 0),
+        'sharpe': is_data.get('sharpe', 0),
+        'fitness': is_data.get('fitness', 0),
+        'turnover': is_data.get('turnover', 0),
+        'margin': is_data.get('margin', 0),
+        'returns': is_data.get('returns'),
+        'drawdown': is_data.get('drawdown'),
+        'long_count': is_data.get('longCount', 0),
+        'short_count': is_data.get('shortCount', 0),
+        'has_failed_checks': bool(failed),
+        'failed_checks': ",".join(failed),
+        'pyramids': json.dumps(pyramids) if pyramids is not None else None,
+        'single_data_set': SINGLE_DATA_SET_ID in classification_ids,
+        'classifications': ",".join(classification_ids),
+        'date_created': date_created,
+        'date': date_created[:10] if date_created else None,
+    }
+
+
+def _flatten_chunk(records: List[Dict]) -> List[Dict]:
+    return [flatten_result(record) for record in records]
+
+
+def results_frame(records: Iterable[Dict], processes: Optional[int] = None,
+                  executor: Optional[ProcessPoolExecutor] = None) -> pd.DataFrame:
+    """
+    展开多行模拟结果并转换为 RESULT_SCHEMA 的类型。
+    processes 大于 1 时在进程池中分块解析字面量列（解析是纯 CPU 开销，大文件时占加载耗时的绝大部分）。
+    多次调用时可传入已创建的 executor（大小为 processes），避免每次重新启动进程池。
+    """
+    records = list(records)
+    if processes and processes > 1 and len(records) > processes:
+        step = -(-len(records) // (processes * 4))
+        chunks = [records[lo:lo + step] for lo in range(0, len(records), step)]
+        if executor is not None:
+            rows = [row for chunk in executor.map(_flatten_chunk, chunks) for row in chunk]
+        else:
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                rows = [row for chunk in executor.map(_flatten_chunk, chunks) for row in chunk]
+    else:
+        rows = _flatten_chunk(records)
+    df = pd.DataFrame(rows, columns=list(RESULT_SCHEMA))
+    for column in ('sharpe', 'fitness', 'turnover', 'margin', 'returns', 'drawdown', 'truncation'):
+        df[column] = pd.to_numeric(df[column], errors='coerce')
+    return df.astype(RESULT_SCHEMA)
+
+
+def read_results_csv(csv_file_path: str, processes: Optional[int] = None,
+                     chunk_size: int = DEFAULT_CHUNK_SIZE) -> pd.DataFrame:
+    """
+    读取一个模拟结果 CSV 并展开为带类型的列，每个字面量字符串只解析一次。
+    按块流式读取并修复字段数不一致的行，内存中只保留一个原始块和展开后的列（远小于原文件）。
+    """
+    executor = ProcessPoolExecutor(max_workers=processes) if processes and processes > 1 else None
+    try:
+        with CsvReader(csv_file_path) as reader:
+            frames = [results_frame(chunk, processes, executor) for chunk in reader.iter_dict_chunks(chunk_size)]
+            reader.report()
+    finally:
+        if executor is not None:
+            executor.shutdown()
+    if not frames:
+        return results_frame([])
+    return pd.concat(frames, ignore_index=True)
+
+
+# load_results_csv 最多缓存的文件数，按最近使用淘汰
+RESULTS_CSV_CACHE_SIZE = 4
+# 绝对路径 -> ((修改时间, 文件大小), 展开后的结果)，按使用顺序排列，最近使用的在末尾
+_results_csv_cache: "OrderedDict[str, Tuple[Tuple[int, int], pd.DataFrame]]" = OrderedDict()
+
+
+def load_results_csv(csv_file_path: str, processes: Optional[int] = None,
+                     maxsize: Optional[int] = None) -> pd.DataFrame:
+    """
+    read_results_csv 的缓存版本：文件未变化（修改时间和大小相同）时直接返回上次的解析结果，
+    同一文件按不同阈值反复筛选时只解析一次。返回的 DataFrame 为共享对象，不要原地修改。
+    缓存只保留最近使用的 maxsize 个文件（默认 RESULTS_CSV_CACHE_SIZE，0 表示不缓存），
+    长时间运行的 notebook 中可用 clear_results_csv_cache 释放内存。
+    """
+    maxsize = RESULTS_CSV_CACHE_SIZE if maxsize is None else maxsize
+    path = os.path.abspath(csv_file_path)
+    stat = os.stat(path)
+    key = (stat.st_mtime_ns, stat.st_size)
+    cached = _results_csv_cache.pop(path, None)
+    if cached is None or cached[0] != key:
+        # 先丢掉旧结果再解析，避免新旧两份同时占用内存
+        cached = (key, read_results_csv(path, processes))
+    if maxsize > 0:
+        _results_csv_cache[path] = cached
+        while len(_results_csv_cache) > maxsize:
+            _results_csv_cache.popitem(last=False)
+    return cached[1]
+
+
+def clear_results_csv_cache(csv_file_path: Optional[str] = None) -> None:
+    """
+    清除 load_results_csv 的缓存（指定文件或全部）。
+    """
+    if csv_file_path is None:
+        _results_csv_cache.clear()
+    else:
+        _results_csv_cache.pop(os.path.abspath(csv_file_path), None)
+
+
+def _as_list(value: Union[None, str, Sequence[str]]) -> Optional[List[str]]:
+    if value is None:
+        return None
+    return [value] if isinstance(value, str) else list(value)
+
+
+class ResultsStore:
+    """
+    按 region/date 分区的模拟结果存储。未安装 pyarrow 时分区文件退化为 pandas pickle，接口不变。
+    读取过的分区按文件修改时间缓存在内存中，重复查询不再读盘。
+    """
+
+    def __init__(self, root: str = DEFAULT_ROOT, file_format: Optional[str] = None):
+        """
+        Args:
+            root: 存储根目录。
+            file_format: 'parquet' 或 'pickle'，默认安装了 pyarrow 时为 'parquet'。
+        """
+        if file_format is None:
+            file_format = 'parquet' if HAS_PYARROW else 'pickle'
+        if file_format not in ('parquet', 'pickle'):
+            raise ValueError("file_format must be 'parquet' or 'pickle'")
+        if file_format == 'parquet' and not HAS_PYARROW:
+            raise ImportError("parquet 格式需要安装 pyarrow")
+        self.root = root
+        self.file_format = file_format
+        self.suffix = '.parquet' if file_format == 'parquet' else '.pkl'
+        self._cache: Dict[str, Tuple[float, pd.DataFrame]] = {}
+        os.makedirs(root, exist_ok=True)
+
+    def _write(self, df: pd.DataFrame, path: str) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + '.tmp'
+        if self.file_format == 'parquet':
+            df.to_parquet(tmp_path, index=False)
+        else:
+            df.to_pickle(tmp_path)
+        # 先写临时文件再替换，查询时不会读到写了一半的分区
+        os.replace(tmp_path, path)
+
+    def _read(self, path: str, columns: Optional[List[str]] = None) -> pd.DataFrame:
+        mtime = os.path.getmtime(path)
+        cached = self._cache.get(path)
+        if cached is None or cached[0] != mtime:
+            df = pd.read_parquet(path) if self.file_format == 'parquet' else pd.read_pickle(path)
+            self._cache[path] = (mtime, df)
+            cached = self._cache[path]
+        return cached[1] if columns is None else cached[1][columns]
+
+    def _source_parts(self, source: str) -> List[str]:
+        return glob.glob(os.path.join(glob.escape(self.root), 'region=*', 'date=*', glob.escape(source) + self.suffix))
+
+    def ingest_frame(self, df: pd.DataFrame, source: str) -> int:
+        """
+        写入已展开的结果（results_frame / read_results_csv 的输出），按 region、date 拆分到各分区。
+        同一 source 再次写入时替换之前的分区文件。
+
+        Returns:
+            int: 写入的行数。
+        """
+        for path in self._source_parts(source):
+            os.remove(path)
+            self._cache.pop(path, None)
+        keys = df[['region', 'date']].fillna('unknown')
+        for (region, date), part in df.groupby([keys['region'], keys['date']], sort=False):
+            self._write(part.reset_index(drop=True),
+                        os.path.join(self.root, f"region={region}", f"date={date}", source + self.suffix))
+        return len(df)
+
+    def remove_source(self, source: str) -> int:
+        """
+        删除某个源文件写入的全部分区文件，包括增量写入的 "<源文件名>@<偏移量>" 分区。返回删除的文件数。
+        """
+        pattern = os.path.join(glob.escape(self.root), 'region=*', 'date=*', glob.escape(source) + '@*' + self.suffix)
+        paths = self._source_parts(source) + glob.glob(pattern)
+        for path in paths:
+            os.remove(path)
+            self._cache.pop(path, None)
+        return len(paths)
+
+    def ingest_csv(self, csv_file_path: str) -> int:
+        """
+        解析一个模拟结果 CSV 并写入存储，分区文件以源文件名命名。
+        """
+        df = read_results_csv(csv_file_path)
+        count = self.ingest_frame(df, os.path.basename(csv_file_path))
+        print(f"Ingested {count} results from {csv_file_path}")
+        return count
+
+    def ingest_directory(self, directory_path: str, pattern: str = RESULT_FILE_PATTERN) -> int:
+        """
+        写入目录下所有匹配 pattern 的结果文件，例如 simulated_alphas_USA.csv.2025-07-17。
+        """
+        total = 0
+        for file_name in sorted(os.listdir(directory_path)):
+            if fnmatch(file_name, pattern) and not file_name.endswith(('.tmp', self.suffix)):
+                total += self.ingest_csv(os.path.join(directory_path, file_name))
+        return total
+
+    def partitions(self,
+                   regions: Union[None, str, Sequence[str]] = None,
+                   start_date: Optional[str] = None,
+                   end_date: Optional[str] = None) -> List[str]:
+        """
+        按目录名裁剪分区，返回满足区域和日期范围（闭区间，'YYYY-MM-DD'）的分区文件。
+        """
+        regions = _as_list(regions)
+        paths = []
+        for path in sorted(glob.glob(os.path.join(glob.escape(self.root), 'region=*', 'date=*', '*' + self.suffix))):
+            date_dir = os.path.dirname(path)
+            region = os.path.basename(os.path.dirname(date_dir))[len('region='):]
+            date = os.path.basename(date_dir)[len('date='):]
+            if regions is not None and region not in regions:
+                continue
+            if (start_date and date < start_date) or (end_date and date > end_date):
+                continue
+            paths.append(path)
+        return paths
+
+    def load(self,
+             regions: Union[None, str, Sequence[str]] = None,
+             start_date: Optional[str] = None,
+             end_date: Optional[str] = None,
+             columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        读取分区并合并，columns 指定时只返回这些列。
+        """
+        frames = [self._read(path, columns) for path in self.partitions(regions, start_date, end_date)]
+        if not frames:
+            return pd.DataFrame(columns=columns or list(RESULT_SCHEMA)).astype(
+                {c: t for c, t in RESULT_SCHEMA.items() if columns is None or c in columns})
+        return pd.concat(frames, ignore_index=True)
+
+    def query(self,
+              regions: Union[None, str, Sequence[str]] = None,
+              start_date: Optional[str] = None,
+              end_date: Optional[str] = None,
+              min_sharpe: Optional[float] = None,
+              min_fitness: Optional[float] = None,
+              symmetric: bool = False,
+              exclude_failed_checks: bool = False,
+              single_data_set: Optional[bool] = None,
+              max_operator_count: Optional[int] = None,
+              min_positions: Optional[int] = None,
+              columns: Optional[List[str]] = None) -> pd.DataFrame:
+        """
+        按条件筛选模拟结果，条件之间为“且”关系，None 表示不过滤。
+
+        Args:
+            regions: 区域或区域列表。
+            start_date, end_date: dateCreated 的日期范围（闭区间，'YYYY-MM-DD'）。
+            min_sharpe, min_fitness: sharpe、fitness 下限。
+            symmetric: 为 True 时同时保留 sharpe <= -min_sharpe 且 fitness <= -min_fitness 的结果
+                （取反后可用，对应 get_alphas_from_csv 的 track 模式）。
+            exclude_failed_checks: 排除有 FAIL 检查项的结果（对应 submit 模式）。
+            single_data_set: 是否为单数据集 alpha。
+            max_operator_count: operatorCount 上限。
+            min_positions: longCount + shortCount 须大于该值，get_alphas_from_csv 中为 100。
+            columns: 返回的列，默认全部。
+
+        Returns:
+            pd.DataFrame: 满足条件的行，列为 RESULT_SCHEMA 或 columns。
+        """
+        df = self.load(regions, start_date, end_date)
+        mask = pd.Series(True, index=df.index)
+        if min_sharpe is not None or min_fitness is not None:
+            positive = pd.Series(True, index=df.index)
+            negative = pd.Series(True, index=df.index)
+            if min_sharpe is not None:
+                positive &= df['sharpe'] >= min_sharpe
+                negative &= df['sharpe'] <= -min_sharpe
+            if min_fitness is not None:
+                positive &= df['fitness'] >= min_fitness
+                negative &= df['fitness'] <= -min_fitness
+            mask &= (positive | negative) if symmetric else positive
+        if exclude_failed_checks:
+            mask &= ~df['has_failed_checks']
+        if single_data_set is not None:
+            mask &= df['single_data_set'] == single_data_set
+        if max_operator_count is not None:
+            mask &= (df['operator_count'] <= max_operator_count).fillna(True)
+        if min_positions is not None:
+            mask &= (df['long_count'] + df['short_count']).fillna(0) > min_positions
+        result = df[mask.fillna(False).astype(bool)].reset_index(drop=True)
+        return result if columns is None else result[columns]
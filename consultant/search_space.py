@@ -0,0 +1,266 @@
+"""
+搜索空间估算与随机访问：不生成表达式，逐级计算工厂流水线产出的表达式数量，按实测吞吐量估算模拟耗时，
+并可按下标直接取出第 i 个表达式，用于在任意大小的空间中无重复地均匀 / 分层抽样。
+
+每级的倍数通过对单个探针字段调用对应的工厂函数得到，与工厂函数的实际分支、天数、分组和事件保持一致，
+无需生成完整列表。计数为去重前的数量，与工厂函数的输出一致；下标顺序与逐级生成完整列表时的顺序相同。
+
+用法：
+    plan = (SearchSpace(fields)
+            .first_order(ts_ops_2, days=[5, 22, 66])
+            .group_second_order(group_ops, "USA")
+            .trade_when("USA"))
+    plan.report(expressions_per_hour=2000, daily_quota=5000)
+    samples = plan.sample(3000, seed=0)                      # 替代 shuffle 后切片
+    samples = plan.sample(3000, seed=0, stratify='fields')   # 每个字段抽取相同数量
+"""
+import math
+import random
+from typing import Callable, Iterable, List, Optional, Sequence, Tuple, Union
+
+import pandas as pd
+
+from machine_lib import (first_order_factory, group_factory, group_factory_for_multi_line_by_groups,
+                         trade_when_factory, twin_field_factory)
+from machine_lib_output import first_order_factory_with_day, generate_atom_expressions
+
+PROBE_FIELD = "x"
+
+Expander = Callable[[str], list]
+
+
+def first_order_expander(ops_set: Iterable[str], days: Optional[Sequence[int]] = None) -> Expander:
+    """
+    单个字段经 first_order_factory（或传入 days 时 first_order_factory_with_day）产生的表达式。
+    """
+    ops_set = list(ops_set)
+    if days is None:
+        return lambda field: first_order_factory([field], ops_set)
+    return lambda field: first_order_factory_with_day([field], ops_set, days)
+
+
+def group_expander(group_ops: Iterable[str], region: str, groups: Optional[Sequence[str]] = None) -> Expander:
+    """
+    单个一阶表达式经 group_factory（或传入 groups 时 group_factory_for_multi_line_by_groups）产生的表达式，
+    顺序与 iter_group_second_order_factory 相同。group_factory_for_multi_line 的数量与 group_factory 相同。
+    """
+    group_ops = list(group_ops)
+    if groups is None:
+        return lambda expr: [alpha for op in group_ops for alpha in group_factory(op, expr, region)]
+    return lambda expr: [alpha for op in group_ops
+                         for alpha in group_factory_for_multi_line_by_groups(op, expr, region, groups)]
+
+
+def trade_when_expander(region: str, op: str = "trade_when") -> Expander:
+    """
+    单个表达式经 trade_when_factory 产生的表达式（开仓事件数 × 平仓事件数）。
+    """
+    return lambda expr: trade_when_factory(op, expr, region)
+
+
+def first_order_multiplier(ops_set: Iterable[str], days: Optional[Sequence[int]] = None) -> int:
+    return len(first_order_expander(ops_set, days)(PROBE_FIELD))
+
+
+def group_multiplier(group_ops: Iterable[str], region: str, groups: Optional[Sequence[str]] = None) -> int:
+    return len(group_expander(group_ops, region, groups)(PROBE_FIELD))
+
+
+def trade_when_multiplier(region: str, op: str = "trade_when") -> int:
+    return len(trade_when_expander(region, op)(PROBE_FIELD))
+
+
+def _distinct_indices(rng: random.Random, n: int, k: int) -> List[int]:
+    """
+    从 range(n) 中无重复抽取 k 个下标。k 远小于 n 时用拒绝采样，期望耗时 O(k)，n 可超过 sys.maxsize。
+    """
+    if k * 4 < n:
+        chosen = set()
+        indices = []
+        while len(indices) < k:
+            index = rng.randrange(n)
+            if index not in chosen:
+                chosen.add(index)
+                indices.append(index)
+        return indices
+    return rng.sample(range(n), k)
+
+
+class SearchSpace:
+    """
+    可链式调用的搜索空间估算器，每个方法追加一级并返回自身。
+
+    各级保存单个输入的展开函数，因此第 i 个表达式可由各级的局部下标（字段、算子与天数、分组、事件……）
+    逐级展开得到，开销只与各级倍数有关，与空间大小无关。
+    """
+
+    def __init__(self, fields: Union[int, Iterable[str]]):
+        """
+        Args:
+            fields: 字段列表，或直接给出字段数（只能估算数量，不能按下标取表达式）。
+        """
+        if not isinstance(fields, int):
+            fields = list(fields)
+        self.fields = fields
+        count = fields if isinstance(fields, int) else len(fields)
+        self.stages: List[dict] = [{'stage': 'fields', 'multiplier': count, 'count': count}]
+        self._expanders: List[Optional[Expander]] = [None]
+
+    @property
+    def count(self) -> int:
+        return self.stages[-1]['count']
+
+    def __len__(self) -> int:
+        return self.count
+
+    def stage(self, name: str, multiplier: int, expand: Optional[Expander] = None) -> "SearchSpace":
+        """
+        追加一级：上一级的每个表达式产生 multiplier 个表达式。
+        expand 为单个输入到其输出列表的函数，不提供时该空间只能估算数量。
+        """
+        if self.stages[-1]['stage'] == 'decays':
+            raise ValueError("decays 必须是最后一级")
+        self.stages.append({'stage': name, 'multiplier': multiplier, 'count': self.count * multiplier})
+        self._expanders.append(expand)
+        return self
+
+    def first_order(self, ops_set: Iterable[str], days: Optional[Sequence[int]] = None) -> "SearchSpace":
+        expand = first_order_expander(ops_set, days)
+        return self.stage('first_order', len(expand(PROBE_FIELD)), expand)
+
+    def atom_expressions(self, region: str, day: int = 10) -> "SearchSpace":
+        expand = lambda field: generate_atom_expressions(field, region, day)
+        return self.stage('atom_expressions', len(expand(PROBE_FIELD)), expand)
+
+    def twin_field(self, ops: Iterable[str]) -> "SearchSpace":
+        """
+        twin_field_factory：每个字段与其余每个不同字段组合，只能作为第一级使用。
+        """
+        if isinstance(self.fields, int) or len(self.stages) > 1:
+            raise ValueError("twin_field 需要字段列表，且只能作为第一级")
+        ops = list(ops)
+        fields = self.fields
+        others = len(set(fields)) - 1
+        # 每个对手字段产生的表达式数即天数
+        per_counterpart = sum(len(twin_field_factory(op, PROBE_FIELD, [PROBE_FIELD, PROBE_FIELD + "_"]))
+                              for op in ops)
+        expand = lambda field: [alpha for op in ops for alpha in twin_field_factory(op, field, fields)]
+        return self.stage('twin_field', per_counterpart * others, expand)
+
+    def group_second_order(self, group_ops: Iterable[str], region: str,
+                           groups: Optional[Sequence[str]] = None) -> "SearchSpace":
+        expand = group_expander(group_ops, region, groups)
+        return self.stage('group_second_order', len(expand(PROBE_FIELD)), expand)
+
+    def trade_when(self, region: str, op: str = "trade_when") -> "SearchSpace":
+        expand = trade_when_expander(region, op)
+        return self.stage('trade_when', len(expand(PROBE_FIELD)), expand)
+
+    def decays(self, decays: Sequence[int]) -> "SearchSpace":
+        """
+        每个表达式以多个 decay 分别模拟，必须是最后一级；按下标取出的是 (alpha, decay)。
+        """
+        decays = list(decays)
+        return self.stage('decays', len(decays), lambda expr: [(expr, decay) for decay in decays])
+
+    def coordinates(self, index: int) -> Tuple[int, ...]:
+        """
+        把下标拆成每一级的局部下标（混合进制），第一项为字段下标。
+        """
+        if not 0 <= index < self.count:
+            raise IndexError(f"index {index} out of range for search space of size {self.count}")
+        coords = []
+        for stage in reversed(self.stages[1:]):
+            index, local = divmod(index, stage['multiplier'])
+            coords.append(local)
+        coords.append(index)
+        return tuple(reversed(coords))
+
+    def expression(self, index: int):
+        """
+        返回第 index 个表达式，与逐级生成完整列表后取 [index] 的结果相同。
+        """
+        if isinstance(self.fields, int) or None in self._expanders[1:]:
+            raise ValueError("按下标取表达式需要字段列表，且每一级都提供 expand")
+        coords = self.coordinates(index)
+        item = self.fields[coords[0]]
+        for stage, expand, local in zip(self.stages[1:], self._expanders[1:], coords[1:]):
+            outputs = expand(item)
+            if len(outputs) != stage['multiplier']:
+                raise ValueError(f"{stage['stage']} 对 {item!r} 产生 {len(outputs)} 个表达式，"
+                                 f"与倍数 {stage['multiplier']} 不一致")
+            item = outputs[local]
+        return item
+
+    def __getitem__(self, index: int):
+        return self.expression(index)
+
+    def sample_indices(self, k: int, seed=None, stratify: Optional[str] = None) -> List[int]:
+        """
+        无重复抽取 k 个下标，参数同 sample。
+        """
+        rng = seed if isinstance(seed, random.Random) else random.Random(seed)
+        k = min(k, self.count)
+        if stratify is None:
+            return _distinct_indices(rng, self.count, k)
+
+        names = [stage['stage'] for stage in self.stages]
+        if stratify not in names:
+            raise ValueError(f"unknown stage: {stratify}，可选 {names}")
+        n_strata = self.stages[names.index(stratify)]['count']
+        stratum_size = self.count // n_strata
+        # 每层分到 base 个，余下 extra 个随机分给不同的层
+        base, extra = divmod(k, n_strata)
+        quota = dict.fromkeys(_distinct_indices(rng, n_strata, extra), 1)
+        strata = range(n_strata) if base else quota
+        indices = []
+        for stratum in strata:
+            n = base + quota.get(stratum, 0)
+            indices += [stratum * stratum_size + offset for offset in _distinct_indices(rng, stratum_size, n)]
+        rng.shuffle(indices)
+        return indices
+
+    def sample(self, k: int, seed=None, stratify: Optional[str] = None) -> list:
+        """
+        无重复地抽取 k 个表达式，耗时与 k 成正比，与空间大小无关，可替代生成完整列表后 shuffle 再切片。
+
+        Args:
+            k: 样本数，超过空间大小时取全部。
+            seed: 随机种子或 random.Random 实例。
+            stratify: 分层依据的级名，例如 'fields'（每个字段一层）、'first_order'；该级的每个表达式作为一层，
+                各层样本数相差不超过 1。None 表示整体均匀抽样。
+
+        Returns:
+            list: 样本表达式（最后一级为 decays 时为 (alpha, decay)），顺序随机。
+        """
+        return [self.expression(index) for index in self.sample_indices(k, seed, stratify)]
+
+    def hours(self, expressions_per_hour: float) -> float:
+        """
+        按吞吐量（每小时完成的表达式数，可由 benchmark_brain 或历史运行得到）估算模拟小时数。
+        """
+        return self.count / expressions_per_hour
+
+    def report(self,
+               expressions_per_hour: Optional[float] = None,
+               daily_quota: Optional[int] = None,
+               verbose: bool = True) -> pd.DataFrame:
+        """
+        返回各级的倍数与累计表达式数；给出吞吐量和每日额度时附加预计小时数和所需天数。
+
+        Args:
+            expressions_per_hour: 每小时完成的表达式数。
+            daily_quota: 每日可模拟的表达式数。
+            verbose: 是否打印。
+
+        Returns:
+            pd.DataFrame: 列为 stage、multiplier、count（以及 hours、quota_days）。
+        """
+        df = pd.DataFrame(self.stages)
+        if expressions_per_hour:
+            df['hours'] = (df['count'] / expressions_per_hour).round(2)
+        if daily_quota:
+            df['quota_days'] = df['count'].map(lambda n: math.ceil(n / daily_quota))
+        if verbose:
+            print(df.to_string(index=False))
+        return df
@@ -0,0 +1,131 @@
+import json
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Callable, Optional
+
+import requests
+
+from rate_limiter import PRIORITY_DEFAULT, limited_request
+
+
+class SessionManager:
+    """
+    共享的已认证会话管理器。
+
+    - 只登录一次，所有调用方共享同一个 requests.Session；
+    - 通过 401 响应或缺失 'is' 数据识别登录失效，多个调用方同时发现失效时只刷新一次；
+    - 将会话 cookie 保存到磁盘，并行的工作进程和重启后的 notebook 可直接复用，无需重新登录。
+    """
+
+    def __init__(self,
+                 login_func: Callable[[], requests.Session],
+                 cookie_path: Optional[str] = "data/session_cookies",
+                 max_cookie_age: float = 3 * 3600,
+                 session: Optional[requests.Session] = None):
+        """
+        Args:
+            login_func: 执行登录并返回会话的函数，例如 login 或 login_hk。
+            cookie_path: cookie 文件路径（不含 .json 后缀），None 表示不落盘。
+            max_cookie_age: 磁盘上的 cookie 超过该秒数后不再复用。
+            session: 已登录的会话，可选。
+        """
+        self.login_func = login_func
+        self.cookie_path = cookie_path
+        self.max_cookie_age = max_cookie_age
+        self._session = session
+        # 当前会话所用 cookie 文件的修改时间，用于判断其他进程是否已刷新
+        self._cookie_mtime = 0.0
+        self._lock = threading.Lock()
+
+    @property
+    def _cookie_file(self) -> Optional[Path]:
+        return Path(self.cookie_path + '.json') if self.cookie_path else None
+
+    def _load_cookies(self, newer_than: float = 0.0) -> Optional[requests.Session]:
+        """
+        从磁盘加载 cookie 构建会话，文件不存在、过期或不比 newer_than 新时返回 None。
+        """
+        cookie_file = self._cookie_file
+        if cookie_file is None or not cookie_file.exists():
+            return None
+        mtime = cookie_file.stat().st_mtime
+        if mtime <= newer_than or time.time() - mtime > self.max_cookie_age:
+            return None
+        try:
+            with open(cookie_file, 'r', encoding='utf-8') as f:
+                cookies = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(cookies, dict):
+            return None
+        s = requests.Session()
+        s.cookies = requests.utils.cookiejar_from_dict(cookies)
+        self._cookie_mtime = mtime
+        return s
+
+    def _save_cookies(self, s: requests.Session) -> None:
+        cookie_file = self._cookie_file
+        if cookie_file is None:
+            return
+        cookie_file.parent.mkdir(parents=True, exist_ok=True)
+        # 只保存 name -> value 的 JSON，不用 pickle，加载时不会执行文件中的任意代码；
+        # 先写临时文件再原子替换，避免其他进程读到写了一半的文件
+        tmp_file = cookie_file.with_suffix(f'.{os.getpid()}.tmp')
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(requests.utils.dict_from_cookiejar(s.cookies), f)
+        os.replace(tmp_file, cookie_file)
+        self._cookie_mtime = cookie_file.stat().st_mtime
+
+    def _login(self) -> requests.Session:
+        s = self.login_func()
+        self._save_cookies(s)
+        return s
+
+    def get(self) -> requests.Session:
+        """
+        返回当前会话，首次调用时优先复用磁盘上的 cookie，否则登录。
+        """
+        if self._session is None:
+            with self._lock:
+                if self._session is None:
+                    self._session = self._load_cookies() or self._login()
+        return self._session
+
+    def refresh(self, stale: Optional[requests.Session] = None) -> requests.Session:
+        """
+        刷新会话。stale 为调用方发现失效的会话：若其他调用方已经刷新过，直接返回新会话而不再登录；
+        若其他进程已在磁盘上写入了更新的 cookie，也直接复用。
+        """
+        with self._lock:
+            if stale is not None and self._session is not None and self._session is not stale:
+                return self._session
+            self._session = self._load_cookies(newer_than=self._cookie_mtime) or self._login()
+            return self._session
+
+    @staticmethod
+    def is_expired(response: requests.Response, expect_is: bool = False) -> bool:
+        """
+        判断响应是否表示登录失效：401，或期望包含 'is' 数据的 alpha 响应中缺失 'is'。
+        """
+        if response.status_code == requests.codes.unauthorized:
+            return True
+        if expect_is and response.status_code < 400 and not response.headers.get("Retry-After"):
+            try:
+                return not response.json().get("is")
+            except ValueError:
+                return True
+        return False
+
+    def request(self, method: str, url: str, expect_is: bool = False, priority: int = PRIORITY_DEFAULT,
+                **kwargs) -> requests.Response:
+        """
+        使用共享会话经限流器发送请求，登录失效时刷新一次后重试。
+        """
+        s = self.get()
+        response = limited_request(s, method, url, priority, **kwargs)
+        if self.is_expired(response, expect_is):
+            s = self.refresh(s)
+            response = limited_request(s, method, url, priority, **kwargs)
+        return response
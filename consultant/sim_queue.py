@@ -0,0 +1,198 @@
+import ast
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from fastexpr import canonical_form
+
+PENDING = 'pending'
+POSTED = 'posted'
+COMPLETE = 'complete'
+FAILED = 'failed'
+
+
+def simulation_key(simulation_data: Dict) -> str:
+    """
+    计算一条模拟数据的唯一键：规范化后的表达式 + 设置（排序后的 JSON）。
+    仅空白、布局或局部变量名不同的表达式视为同一条模拟。
+    """
+    payload = json.dumps({'regular': canonical_form(simulation_data['regular']),
+                          'settings': simulation_data['settings']}, sort_keys=True)
+    return hashlib.md5(payload.encode()).hexdigest()
+
+
+class SimulationQueue:
+    """
+    基于 SQLite 的持久化模拟队列，记录每条待模拟数据的状态：
+    pending -> posted（附进度 URL）-> complete / failed。
+
+    程序崩溃或重新登录后直接重新打开同一个数据库即可从中断处继续：
+    已提交的任务只轮询进度 URL，不会被重复提交。
+    """
+
+    def __init__(self, path: str = "output/simulation_queue.db"):
+        self.path = path
+        if os.path.dirname(path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+        # 调度器可能在独立线程中运行，连接需要跨线程使用
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS simulations (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    sim_key TEXT UNIQUE NOT NULL,
+                    region TEXT,
+                    universe TEXT,
+                    simulation_data TEXT NOT NULL,
+                    state TEXT NOT NULL DEFAULT 'pending',
+                    progress_url TEXT,
+                    alpha_id TEXT,
+                    error TEXT,
+                    updated_at REAL
+                )""")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_state ON simulations(state, region, universe, id)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS idx_progress ON simulations(progress_url)")
+
+    def close(self) -> None:
+        self._conn.close()
+
+    def enqueue(self, simulation_data_list: Iterable[Dict]) -> int:
+        """
+        批量加入待模拟数据，已存在（同表达式同设置）的条目会被忽略。
+
+        Returns:
+            int: 新加入的条目数。
+        """
+        rows = []
+        for simulation_data in simulation_data_list:
+            settings = simulation_data['settings']
+            if isinstance(settings, str):
+                settings = ast.literal_eval(settings)
+            simulation_data = dict(simulation_data, settings=settings)
+            rows.append((simulation_key(simulation_data), settings.get('region'), settings.get('universe'),
+                         json.dumps(simulation_data), time.time()))
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO simulations (sim_key, region, universe, simulation_data, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)", rows)
+            self._conn.execute("COMMIT")
+            return self._conn.total_changes - before
+
+    def import_csv(self, csv_path: str) -> int:
+        """
+        将 generate_pending_simulation_data 生成的 CSV 导入队列。
+        """
+        import csv
+        with open(csv_path, 'r', newline='', encoding='utf-8') as file:
+            return self.enqueue(row for row in csv.DictReader(file))
+
+    def claim(self, limit: int) -> List[Tuple[int, Dict]]:
+        """
+        取出最多 limit 条 region/universe 相同的 pending 条目，并在提交前标记为 posted（进度 URL 为空）。
+        若提交过程中崩溃，这些条目会保留 posted 且无 URL 的状态，不会被自动重复提交。
+        """
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            first = self._conn.execute(
+                "SELECT region, universe FROM simulations WHERE state = ? ORDER BY id LIMIT 1", (PENDING,)).fetchone()
+            if first is None:
+                self._conn.execute("COMMIT")
+                return []
+            rows = self._conn.execute(
+                "SELECT id, simulation_data FROM simulations WHERE state = ? AND region IS ? AND universe IS ? "
+                "ORDER BY id LIMIT ?", (PENDING, first[0], first[1], limit)).fetchall()
+            self._conn.executemany("UPDATE simulations SET state = ?, updated_at = ? WHERE id = ?",
+                                   [(POSTED, time.time(), row[0]) for row in rows])
+            self._conn.execute("COMMIT")
+        return [(row[0], json.loads(row[1])) for row in rows]
+
+    def mark_posted(self, ids: List[int], progress_url: str) -> None:
+        self._update(ids, state=POSTED, progress_url=progress_url)
+
+    def mark_complete(self, ids: List[int], alpha_ids: Optional[List[Optional[str]]] = None) -> None:
+        if alpha_ids is None:
+            self._update(ids, state=COMPLETE)
+            return
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "UPDATE simulations SET state = ?, alpha_id = ?, error = NULL, updated_at = ? WHERE id = ?",
+                [(COMPLETE, alpha_id, time.time(), id_) for id_, alpha_id in zip(ids, alpha_ids)])
+            self._conn.execute("COMMIT")
+
+    def mark_children(self, ids: List[int], child_results: List[Dict]) -> None:
+        """
+        按子模拟结果逐条更新：拿到 alpha ID 的标记为 complete，否则标记为 failed 并记录错误信息。
+        """
+        missing = [{'alpha_id': None, 'error': 'missing child'}] * (len(ids) - len(child_results))
+        child_results = list(child_results) + missing
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                "UPDATE simulations SET state = ?, alpha_id = ?, error = ?, updated_at = ? WHERE id = ?",
+                [(COMPLETE if child['alpha_id'] else FAILED, child['alpha_id'],
+                  None if child['alpha_id'] else child.get('error'), time.time(), id_)
+                 for id_, child in zip(ids, child_results)])
+            self._conn.execute("COMMIT")
+
+    def mark_failed(self, ids: List[int], error: str) -> None:
+        self._update(ids, state=FAILED, error=error)
+
+    def _update(self, ids: List[int], **columns) -> None:
+        assignments = ", ".join(f"{name} = ?" for name in columns)
+        with self._lock:
+            self._conn.execute("BEGIN")
+            self._conn.executemany(
+                f"UPDATE simulations SET {assignments}, updated_at = ? WHERE id = ?",
+                [tuple(columns.values()) + (time.time(), id_) for id_ in ids])
+            self._conn.execute("COMMIT")
+
+    def posted_tasks(self) -> List[Tuple[str, List[int], List[Dict]]]:
+        """
+        返回已提交但未完成的任务，按进度 URL 分组：[(progress_url, ids, simulation_data_list)]。
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT progress_url, id, simulation_data FROM simulations "
+                "WHERE state = ? AND progress_url IS NOT NULL ORDER BY id", (POSTED,)).fetchall()
+        grouped = {}
+        for progress_url, id_, simulation_data in rows:
+            ids, data = grouped.setdefault(progress_url, ([], []))
+            ids.append(id_)
+            data.append(json.loads(simulation_data))
+        return [(url, ids, data) for url, (ids, data) in grouped.items()]
+
+    def recover_interrupted(self, retry: bool = False) -> int:
+        """
+        处理提交过程中中断（posted 且无进度 URL）的条目。
+        默认标记为 failed 以免重复模拟；retry=True 时放回 pending。
+        """
+        state, error = (PENDING, None) if retry else (FAILED, "interrupted while posting")
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE simulations SET state = ?, error = ?, updated_at = ? "
+                "WHERE state = ? AND progress_url IS NULL", (state, error, time.time(), POSTED))
+            return cursor.rowcount
+
+    def retry_failed(self) -> int:
+        """
+        将 failed 条目放回 pending。
+        """
+        with self._lock:
+            cursor = self._conn.execute(
+                "UPDATE simulations SET state = ?, progress_url = NULL, error = NULL, updated_at = ? WHERE state = ?",
+                (PENDING, time.time(), FAILED))
+            return cursor.rowcount
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT state, COUNT(*) FROM simulations GROUP BY state").fetchall()
+        return dict(rows)
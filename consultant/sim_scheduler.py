@@ -0,0 +1,332 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+import requests
+
+from machine_lib import brain_api_url, login, generate_sim_data, session_manager
+from rate_limiter import PRIORITY_POLL, PRIORITY_SIMULATE, limited_get, limited_request
+from session_pool import SessionManager
+from sim_queue import SimulationQueue
+
+
+def _retry_after(response: requests.Response) -> float:
+    """
+    读取响应中的 Retry-After 头，缺失时返回 0。
+    """
+    try:
+        return float(response.headers.get("Retry-After", 0) or 0)
+    except ValueError:
+        return 0.0
+
+
+def _iter_tasks(alpha_list: Iterable[Tuple[str, int]], limit_of_children_simulations: int) -> Iterator[List[Tuple[str, int]]]:
+    """
+    按 limit_of_children_simulations 将 (alpha, decay) 流切分为 multi-simulation 任务，不一次性物化。
+    """
+    task = []
+    for item in alpha_list:
+        task.append(item)
+        if len(task) == limit_of_children_simulations:
+            yield task
+            task = []
+    if task:
+        yield task
+
+
+def _resolve_manager(s: Optional[requests.Session]) -> SessionManager:
+    """
+    未指定会话时使用共享的 session_manager；指定时包装为独立的管理器，失效时用 login 刷新。
+    """
+    if s is None:
+        return session_manager
+    return SessionManager(login, cookie_path=None, session=s)
+
+
+async def _get_with_retry_after(manager: SessionManager, url: str, priority: int = PRIORITY_POLL) -> requests.Response:
+    """
+    GET 请求，按服务端返回的 Retry-After 等待后重试，等待期间不占用线程；登录失效时刷新会话一次。
+    """
+    refreshed = False
+    while True:
+        s = await asyncio.to_thread(manager.get)
+        response = await asyncio.to_thread(limited_get, s, url, priority)
+        if SessionManager.is_expired(response) and not refreshed:
+            await asyncio.to_thread(manager.refresh, s)
+            refreshed = True
+            continue
+        retry_after = _retry_after(response)
+        if retry_after == 0:
+            return response
+        await asyncio.sleep(retry_after)
+
+
+async def _post_simulation(manager: SessionManager, sim_data_list: List[Dict], max_post_retries: int) -> str:
+    """
+    提交一个 multi-simulation，返回进度 URL。被限流时按 Retry-After 等待，其他错误指数退避并重新登录。
+    """
+    backoff = 5.0
+    for attempt in range(max_post_retries):
+        s = await asyncio.to_thread(manager.get)
+        try:
+            response = await asyncio.to_thread(limited_request, s, "POST", brain_api_url + '/simulations',
+                                               PRIORITY_SIMULATE, json=sim_data_list)
+        except requests.exceptions.RequestException as e:
+            print(f"post error: {e}")
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 600)
+            continue
+        if 'Location' in response.headers:
+            return response.headers['Location']
+        retry_after = _retry_after(response)
+        if retry_after:
+            await asyncio.sleep(retry_after)
+            continue
+        print("location key error: %s" % response.content)
+        await asyncio.sleep(backoff)
+        backoff = min(backoff * 2, 600)
+        await asyncio.to_thread(manager.refresh, s)
+    raise RuntimeError(f"post simulation failed after {max_post_retries} retries")
+
+
+async def _resolve_child(manager: SessionManager, child: str, semaphore: asyncio.Semaphore) -> Dict:
+    """
+    获取单个子模拟的结果：{'child', 'alpha_id', 'status', 'error'}。
+    """
+    result = {'child': child, 'alpha_id': None, 'status': None, 'error': None}
+    async with semaphore:
+        try:
+            child_progress = await _get_with_retry_after(manager, brain_api_url + "/simulations/" + child)
+            child_progress.raise_for_status()
+            data = child_progress.json()
+            result['alpha_id'] = data.get("alpha")
+            result['status'] = data.get("status")
+            if result['alpha_id'] is None:
+                result['error'] = data.get("message") or f"status {result['status']}"
+        except Exception as e:
+            result['error'] = str(e)
+    return result
+
+
+async def resolve_children(manager: SessionManager, children: List[str],
+                           semaphore: Optional[asyncio.Semaphore] = None) -> List[Dict]:
+    """
+    以有限并发获取子模拟结果，返回与 children 位置一一对应的结构化结果列表。
+
+    Args:
+        manager: 会话管理器。
+        children: 子模拟 ID 列表。
+        semaphore: 并发上限，多个任务共享同一个信号量时并发上限对所有任务生效；默认 10。
+
+    Returns:
+        list: [{'child', 'alpha_id', 'status', 'error'}]
+    """
+    semaphore = semaphore or asyncio.Semaphore(10)
+    results = await asyncio.gather(*(_resolve_child(manager, child, semaphore) for child in children))
+    for child_result in results:
+        if child_result['error']:
+            print(f"child {child_result['child']} error: {child_result['error']}")
+    return list(results)
+
+
+async def _run_job(manager: SessionManager, job: Dict, max_post_retries: int,
+                   on_posted: Optional[Callable[[Dict], None]], child_semaphore: asyncio.Semaphore) -> Dict:
+    """
+    运行一个 multi-simulation 槽位：提交（已有进度 URL 时跳过）、轮询直至完成、收割子 alpha。
+    """
+    result = dict(job, status=None, child_results=[], children=[], error=None)
+    try:
+        if not result.get('progress_url'):
+            result['progress_url'] = await _post_simulation(manager, job['sim_data_list'], max_post_retries)
+            if on_posted is not None:
+                on_posted(result)
+        progress = (await _get_with_retry_after(manager, result['progress_url'])).json()
+        result['status'] = progress.get("status")
+        if result['status'] != "COMPLETE":
+            print("Not complete : %s" % result['progress_url'])
+        result['child_results'] = await resolve_children(manager, progress.get("children", []), child_semaphore)
+        result['children'] = [child['alpha_id'] for child in result['child_results'] if child['alpha_id']]
+    except Exception as e:
+        result['error'] = str(e)
+    return result
+
+
+async def _schedule(manager: SessionManager, jobs: Iterator[Dict], max_in_flight: int, max_post_retries: int,
+                    on_posted: Optional[Callable[[Dict], None]] = None,
+                    child_concurrency: int = 20) -> AsyncIterator[Dict]:
+    """
+    滑动窗口核心：始终保持 max_in_flight 个槽位占满，任一槽位完成立即补位，结果按完成顺序产出。
+    所有槽位共享 child_concurrency 个子结果请求并发。
+    """
+    in_flight = set()
+    child_semaphore = asyncio.Semaphore(child_concurrency)
+
+    def fill():
+        while len(in_flight) < max_in_flight:
+            job = next(jobs, None)
+            if job is None:
+                return
+            in_flight.add(asyncio.ensure_future(_run_job(manager, job, max_post_retries, on_posted, child_semaphore)))
+
+    fill()
+    while in_flight:
+        done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+        for future in done:
+            in_flight.discard(future)
+        # 先补位再产出结果，避免调用方处理结果时槽位空闲
+        fill()
+        for future in done:
+            yield future.result()
+
+
+async def iter_simulation_results(alpha_list: Iterable[Tuple[str, int]],
+                                  neut: str,
+                                  region: str,
+                                  universe: str,
+                                  max_in_flight: int = 10,
+                                  limit_of_children_simulations: int = 10,
+                                  s: Optional[requests.Session] = None,
+                                  max_post_retries: int = 5,
+                                  child_concurrency: int = 20) -> AsyncIterator[Dict]:
+    """
+    滑动窗口调度 multi-simulation：始终保持 max_in_flight 个槽位占满，任一槽位完成立即补位，
+    结果按完成顺序产出。
+
+    Args:
+        alpha_list: (alpha, decay) 元组的可迭代对象，与 load_task_pool / generate_sim_data 的输入一致。
+        neut, region, universe: 模拟设置，同 multi_simulate。
+        max_in_flight: 同时进行的 multi-simulation 数量。
+        limit_of_children_simulations: 每个 multi-simulation 包含的 alpha 数量。
+        s: 已登录的会话，未指定时自动登录。
+        max_post_retries: 单个任务提交失败的最大重试次数。
+        child_concurrency: 所有槽位共享的子结果请求并发上限。
+
+    Yields:
+        dict: {'task', 'sim_data_list', 'progress_url', 'status', 'child_results', 'children', 'error'}，
+            child_results 与任务中的 alpha 一一对应：[{'child', 'alpha_id', 'status', 'error'}]。
+    """
+    jobs = ({'task': task, 'sim_data_list': generate_sim_data(task, region, universe, neut)}
+            for task in _iter_tasks(alpha_list, limit_of_children_simulations))
+    async for result in _schedule(_resolve_manager(s), jobs, max_in_flight, max_post_retries,
+                                  child_concurrency=child_concurrency):
+        yield result
+
+
+def _queue_jobs(queue: SimulationQueue, limit_of_children_simulations: int) -> Iterator[Dict]:
+    """
+    先恢复已提交未完成的任务（只轮询），再按需从队列领取 pending 条目。
+    """
+    for progress_url, ids, sim_data_list in queue.posted_tasks():
+        yield {'ids': ids, 'sim_data_list': sim_data_list, 'progress_url': progress_url}
+    while True:
+        claimed = queue.claim(limit_of_children_simulations)
+        if not claimed:
+            return
+        yield {'ids': [id_ for id_, _ in claimed], 'sim_data_list': [data for _, data in claimed]}
+
+
+async def iter_queue_results(queue: SimulationQueue,
+                             max_in_flight: int = 10,
+                             limit_of_children_simulations: int = 10,
+                             s: Optional[requests.Session] = None,
+                             max_post_retries: int = 5,
+                             retry_interrupted: bool = False,
+                             child_concurrency: int = 20) -> AsyncIterator[Dict]:
+    """
+    从持久化队列调度模拟，并把每个任务的状态写回队列。重启后从中断处继续，已提交的任务不会重复提交。
+
+    Args:
+        queue: SimulationQueue 实例。
+        retry_interrupted: 是否重新提交上次在提交过程中中断的条目（可能导致重复模拟），默认标记为 failed。
+        其余参数同 iter_simulation_results。
+    """
+    queue.recover_interrupted(retry=retry_interrupted)
+
+    def on_posted(job: Dict) -> None:
+        queue.mark_posted(job['ids'], job['progress_url'])
+
+    jobs = _queue_jobs(queue, limit_of_children_simulations)
+    async for result in _schedule(_resolve_manager(s), jobs, max_in_flight, max_post_retries, on_posted,
+                                  child_concurrency):
+        ids = result['ids']
+        if result['error'] and not result['progress_url']:
+            queue.mark_failed(ids, result['error'])
+        elif result['error']:
+            # 轮询出错时服务端可能仍在模拟，保持 posted 状态，下次运行继续轮询
+            print(f"poll error, keep posted: {result['progress_url']}")
+        elif result['child_results']:
+            queue.mark_children(ids, result['child_results'])
+        elif result['status'] == "COMPLETE":
+            queue.mark_complete(ids)
+        else:
+            queue.mark_failed(ids, f"status {result['status']}")
+        yield result
+
+
+async def _collect(results: AsyncIterator[Dict], verbose: bool) -> List[Dict]:
+    collected = []
+    async for result in results:
+        if verbose:
+            if result['error']:
+                print(f"task error: {result['error']}")
+            print(f"children_list:{result['children']}")
+        collected.append(result)
+    return collected
+
+
+def _run_sync(make_results: Callable[[], AsyncIterator[Dict]], max_workers: int, verbose: bool) -> List[Dict]:
+    """
+    在新的事件循环中运行调度器；在 Jupyter 等已有事件循环的环境中改在独立线程内运行。
+    """
+    async def main() -> List[Dict]:
+        # 阻塞的 requests 调用在线程池中执行：每个槽位一个轮询线程，加上子结果请求的并发
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=max_workers))
+        return await _collect(make_results(), verbose)
+
+    try:
+        asyncio.get_running_loop()
+    except RuntimeError:
+        return asyncio.run(main())
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        return executor.submit(asyncio.run, main()).result()
+
+
+def sliding_window_simulate(alpha_list: Iterable[Tuple[str, int]],
+                            neut: str,
+                            region: str,
+                            universe: str,
+                            max_in_flight: int = 10,
+                            limit_of_children_simulations: int = 10,
+                            s: Optional[requests.Session] = None,
+                            max_post_retries: int = 5,
+                            child_concurrency: int = 20,
+                            verbose: bool = True) -> List[Dict]:
+    """
+    iter_simulation_results 的同步封装，返回全部任务结果（按完成顺序）。
+    """
+    return _run_sync(
+        lambda: iter_simulation_results(alpha_list, neut, region, universe, max_in_flight,
+                                        limit_of_children_simulations, s, max_post_retries, child_concurrency),
+        max_in_flight + child_concurrency, verbose)
+
+
+def queue_simulate(queue: SimulationQueue,
+                   max_in_flight: int = 10,
+                   limit_of_children_simulations: int = 10,
+                   s: Optional[requests.Session] = None,
+                   max_post_retries: int = 5,
+                   retry_interrupted: bool = False,
+                   child_concurrency: int = 20,
+                   verbose: bool = True) -> List[Dict]:
+    """
+    iter_queue_results 的同步封装。中断后再次调用即可从中断处继续。
+
+    Examples:
+        queue = SimulationQueue("output/simulation_queue.db")
+        queue_simulate(queue, max_in_flight=10)
+        print(queue.counts())
+    """
+    return _run_sync(
+        lambda: iter_queue_results(queue, max_in_flight, limit_of_children_simulations, s, max_post_retries,
+                                   retry_interrupted, child_concurrency),
+        max_in_flight + child_concurrency, verbose)
@@ -0,0 +1,135 @@
+import heapq
+import math
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, Iterable, Optional, Tuple
+
+import pandas as pd
+import requests
+
+from machine_lib import brain_api_url, session_manager
+from rate_limiter import PRIORITY_BULK
+from session_pool import SessionManager
+
+CHECK_COLUMNS = ['alpha_id', 'passed', 'prod_correlation', 'failed_checks', 'checks', 'attempts', 'error']
+
+
+def _check_once(manager: SessionManager, alpha_id: str) -> Tuple[Optional[Dict], Optional[float], Optional[str]]:
+    """
+    请求一次 /alphas/{id}/check，不在工作线程中等待。
+
+    Returns:
+        tuple: (结果行, 重试延迟, 重试原因)。结果行为 None 时表示需要重试：
+            仍在计算时延迟取 Retry-After（无法解析为秒数时为 None，由调用方按退避计算），
+            其他情况延迟为 0，由调用方按退避计算。
+    """
+    try:
+        response = manager.request("GET", brain_api_url + "/alphas/" + alpha_id + "/check",
+                                   expect_is=True, priority=PRIORITY_BULK)
+    except requests.exceptions.RequestException as e:
+        return None, 0.0, str(e)
+    retry_after = response.headers.get("Retry-After")
+    if retry_after:
+        try:
+            delay = float(retry_after)
+        except ValueError:
+            # Retry-After 也可能是 HTTP 日期
+            delay = None
+        return None, delay, "pending"
+    if response.status_code >= 400:
+        return None, 0.0, f"HTTP {response.status_code}"
+    try:
+        checks = response.json()["is"]["checks"]
+    except (ValueError, KeyError, TypeError) as e:
+        return None, 0.0, f"bad response: {e}"
+
+    failed = [check["name"] for check in checks if check.get("result") == "FAIL"]
+    prod_correlation = next((check.get("value") for check in checks if check.get("name") == "PROD_CORRELATION"),
+                            None)
+    if isinstance(prod_correlation, float) and math.isnan(prod_correlation):
+        prod_correlation = None
+    if prod_correlation is None and not failed:
+        # 其他检查都通过、自相关尚未算出时稍后重试；已有 FAIL 时结果已确定
+        return None, 0.0, "PROD_CORRELATION is NaN"
+    return {'alpha_id': alpha_id, 'passed': not failed, 'prod_correlation': prod_correlation,
+            'failed_checks': failed, 'checks': checks, 'error': None}, 0.0, None
+
+
+def check_alphas(alpha_ids: Iterable[str],
+                 max_workers: int = 10,
+                 max_attempts: int = 6,
+                 base_delay: float = 5.0,
+                 max_delay: float = 300.0,
+                 max_pending_wait: float = 1800.0,
+                 manager: Optional[SessionManager] = None,
+                 verbose: bool = True) -> pd.DataFrame:
+    """
+    以有限并发批量检查 alpha 的提交条件。
+
+    需要重试的 alpha 进入延迟队列，各自按指数退避等待，不阻塞其他 alpha：
+    - check 仍在计算（Retry-After）时按服务端给出的时间等待，不计入失败次数，总等待不超过 max_pending_wait；
+    - 请求出错，或其他检查均未 FAIL 而 PROD_CORRELATION 为 NaN 时按 base_delay * 2^n 退避，最多 max_attempts 次。
+
+    Args:
+        alpha_ids: 待检查的 alpha ID。
+        max_workers: 并发请求数。
+        max_attempts: 出错时的最大尝试次数。
+        base_delay, max_delay: 退避的初始和最大延迟（秒）。
+        max_pending_wait: 单个 alpha 等待 check 计算完成的最长时间（秒）。
+        manager: 会话管理器，默认使用共享会话。
+        verbose: 是否打印进度。
+
+    Returns:
+        pd.DataFrame: 每个 alpha 一行，列为 CHECK_COLUMNS；passed 为 None 表示最终未能拿到结果，原因见 error。
+    """
+    manager = manager or session_manager
+    # 延迟队列：(可执行时间, 序号, alpha_id)
+    delayed = []
+    state = {}
+    for seq, alpha_id in enumerate(dict.fromkeys(alpha_ids)):
+        heapq.heappush(delayed, (0.0, seq, alpha_id))
+        state[alpha_id] = {'attempts': 0, 'failures': 0, 'first_seen': None}
+    seq = len(state)
+    rows = []
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+        while delayed or running:
+            now = time.monotonic()
+            while delayed and delayed[0][0] <= now and len(running) < max_workers:
+                _, _, alpha_id = heapq.heappop(delayed)
+                info = state[alpha_id]
+                info['attempts'] += 1
+                info['first_seen'] = info['first_seen'] or now
+                running[executor.submit(_check_once, manager, alpha_id)] = alpha_id
+            if not running:
+                time.sleep(max(0.0, delayed[0][0] - now))
+                continue
+            timeout = max(0.0, delayed[0][0] - now) if delayed and len(running) < max_workers else None
+            done, _ = wait(running, timeout=timeout, return_when=FIRST_COMPLETED)
+            for future in done:
+                alpha_id = running.pop(future)
+                info = state[alpha_id]
+                row, delay, reason = future.result()
+                if row is not None:
+                    rows.append(dict(row, attempts=info['attempts']))
+                    if verbose and len(rows) % 50 == 0:
+                        print(f"checked {len(rows)}/{len(state)}")
+                    continue
+                now = time.monotonic()
+                if reason == "pending":
+                    give_up = now - info['first_seen'] > max_pending_wait
+                    if delay is None:
+                        delay = min(max_delay, base_delay * 2 ** (info['attempts'] - 1))
+                else:
+                    info['failures'] += 1
+                    give_up = info['failures'] >= max_attempts
+                    delay = min(max_delay, base_delay * 2 ** (info['failures'] - 1))
+                if give_up:
+                    rows.append({'alpha_id': alpha_id, 'passed': None, 'prod_correlation': None,
+                                 'failed_checks': [], 'checks': [], 'attempts': info['attempts'], 'error': reason})
+                    continue
+                seq += 1
+                heapq.heappush(delayed, (now + delay, seq, alpha_id))
+
+    return pd.DataFrame(rows, columns=CHECK_COLUMNS)
@@ -0,0 +1,283 @@
+"""
+多行 alpha 模板引擎：模板只编译一次，拆成字面量片段和槽位，按笛卡尔积批量渲染，大规模时分到多个进程。
+
+与在多层循环里逐个调用 str.format 相比：
+- 每个取值只格式化一次，渲染一条表达式只需一次 C 层的 % 拼接；
+- 去重在槽位层面完成（按规范形式去掉重复的原子取值、跳过模板未使用的维度），不再为每条表达式保存完整字符串；
+  需要逐条按规范指纹去重时使用 dedupe="fingerprint"，集合中只保存 64 位整数，且指纹在工作进程中计算。
+
+用法：
+    values = {'target': target_list, 'market': market_list, 'sector': sector_list, 'cap': [cap], 'day': days}
+    for alpha in iter_render([template_a, template_b], values, counter='count'):
+        ...
+    alphas = render_all(templates, values, counter='count', processes=8)
+"""
+import string
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from itertools import product
+from math import prod
+from operator import itemgetter
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+from fastexpr import Call, FastExprSyntaxError, Name, Number, String, canonical_form, compact_fingerprint, parse
+
+DEDUPE_MODES = (None, "slots", "fingerprint")
+
+
+def _format_value(value, spec: str, conversion: Optional[str]) -> str:
+    if conversion == "r":
+        value = repr(value)
+    elif conversion == "a":
+        value = ascii(value)
+    elif conversion == "s":
+        value = str(value)
+    return format(value, spec)
+
+
+class CompiledTemplate:
+    """
+    编译后的 str.format 风格模板，渲染结果与 template.format(**values) 相同。
+    只支持具名字段（{target}、{day:d}），不支持位置字段和属性 / 下标访问。
+    """
+
+    def __init__(self, template: str):
+        self.template = template
+        pieces = []
+        slots = []
+        for literal, field_name, spec, conversion in string.Formatter().parse(template):
+            pieces.append(literal.replace("%", "%%"))
+            if field_name is None:
+                continue
+            if not field_name.isidentifier():
+                raise ValueError(f"unsupported template field: {{{field_name}}}")
+            pieces.append("%s")
+            slots.append((field_name, spec or "", conversion))
+        self._format = "".join(pieces)
+        # 每个槽位：(字段名, 格式说明, 转换)，按在模板中出现的顺序，同一字段可出现多次
+        self.slots: Tuple[Tuple[str, str, Optional[str]], ...] = tuple(slots)
+        self.fields: Tuple[str, ...] = tuple(dict.fromkeys(name for name, _, _ in slots))
+
+    def render(self, **values) -> str:
+        return self._format % tuple(_format_value(values[name], spec, conversion)
+                                    for name, spec, conversion in self.slots)
+
+    def _field_spec(self, name: str) -> Tuple[str, Optional[str]]:
+        specs = {(spec, conversion) for field, spec, conversion in self.slots if field == name}
+        if len(specs) > 1:
+            raise ValueError(f"field {name!r} is used with different format specs in one template")
+        return specs.pop() if specs else ("", None)
+
+    def _getter(self, dims: Sequence[str]):
+        # 把一行（按 dims 排列的已格式化取值）映射为 % 所需的参数元组
+        positions = [dims.index(name) for name, _, _ in self.slots]
+        if not positions:
+            return lambda row: ()
+        if len(positions) == 1:
+            position = positions[0]
+            return lambda row: (row[position],)
+        return itemgetter(*positions)
+
+    def __repr__(self) -> str:
+        return f"CompiledTemplate(fields={self.fields})"
+
+
+@lru_cache(maxsize=256)
+def compile_template(template: str) -> CompiledTemplate:
+    """
+    编译模板，相同模板字符串只编译一次。
+    """
+    return CompiledTemplate(template)
+
+
+def _as_compiled(templates) -> List[CompiledTemplate]:
+    if isinstance(templates, (str, CompiledTemplate)):
+        templates = [templates]
+    return [compile_template(t) if isinstance(t, str) else t for t in templates]
+
+
+def _is_atomic(value: str) -> bool:
+    """
+    取值是否解析为单个名称、数字、字符串或函数调用。只有这类取值按文本代入任意模板位置后含义不变，
+    'a+b' 与 '(a+b)' 代入 {x} * 2 会得到不同的表达式，不能按规范形式合并。
+    """
+    try:
+        program = parse(value)
+    except FastExprSyntaxError:
+        return False
+    return not program.assignments and isinstance(program.result, (Name, Number, String, Call))
+
+
+def unique_values(values: Sequence) -> list:
+    """
+    去掉重复的取值，保留首次出现的顺序：原子取值（名称、数字、函数调用）按规范形式合并（如 'rank( x )' 与 'rank(x)'），
+    其他取值只去掉完全相同的文本。非字符串取值按原值去重。
+    """
+    seen = set()
+    output = []
+    for value in values:
+        key = (canonical_form(value) if _is_atomic(value) else value) if isinstance(value, str) else value
+        if key not in seen:
+            seen.add(key)
+            output.append(value)
+    return output
+
+
+def product_size(values: Dict[str, Sequence]) -> int:
+    return prod(len(v) for v in values.values())
+
+
+def _check_fields(templates: List[CompiledTemplate], dims: Sequence[str], counter: Optional[str]) -> None:
+    available = set(dims) | ({counter} if counter else set())
+    for template in templates:
+        missing = [name for name in template.fields if name not in available]
+        if missing:
+            raise ValueError(f"template is missing values for fields {missing}: {template.template[:80]!r}")
+
+
+def _iter_block(templates: List[CompiledTemplate],
+                values: Dict[str, Sequence],
+                counter: Optional[str],
+                start: int,
+                skip_unused: bool) -> Iterator[str]:
+    """
+    按 values 的键顺序（外层在前）遍历笛卡尔积，每个组合依次渲染各模板，顺序与嵌套 for 循环相同。
+    counter 字段取组合的序号（从 start 开始）。skip_unused 时模板未使用的维度只取第一个值。
+    """
+    dims = list(values)
+    row_dims = dims + [counter] if counter else dims
+    streams = []
+    for template in templates:
+        columns = []
+        for name in dims:
+            spec, conversion = template._field_spec(name)
+            column = [_format_value(value, spec, conversion) for value in values[name]]
+            if skip_unused and name not in template.fields:
+                # 未使用的维度只在第一个取值处渲染，其余位置标记为 None 后跳过
+                column = column[:1] + [None] * (len(column) - 1)
+            columns.append(column)
+        counter_spec = template._field_spec(counter) if counter else None
+        streams.append((template._format, template._getter(row_dims), product(*columns), counter_spec))
+
+    rows = zip(*(stream[2] for stream in streams))
+    for number, combo in enumerate(rows, start):
+        for (fmt, getter, _, counter_spec), row in zip(streams, combo):
+            if skip_unused and None in row:
+                continue
+            if counter:
+                row = row + (_format_value(number, *counter_spec),)
+            yield fmt % getter(row)
+
+
+def _prefix_blocks(values: Dict[str, Sequence], n_blocks: int) -> List[Tuple[int, int, int]]:
+    """
+    把笛卡尔积按最外层若干维（前缀）切成连续的块，返回 (前缀维数, 起始前缀序号, 结束前缀序号)。
+    """
+    sizes = [len(v) for v in values.values()]
+    depth, prefix = 0, 1
+    while depth < len(sizes) and prefix < n_blocks:
+        prefix *= sizes[depth]
+        depth += 1
+    step = max(1, -(-prefix // n_blocks))
+    return [(depth, lo, min(prefix, lo + step)) for lo in range(0, prefix, step)]
+
+
+def _unrank(index: int, sizes: Sequence[int]) -> List[int]:
+    # 混合进制：把前缀序号拆成各维的局部下标
+    locals_ = []
+    for size in reversed(sizes):
+        index, local = divmod(index, size)
+        locals_.append(local)
+    return locals_[::-1]
+
+
+def _render_block(args) -> Tuple[List[str], Optional[List[int]]]:
+    """
+    工作进程：渲染一个前缀块，dedupe 为 "fingerprint" 时同时计算指纹。
+    """
+    template_strings, values, counter, start, skip_unused, depth, lo, hi, with_keys = args
+    templates = _as_compiled(template_strings)
+    dims = list(values)
+    prefix_dims = dims[:depth]
+    rest = {name: values[name] for name in dims[depth:]}
+    rest_size = product_size(rest)
+    expressions = []
+    for prefix_index in range(lo, hi):
+        locals_ = _unrank(prefix_index, [len(values[name]) for name in prefix_dims])
+        block_templates = templates
+        if skip_unused:
+            # 前缀维度固定为单个取值后，未使用该维度的模板只在其第一个取值处渲染
+            block_templates = [t for t in templates
+                               if all(local == 0 or name in t.fields for name, local in zip(prefix_dims, locals_))]
+        block_values = {name: [values[name][local]] for name, local in zip(prefix_dims, locals_)}
+        block_values.update(rest)
+        expressions += _iter_block(block_templates, block_values, counter, start + prefix_index * rest_size,
+                                   skip_unused)
+    keys = [compact_fingerprint(expression) for expression in expressions] if with_keys else None
+    return expressions, keys
+
+
+def iter_render(templates: Union[str, CompiledTemplate, Sequence[Union[str, CompiledTemplate]]],
+                values: Dict[str, Sequence],
+                counter: Optional[str] = None,
+                start: int = 1,
+                dedupe: Optional[str] = None,
+                processes: Optional[int] = None,
+                blocks_per_process: int = 4,
+                seen: Optional[set] = None) -> Iterator[str]:
+    """
+    按笛卡尔积批量渲染模板（生成器）。
+
+    Args:
+        templates: 一个或多个模板（字符串或 CompiledTemplate），每个组合依次渲染。
+        values: {字段名: 取值列表}，键顺序即嵌套顺序（外层在前）；常量字段传单元素列表。
+        counter: 取组合序号的字段名，例如 capm 模板中的 'count'。
+        start: 序号起始值。
+        dedupe: None 不去重，与逐个 str.format 的结果完全一致；
+            "slots" 去掉重复取值（原子取值按规范形式，见 unique_values），并跳过只在模板未使用的维度上不同的组合，
+            几乎没有额外开销；
+            "fingerprint" 在 "slots" 基础上再按 compact_fingerprint 逐条去重。
+        processes: 大于 1 时按最外层维度分块，在进程池中渲染，输出顺序不变。
+        blocks_per_process: 每个进程分到的块数。
+        seen: 已见过的 compact_fingerprint 集合，dedupe="fingerprint" 时使用并更新，可跨多次调用共享。
+    """
+    if dedupe not in DEDUPE_MODES:
+        raise ValueError(f"dedupe must be one of {DEDUPE_MODES}")
+    templates = _as_compiled(templates)
+    values = {name: list(v) for name, v in values.items()}
+    _check_fields(templates, list(values), counter)
+    if dedupe:
+        values = {name: unique_values(v) for name, v in values.items()}
+    skip_unused = dedupe is not None
+    with_keys = dedupe == "fingerprint"
+    seen = set() if seen is None else seen
+
+    if processes and processes > 1:
+        template_strings = [t.template for t in templates]
+        jobs = [(template_strings, values, counter, start, skip_unused, depth, lo, hi, with_keys)
+                for depth, lo, hi in _prefix_blocks(values, processes * blocks_per_process)]
+        with ProcessPoolExecutor(max_workers=processes) as executor:
+            for expressions, keys in executor.map(_render_block, jobs):
+                if not with_keys:
+                    yield from expressions
+                    continue
+                for expression, key in zip(expressions, keys):
+                    if key not in seen:
+                        seen.add(key)
+                        yield expression
+        return
+
+    for expression in _iter_block(templates, values, counter, start, skip_unused):
+        if with_keys:
+            key = compact_fingerprint(expression)
+            if key in seen:
+                continue
+            seen.add(key)
+        yield expression
+
+
+def render_all(templates, values: Dict[str, Sequence], **kwargs) -> List[str]:
+    """
+    iter_render 的列表版本。
+    """
+    return list(iter_render(templates, values, **kwargs))
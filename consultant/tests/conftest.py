@@ -0,0 +1,5 @@
+import os
+import sys
+
+# consultant 下的模块按顶层模块导入（from machine_lib import ...）
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
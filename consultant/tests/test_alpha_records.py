@@ -0,0 +1,68 @@
+import numpy as np
+import pytest
+
+from alpha_records import AlphaBatch, AlphaRecord
+
+BASE = ["A1", "rank(close)", 1.5, 0.35, 1.1, 0.002]
+
+
+@pytest.mark.parametrize("rec, expected", [
+    # get_alphas_from_csv：[..., dateCreated, decay, (adj_decay)]
+    (BASE + ["2024-01-01", 4], dict(date_created="2024-01-01", decay=4, adjusted_decay=None)),
+    (BASE + ["2024-01-01", 4, 8], dict(date_created="2024-01-01", decay=4, adjusted_decay=8)),
+    (BASE + [None, 4, 8], dict(date_created=None, decay=4, adjusted_decay=8)),
+    # 带 pyramids 的布局
+    (BASE + ["2024-01-01", [{'name': 'MATCHES_PYRAMID'}], 4], dict(decay=4, pyramids=[{'name': 'MATCHES_PYRAMID'}])),
+    (BASE + ["", [], 4, 8], dict(date_created="", decay=4, adjusted_decay=8, pyramids=[])),
+    # get_alphas_with_universe_region：universe、region 位于 margin 之后
+    (BASE + ["TOP3000", "USA", "2024-01-01", 4], dict(universe="TOP3000", region="USA", decay=4, adjusted_decay=None)),
+    (BASE + ["TOP3000", "USA", "2024-01-01", 4, 8], dict(universe="TOP3000", region="USA", decay=4, adjusted_decay=8)),
+])
+def test_from_list_layouts_round_trip(rec, expected):
+    record = AlphaRecord.from_list(rec)
+    assert (record.alpha_id, record.exp, record.sharpe) == ("A1", "rank(close)", 1.5)
+    for name, value in expected.items():
+        assert getattr(record, name) == value
+    assert record.to_list() == rec
+    assert record == rec
+    assert record[-1] == rec[-1] and len(record) == len(rec)
+
+
+def test_from_list_explicit_layout():
+    # 9 项的记录只有显式指定时才按带 universe 的布局读取（该布局至少 10 项）
+    with pytest.raises(ValueError):
+        AlphaRecord.from_list(BASE + ["2024-01-01", 4, 8], with_universe=True)
+    record = AlphaRecord.from_list(BASE + ["TOP3000", "USA", None, 4], with_universe=True)
+    assert (record.universe, record.region, record.date_created) == ("TOP3000", "USA", None)
+
+
+@pytest.mark.parametrize("length", [7, 12])
+def test_from_list_rejects_unknown_layouts(length):
+    with pytest.raises(ValueError):
+        AlphaRecord.from_list((BASE + ["2024-01-01", 4, 8, 1, 2, 3])[:length])
+
+
+def make_batch():
+    rows = [("A1", "c", 1.0), ("A2", "a", 3.0), ("A3", "b", 2.0), ("A4", "d", 3.0), ("A5", "e", -1.0)]
+    return AlphaBatch.from_records([[alpha_id, exp, sharpe, 0.2, 1.0, 0.001, "2024-01-01", 4]
+                                    for alpha_id, exp, sharpe in rows])
+
+
+def test_sort_numeric_key_is_stable():
+    batch = make_batch()
+    assert batch.sort('sharpe').alpha_id == ["A2", "A4", "A3", "A1", "A5"]
+    assert batch.sort('sharpe', reverse=False).alpha_id == ["A5", "A1", "A3", "A2", "A4"]
+
+
+def test_sort_string_key():
+    batch = make_batch()
+    assert batch.sort('exp', reverse=False).exp == ["a", "b", "c", "d", "e"]
+    assert batch.sort('exp').exp == ["e", "d", "c", "b", "a"]
+
+
+@pytest.mark.parametrize("k", [0, 1, 2, 3, 5, 10])
+def test_top_k_matches_sort(k):
+    batch = make_batch()
+    assert batch.top_k(k).alpha_id == batch.sort('sharpe').alpha_id[:k]
+    assert batch.top_k(k, 'exp').exp == batch.sort('exp').exp[:k]
+    assert np.array_equal(batch.top_k(k).sharpe, batch.sort('sharpe').sharpe[:k])
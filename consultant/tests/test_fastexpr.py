@@ -0,0 +1,70 @@
+import pytest
+
+from fastexpr import (FastExprSyntaxError, canonical_form, compact_fingerprint, dedupe_expressions, fingerprint,
+                      parse, referenced_fields, to_fastexpr)
+
+ROUND_TRIP = [
+    "rank(close)",
+    "-rank(close) * 2.5",
+    "a - (b - c)",
+    "(a - b) - c",
+    "x ^ (y ^ 2)",
+    "(x ^ y) ^ 2",
+    "-(-x)",
+    "x > 0 ? -y : (z ? 1 : 2)",
+    "ts_regression(returns, close, 5, lag = 0, rettype = 2)",
+    "group_neutralize(x, bucket(rank(cap), range='0.1, 1, 0.1'))",
+    "a = rank(close);\nb = ts_mean(a, 5);\nb - a",
+]
+
+
+@pytest.mark.parametrize("expression", ROUND_TRIP)
+def test_round_trip(expression):
+    text = to_fastexpr(parse(expression))
+    assert parse(text) == parse(expression)
+    assert to_fastexpr(parse(text)) == text
+
+
+@pytest.mark.parametrize("a, b", [
+    ("rank( close )", "rank(close)"),
+    ("((a + b))", "a + b"),
+    ("ts_mean(x, 5.0)", "ts_mean(x, 5)"),
+    ("f(x, rettype=2, lag=0)", "f(x, lag = 0, rettype = 2)"),
+    ("bucket(rank(cap), range='0.1, 1, 0.1')", "bucket(rank(cap), range='0.1,1,0.1')"),
+    ("alpha_1_basic = rank(x); alpha_1_basic + 1", "rank(x) + 1"),
+    ("a = rank(x);\nunused = ts_mean(y, 5);\na * a", "v = rank(x); v * v"),
+    ("a = rank(x); a = a + 1; a", "rank(x) + 1"),
+])
+def test_equivalent_expressions_share_canonical_form(a, b):
+    assert canonical_form(a) == canonical_form(b)
+    assert fingerprint(a) == fingerprint(b)
+    assert compact_fingerprint(a) == compact_fingerprint(b)
+
+
+@pytest.mark.parametrize("a, b", [
+    ("a - b - c", "a - (b - c)"),
+    ("rank(x) * 2", "rank(x * 2)"),
+    ("ts_mean(x, 5)", "ts_mean(x, 20)"),
+    ("v = rank(x); v * v", "rank(x) * rank(y)"),
+])
+def test_different_expressions_differ(a, b):
+    assert canonical_form(a) != canonical_form(b)
+    assert compact_fingerprint(a) != compact_fingerprint(b)
+
+
+def test_canonical_form_falls_back_to_whitespace_for_invalid_expressions():
+    with pytest.raises(FastExprSyntaxError):
+        parse("ts_rank(x ,22) +")
+    assert canonical_form("ts_rank(x ,22)   +") == "ts_rank(x ,22) +"
+
+
+def test_dedupe_keeps_first_occurrence_and_decay():
+    assert dedupe_expressions(["rank(x)", "b", "rank( x )", "b"]) == ["rank(x)", "b"]
+    assert dedupe_expressions([("rank(x)", 4), ("rank( x )", 4), ("rank(x)", 8)]) == [("rank(x)", 4), ("rank(x)", 8)]
+
+
+def test_referenced_fields():
+    assert referenced_fields("a = ts_mean(close, 5); if_else(a > nan, a, volume) * true") == ["close", "volume"]
+    assert referenced_fields("ts_regression(returns, close, 5, lag=0) + returns") == ["returns", "close"]
+    # 解析失败时按词法单元提取，最后一个名称也计入
+    assert referenced_fields("rank(close) + volume)") == ["close", "volume"]
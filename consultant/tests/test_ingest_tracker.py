@@ -0,0 +1,82 @@
+from ingest_tracker import IngestionTracker
+
+HEADER = b"alpha_id,exp,sharpe\n"
+
+
+def rows(n, start=0):
+    return b"".join(b'A%d,"rank(x, %d)",1.%d\n' % (i, i, i) for i in range(start, start + n))
+
+
+def poll(tracker, path, block_size=1 << 20):
+    chunks = list(tracker.iter_new_chunks(str(path), block_size))
+    restarted = any(chunk[1] for chunk in chunks)
+    return restarted, [record['alpha_id'] for _, _, records in chunks for record in records]
+
+
+def test_append_reads_only_new_rows(tmp_path):
+    path = tmp_path / "results.csv"
+    path.write_bytes(HEADER + rows(3))
+    tracker = IngestionTracker(str(tmp_path / "ingest.db"))
+    assert poll(tracker, path) == (False, ["A0", "A1", "A2"])
+    assert poll(tracker, path) == (False, [])
+    with open(path, "ab") as f:
+        f.write(rows(2, 3))
+    assert poll(tracker, path) == (False, ["A3", "A4"])
+    assert tracker.state(str(path))[2:4] == (path.stat().st_size, 5)
+
+
+def test_small_blocks_split_records(tmp_path):
+    path = tmp_path / "results.csv"
+    path.write_bytes(HEADER + rows(20))
+    tracker = IngestionTracker(str(tmp_path / "ingest.db"))
+    assert poll(tracker, path, block_size=7) == (False, [f"A{i}" for i in range(20)])
+
+
+def test_partial_last_line_waits_for_newline(tmp_path):
+    path = tmp_path / "results.csv"
+    path.write_bytes(HEADER + rows(2) + b'A2,"rank(x,')
+    tracker = IngestionTracker(str(tmp_path / "ingest.db"))
+    assert poll(tracker, path) == (False, ["A0", "A1"])
+    with open(path, "ab") as f:
+        # 引号内的换行不是记录边界
+        f.write(b'\n 2)",1.2')
+    assert poll(tracker, path) == (False, [])
+    with open(path, "ab") as f:
+        f.write(b"\n")
+    chunks = list(tracker.iter_new_chunks(str(path)))
+    assert [record['exp'] for _, _, records in chunks for record in records] == ["rank(x,\n 2)"]
+
+
+def test_in_place_rewrite_restarts(tmp_path):
+    path = tmp_path / "results.csv"
+    path.write_bytes(HEADER + rows(3))
+    tracker = IngestionTracker(str(tmp_path / "ingest.db"))
+    poll(tracker, path)
+    # 表头不变、文件变长，但已读部分被改写（例如 sort_csv 重排后又追加）
+    path.write_bytes(HEADER + rows(1, 2) + rows(2) + rows(1, 3))
+    assert poll(tracker, path) == (True, ["A2", "A0", "A1", "A3"])
+    assert poll(tracker, path) == (False, [])
+
+
+def test_truncated_or_new_header_restarts(tmp_path):
+    path = tmp_path / "results.csv"
+    path.write_bytes(HEADER + rows(3))
+    tracker = IngestionTracker(str(tmp_path / "ingest.db"))
+    poll(tracker, path)
+    path.write_bytes(HEADER + rows(1))
+    assert poll(tracker, path) == (True, ["A0"])
+    path.write_bytes(b"alpha_id,exp,sharpe,fitness\n" + rows(1, 5))
+    assert poll(tracker, path) == (True, ["A5"])
+
+
+def test_poll_frame_reports_restart(tmp_path):
+    path = tmp_path / "results.csv"
+    path.write_bytes(b"id,dateCreated\nA0,2024-01-01\nA1,2024-01-02\n")
+    tracker = IngestionTracker(str(tmp_path / "ingest.db"))
+    restarted, frame = tracker.poll_frame(str(path))
+    assert not restarted and list(frame['id']) == ["A0", "A1"]
+    restarted, frame = tracker.poll_frame(str(path))
+    assert not restarted and frame.empty
+    path.write_bytes(b"id,dateCreated\nA2,2024-01-03\n")
+    restarted, frame = tracker.poll_frame(str(path))
+    assert restarted and list(frame['id']) == ["A2"]
@@ -0,0 +1,65 @@
+from sim_queue import COMPLETE, FAILED, PENDING, POSTED, SimulationQueue
+
+
+def simulation(expression, region="USA", universe="TOP3000"):
+    return {'type': 'REGULAR', 'regular': expression,
+            'settings': {'region': region, 'universe': universe, 'decay': 4}}
+
+
+def test_enqueue_ignores_equivalent_expressions(tmp_path):
+    queue = SimulationQueue(str(tmp_path / "queue.db"))
+    assert queue.enqueue([simulation("rank(close)"), simulation("rank( close )"), simulation("rank(open)")]) == 2
+    assert queue.enqueue([simulation("rank(open)")]) == 0
+    # settings 为字符串（从 CSV 读入）时同样去重
+    assert queue.enqueue([dict(simulation("rank(open)"), settings=str(simulation("x")['settings']))]) == 0
+    assert queue.counts() == {PENDING: 2}
+
+
+def test_claim_groups_by_region_and_universe(tmp_path):
+    queue = SimulationQueue(str(tmp_path / "queue.db"))
+    queue.enqueue([simulation("a"), simulation("b", universe="TOP1000"), simulation("c")])
+    claimed = queue.claim(10)
+    assert [data['regular'] for _, data in claimed] == ["a", "c"]
+    assert [data['regular'] for _, data in queue.claim(10)] == ["b"]
+    assert queue.claim(10) == []
+
+
+def test_resume_after_crash(tmp_path):
+    path = str(tmp_path / "queue.db")
+    queue = SimulationQueue(path)
+    queue.enqueue([simulation(f"rank(field_{i})") for i in range(5)])
+    posted = queue.claim(2)
+    queue.mark_posted([id_ for id_, _ in posted], "https://example.com/simulations/1")
+    interrupted = queue.claim(2)
+    # 第二批在拿到进度 URL 之前崩溃，连接直接丢弃
+    queue.close()
+
+    queue = SimulationQueue(path)
+    assert queue.counts() == {POSTED: 4, PENDING: 1}
+    tasks = queue.posted_tasks()
+    assert [(url, ids) for url, ids, _ in tasks] == [("https://example.com/simulations/1", [id_ for id_, _ in posted])]
+    assert [data['regular'] for data in tasks[0][2]] == ["rank(field_0)", "rank(field_1)"]
+    assert queue.recover_interrupted() == 2
+    # 已提交的任务不会被再次取出
+    assert [data['regular'] for _, data in queue.claim(10)] == ["rank(field_4)"]
+    queue.mark_complete(tasks[0][1], ["A1", "A2"])
+    assert queue.counts() == {COMPLETE: 2, FAILED: 2, POSTED: 1}
+
+    assert queue.retry_failed() == 2
+    assert sorted(id_ for id_, _ in queue.claim(10)) == sorted(id_ for id_, _ in interrupted)
+
+
+def test_recover_interrupted_can_retry(tmp_path):
+    queue = SimulationQueue(str(tmp_path / "queue.db"))
+    queue.enqueue([simulation("a"), simulation("b")])
+    queue.claim(2)
+    assert queue.recover_interrupted(retry=True) == 2
+    assert queue.counts() == {PENDING: 2}
+
+
+def test_mark_children_records_failures(tmp_path):
+    queue = SimulationQueue(str(tmp_path / "queue.db"))
+    queue.enqueue([simulation("a"), simulation("b"), simulation("c")])
+    ids = [id_ for id_, _ in queue.claim(3)]
+    queue.mark_children(ids, [{'alpha_id': "A1"}, {'alpha_id': None, 'error': "bad"}])
+    assert queue.counts() == {COMPLETE: 1, FAILED: 2}
@@ -0,0 +1,63 @@
+from itertools import product
+
+import pytest
+
+from capm_alpha import ALPHA_TEMPLATES, iter_alpha_list
+from template_engine import compile_template, render_all, unique_values
+
+TEMPLATE_A = "a_{count}_x = ts_mean({target}, {day:d});\ngroup_rank(a_{count}_x, {sector}) * 100%"
+TEMPLATE_B = "{target!r} + {day:.1f} + {market}"
+VALUES = {'target': ['close', 'rank(volume)'], 'market': ['mkt_a', 'mkt_b'], 'sector': ['sector', 'industry'],
+          'day': [5, 22]}
+
+
+def format_loop(templates, values, counter='count'):
+    # 原先的写法：多层 for 循环，每个组合逐个调用 str.format
+    output = []
+    for count, combo in enumerate(product(*values.values()), 1):
+        for template in templates:
+            output.append(template.format(**dict(zip(values, combo)), **{counter: count}))
+    return output
+
+
+def test_compiled_template_matches_str_format():
+    for template in (TEMPLATE_A, TEMPLATE_B, "no fields", "{{literal}} {target}"):
+        values = {'target': 'close', 'market': 'mkt', 'sector': 'sector', 'day': 22, 'count': 7}
+        assert compile_template(template).render(**values) == template.format(**values)
+
+
+@pytest.mark.parametrize("processes", [None, 2])
+def test_render_all_matches_str_format_loop(processes):
+    expected = format_loop([TEMPLATE_A, TEMPLATE_B], VALUES)
+    assert render_all([TEMPLATE_A, TEMPLATE_B], VALUES, counter='count', processes=processes,
+                      blocks_per_process=3) == expected
+
+
+def test_capm_alpha_list_matches_str_format_loop():
+    values = {'target': ['close', 'assets'], 'market': ['mkt'], 'sector': ['sector', 'subindustry'],
+              'day': [22, 66], 'cap': ['cap']}
+    names = [name for name, template in ALPHA_TEMPLATES.items()
+             if set(compile_template(template).fields) <= set(values) | {'count'}]
+    expected = format_loop([ALPHA_TEMPLATES[name] for name in names], values)
+    assert list(iter_alpha_list(values['target'], values['market'], values['sector'], 'cap', values['day'])) == expected
+
+
+def test_slots_dedupe_skips_unused_dimensions():
+    values = dict(VALUES, target=['close', 'close', 'rank( volume )', 'rank(volume)'])
+    output = render_all([TEMPLATE_A], values, counter='count', dedupe="slots")
+    # 重复的 target 按规范形式合并；模板未使用 market，只保留 market 取第一个值的组合，序号不变
+    deduped = dict(VALUES, target=['close', 'rank( volume )'])
+    combos = list(product(*deduped.values()))
+    expected = [alpha for combo, alpha in zip(combos, format_loop([TEMPLATE_A], deduped)) if combo[1] == 'mkt_a']
+    assert output == expected
+    assert len(output) == 8
+
+
+def test_fingerprint_dedupe_removes_equivalent_expressions():
+    values = {'target': ['close'], 'day': [5, 5.0]}
+    assert render_all("ts_mean({target}, {day})", values) == ["ts_mean(close, 5)", "ts_mean(close, 5.0)"]
+    assert render_all("ts_mean({target}, {day})", values, dedupe="fingerprint") == ["ts_mean(close, 5)"]
+
+
+def test_unique_values_only_merges_atomic_values():
+    assert unique_values(['rank(x)', 'rank( x )', 'a+b', '(a+b)', 3, 3]) == ['rank(x)', 'a+b', '(a+b)', 3]